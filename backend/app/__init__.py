@@ -1,24 +1,53 @@
-from azure.core.exceptions import ResourceExistsError
-from fastapi import FastAPI, HTTPException
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 
+from . import metrics
+from .bulk import ndjson, ndjson_lines
 from .config import settings
 from .controller import Controller
+from .encoding import TrustedJSONResponse, dumps
+from .storage import combined_etag
 from .schemas import (
     Item,
     ItemCreate,
+    ListChanges,
     ShoppingList,
     ShoppingListCreate,
+    ShoppingListExpanded,
     ShoppingListUpdate,
     Test,
     User,
     UserCreate,
     UserUpdate,
     EmailRequest,
-    ItemName
+    ImportReport,
+    ItemName,
+    BatchRequest,
+    ItemIds,
+    ItemsAdd,
+    ListItem,
+    ListItemUpdate
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await con.open()
+    yield
+    await con.close()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_allow_origins,
@@ -26,32 +55,175 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the timings cover the whole stack
+app.add_middleware(metrics.MetricsMiddleware)
 
 con = Controller()
 
+EXPANDABLE = {"items", "members"}
+
+
+def parse_expand(expand: str | None) -> set[str]:
+    fields = {x.strip() for x in (expand or "").split(",") if x.strip()}
+    if fields - EXPANDABLE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Can only expand {', '.join(sorted(EXPANDABLE))}",
+        )
+    return fields
+
+
+def etag_matches(etag: str | None, if_none_match: str | None) -> bool:
+    if etag is None or if_none_match is None:
+        return False
+    candidates = [x.strip() for x in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def parse_if_match(if_match: str | None) -> str | None:
+    # "*" matches whatever version is stored, the same as no condition
+    if if_match is None or if_match.strip() == "*":
+        return None
+    return if_match.strip()
+
+
+def modified_error(e: ResourceModifiedError, if_match: str | None) -> HTTPException:
+    # Only a request with If-Match had a precondition to fail. Without one
+    # the write kept losing to other writers and can be tried again shortly
+    if if_match is not None:
+        return HTTPException(status_code=412, detail=str(e))
+    return HTTPException(
+        status_code=503,
+        detail="The shopping list is busy, try again.",
+        headers={"Retry-After": "1"},
+    )
+
+
+CONTINUATION_HEADER = "X-Continuation-Token"
+NDJSON = "application/x-ndjson"
+PageFetcher = Callable[[int, str | None], Awaitable[tuple[list, str | None]]]
+
+
+def parse_select(select: str | None, model: type[BaseModel]) -> list[str] | None:
+    if select is None:
+        return None
+    fields = [x.strip() for x in select.split(",") if x.strip()]
+    if not fields or set(fields) - set(model.model_fields):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Can only select {', '.join(model.model_fields)}",
+        )
+    return fields
+
+
+async def fetch_page(
+    fetch: PageFetcher, limit: int, continuation: str | None
+) -> tuple[list, str | None]:
+    try:
+        return await fetch(limit, continuation)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def stream_pages(
+    fetch: PageFetcher, rows: list, continuation: str | None
+) -> AsyncIterator[bytes]:
+    # Emits a JSON array one element at a time, fetching the next page only
+    # once the previous one has been written out
+    separator = b"["
+    while True:
+        for row in rows:
+            yield separator + dumps(row)
+            separator = b","
+        if continuation is None:
+            break
+        rows, continuation = await fetch(settings.max_page_size, continuation)
+    yield b"[]" if separator == b"[" else b"]"
+
+
+async def paged_response(
+    fetch: PageFetcher, limit: int | None, continuation: str | None
+) -> Response:
+    if limit is None:
+        # Fetch the first page up front so a bad token is still a clean 400
+        rows, continuation = await fetch_page(
+            fetch, settings.max_page_size, continuation
+        )
+        return StreamingResponse(
+            stream_pages(fetch, rows, continuation), media_type="application/json"
+        )
+    rows, continuation = await fetch_page(fetch, limit, continuation)
+    headers = {} if continuation is None else {CONTINUATION_HEADER: continuation}
+    return TrustedJSONResponse(rows, headers=headers)
+
 
 @app.get("/test")
 async def test() -> Test:
-    return con.test()
+    return await con.test()
+
+
+@app.get("/ready")
+async def ready() -> dict:
+    # For readiness probes: 503 until connections and caches are warm, and
+    # again once shutdown has begun
+    if not con.ready:
+        raise HTTPException(status_code=503, detail="Not ready")
+    return {"ready": True}
+
+
+@app.get("/cache/stats")
+async def cache_stats() -> dict:
+    return con.cache_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    # Prometheus text exposition format
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 @app.get("/users/list", response_model=list[User])
-async def list_users() -> list[User]:
-    return con.list_users()
+async def list_users(
+    limit: int | None = Query(default=None, ge=1, le=settings.max_page_size),
+    continuation: str | None = None,
+    select: str | None = None,
+    prefix: str | None = None,
+) -> Response:
+    fields = parse_select(select, User)
+    return await paged_response(
+        lambda n, token: con.list_users(n, token, fields, prefix), limit, continuation
+    )
 
 
 @app.post("/users", response_model=User)
 async def create_user(user: UserCreate) -> User:
     try:
-        return con.create_user(user)
+        return await con.create_user(user)
     except ResourceExistsError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.post("/users/batch", response_model=list[User])
+async def get_users(users: BatchRequest) -> list[User]:
+    return await con.get_users(users.ids)
+
+
+@app.get("/users/export")
+async def export_users() -> StreamingResponse:
+    return StreamingResponse(ndjson(con.export_users()), media_type=NDJSON)
+
+
+@app.post("/users/import", response_model=ImportReport)
+async def import_users(request: Request, overwrite: bool = False) -> ImportReport:
+    return await con.import_users(ndjson_lines(request.stream()), overwrite)
+
+
 @app.get("/users/{user_id}", response_model=User)
 async def get_user(user_id: str) -> User:
     try:
-        return con.get_user(user_id)
+        return await con.get_user(user_id)
     except:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -59,7 +231,7 @@ async def get_user(user_id: str) -> User:
 @app.put("/users/{user_id}", response_model=User)
 async def update_user(user_id: str, user: UserUpdate) -> User:
     try:
-        return con.update_user(user_id, user)
+        return await con.update_user(user_id, user)
     except:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -67,47 +239,164 @@ async def update_user(user_id: str, user: UserUpdate) -> User:
 @app.delete("/users/{user_id}")
 async def delete_user(user_id: str) -> dict:
     try:
-        return con.delete_user(user_id)
+        return await con.delete_user(user_id)
     except:
         raise HTTPException(status_code=404, detail="User not found")
 
 
 # ShoppingLists
-@app.get("/shoppinglists/{user_id}/list", response_model=list[ShoppingList])
-async def list_shoppinglists(user_id: str) -> list[ShoppingList]:
-    return con.list_shoppinglists(user_id)
+@app.get(
+    "/shoppinglists/{user_id}/list", response_model=list[ShoppingListExpanded]
+)
+async def list_shoppinglists(
+    user_id: str,
+    expand: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=settings.max_page_size),
+    continuation: str | None = None,
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    fields = parse_expand(expand)
+    try:
+        shoppinglists, continuation = await con.list_shoppinglists(
+            user_id, limit, continuation
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    etag = combined_etag([x.etag for x in shoppinglists])
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag})
+    headers = {"ETag": etag}
+    if continuation is not None:
+        headers[CONTINUATION_HEADER] = continuation
+    if fields:
+        shoppinglists = await con.expand_shoppinglists(shoppinglists, fields)
+    return TrustedJSONResponse(shoppinglists, headers=headers)
+
+
+@app.get("/shoppinglists/{user_id}/ids", response_model=list[str])
+async def list_shoppinglist_ids(
+    user_id: str, if_none_match: str | None = Header(default=None)
+) -> Response:
+    # Only changes when lists are shared with or taken from the user, so
+    # clients can poll it for those and follow each list's own changes
+    shoppinglist_ids = await con.list_shoppinglist_ids(user_id)
+    etag = combined_etag(shoppinglist_ids)
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag})
+    return TrustedJSONResponse(shoppinglist_ids, headers={"ETag": etag})
 
 
 @app.post("/shoppinglists", response_model=ShoppingList)
-async def create_shoppinglist(shoppinglist: ShoppingListCreate) -> ShoppingList:
+async def create_shoppinglist(
+    shoppinglist: ShoppingListCreate, response: Response
+) -> ShoppingList:
     try:
-        return con.create_shoppinglist(shoppinglist)
+        created = await con.create_shoppinglist(shoppinglist)
     except ResourceExistsError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    response.headers["ETag"] = created.etag
+    return created
+
+
+@app.get("/shoppinglists/export")
+async def export_shoppinglists() -> StreamingResponse:
+    return StreamingResponse(ndjson(con.export_shoppinglists()), media_type=NDJSON)
 
 
-@app.get("/shoppinglists/{shoppinglist_id}", response_model=ShoppingList)
-async def get_shoppinglist(shoppinglist_id: str) -> ShoppingList:
+@app.post("/shoppinglists/import", response_model=ImportReport)
+async def import_shoppinglists(
+    request: Request, overwrite: bool = False
+) -> ImportReport:
+    return await con.import_shoppinglists(ndjson_lines(request.stream()), overwrite)
+
+
+@app.get("/shoppinglists/{shoppinglist_id}", response_model=ShoppingListExpanded)
+async def get_shoppinglist(
+    shoppinglist_id: str,
+    expand: str | None = None,
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    fields = parse_expand(expand)
     try:
-        return con.get_shoppinglist(shoppinglist_id)
+        shoppinglist = await con.get_shoppinglist(shoppinglist_id)
     except:
         raise HTTPException(status_code=404, detail="ShoppingList not found")
+    if etag_matches(shoppinglist.etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": shoppinglist.etag})
+    headers = {"ETag": shoppinglist.etag}
+    if fields:
+        shoppinglist = (await con.expand_shoppinglists([shoppinglist], fields))[0]
+    return TrustedJSONResponse(shoppinglist, headers=headers)
+
+
+def server_sent_event(event: dict) -> bytes:
+    if event["type"] == "heartbeat":
+        return b": heartbeat\n\n"
+    head = f"id: {event['version']}\nevent: {event['type']}\ndata: "
+    return head.encode("utf-8") + dumps(event) + b"\n\n"
+
+
+@app.get("/shoppinglists/{shoppinglist_id}/events")
+async def watch_shoppinglist(shoppinglist_id: str) -> StreamingResponse:
+    # Server-sent events: a snapshot of the list, then one delta per change
+    events = con.watch_shoppinglist(shoppinglist_id)
+    try:
+        # Resolve the snapshot first so a missing list is a plain 404
+        snapshot = await anext(events)
+    except ResourceNotFoundError:
+        await events.aclose()
+        raise HTTPException(status_code=404, detail="ShoppingList not found")
+
+    async def stream() -> AsyncIterator[bytes]:
+        yield server_sent_event(snapshot)
+        async for event in events:
+            yield server_sent_event(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/shoppinglists/{shoppinglist_id}/changes", response_model=ListChanges)
+async def list_changes(shoppinglist_id: str, since: int = Query(ge=0)) -> ListChanges:
+    # The deltas since a version the client holds, e.g. from a list's body
+    try:
+        return await con.list_changes(shoppinglist_id, since)
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail="ShoppingList not found")
 
 
 @app.put("/shoppinglists/{shoppinglist_id}", response_model=ShoppingList)
 async def update_shoppinglist(
-    shoppinglist_id: str, shoppinglist: ShoppingListUpdate
+    shoppinglist_id: str,
+    shoppinglist: ShoppingListUpdate,
+    response: Response,
+    if_match: str | None = Header(default=None),
 ) -> ShoppingList:
     try:
-        return con.update_shoppinglist(shoppinglist_id, shoppinglist)
+        updated = await con.update_shoppinglist(
+            shoppinglist_id, shoppinglist, parse_if_match(if_match)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
     except:
         raise HTTPException(status_code=404, detail="ShoppingList not found")
+    response.headers["ETag"] = updated.etag
+    return updated
 
 
 @app.delete("/shoppinglists/{shoppinglist_id}")
-async def delete_shoppinglist(shoppinglist_id: str) -> dict:
+async def delete_shoppinglist(
+    shoppinglist_id: str, if_match: str | None = Header(default=None)
+) -> dict:
     try:
-        return con.delete_shoppinglist(shoppinglist_id)
+        return await con.delete_shoppinglist(shoppinglist_id, parse_if_match(if_match))
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
     except:
         raise HTTPException(status_code=404, detail="ShoppingList not found")
 
@@ -115,55 +404,226 @@ async def delete_shoppinglist(shoppinglist_id: str) -> dict:
 @app.put(
     "/shoppinglists/{shoppinglist_id}/members/invite", response_model=ShoppingList
 )
-async def invite_to_shopping(shoppinglist_id: str, email: EmailRequest) -> ShoppingList:
+async def invite_to_shopping(
+    shoppinglist_id: str,
+    email: EmailRequest,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> ShoppingList:
     try:
-        return con.invite_to_shopping(shoppinglist_id, email)
+        updated = await con.invite_to_shopping(
+            shoppinglist_id, email, parse_if_match(if_match)
+        )
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
     except:
         raise HTTPException(
             status_code=404, detail=f"Couldn't invite {email} to the shopping list"
         )
+    response.headers["ETag"] = updated.etag
+    return updated
+
 
 @app.delete(
     "/shoppinglists/{shoppinglist_id}/members/delete", response_model=ShoppingList
 )
-async def delete_from_shopping(shoppinglist_id: str, email: EmailRequest) -> ShoppingList:
+async def delete_from_shopping(
+    shoppinglist_id: str,
+    email: EmailRequest,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> ShoppingList:
     try:
-        return con.delete_from_shopping(shoppinglist_id, email)
+        updated = await con.delete_from_shopping(
+            shoppinglist_id, email, parse_if_match(if_match)
+        )
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
     except:
         raise HTTPException(
             status_code=404, detail=f"Couldn't remove {email} from the shopping list"
         )
-    
+    response.headers["ETag"] = updated.etag
+    return updated
+
+
 @app.delete(
     "/shoppinglists/{shoppinglist_id}/items/delete", response_model=ShoppingList
 )
-async def delete_item_from_shopping(shoppinglist_id: str, item: ItemName) -> ShoppingList:
+async def delete_item_from_shopping(
+    shoppinglist_id: str,
+    item: ItemName,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> ShoppingList:
+    try:
+        updated = await con.delete_item_from_shopping(
+            shoppinglist_id, item, parse_if_match(if_match)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
+    except:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Couldn't remove {item.item} from the shopping list",
+        )
+    response.headers["ETag"] = updated.etag
+    return updated
+
+
+@app.post(
+    "/shoppinglists/{shoppinglist_id}/items/add", response_model=ShoppingList
+)
+async def add_items_to_shopping(
+    shoppinglist_id: str,
+    items: ItemsAdd,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> ShoppingList:
+    try:
+        updated = await con.add_items_to_shopping(
+            shoppinglist_id, items, parse_if_match(if_match)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
+    except:
+        raise HTTPException(
+            status_code=404, detail="Couldn't add items to the shopping list"
+        )
+    response.headers["ETag"] = updated.etag
+    return updated
+
+
+@app.delete(
+    "/shoppinglists/{shoppinglist_id}/items/remove", response_model=ShoppingList
+)
+async def remove_items_from_shopping(
+    shoppinglist_id: str,
+    items: ItemIds,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> ShoppingList:
+    try:
+        updated = await con.remove_items_from_shopping(
+            shoppinglist_id, items, parse_if_match(if_match)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
+    except:
+        raise HTTPException(
+            status_code=404, detail="Couldn't remove items from the shopping list"
+        )
+    response.headers["ETag"] = updated.etag
+    return updated
+
+
+@app.put(
+    "/shoppinglists/{shoppinglist_id}/items/reorder", response_model=ShoppingList
+)
+async def reorder_shopping_items(
+    shoppinglist_id: str,
+    items: ItemIds,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> ShoppingList:
+    try:
+        updated = await con.reorder_shopping_items(
+            shoppinglist_id, items, parse_if_match(if_match)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceModifiedError as e:
+        raise modified_error(e, parse_if_match(if_match))
+    except:
+        raise HTTPException(
+            status_code=404, detail="Couldn't reorder the shopping list items"
+        )
+    response.headers["ETag"] = updated.etag
+    return updated
+
+
+@app.get(
+    "/shoppinglists/{shoppinglist_id}/items", response_model=list[ListItem]
+)
+async def get_list_items(shoppinglist_id: str) -> list[ListItem]:
     try:
-        return con.delete_item_from_shopping(shoppinglist_id, item)
+        return await con.get_list_items(shoppinglist_id)
+    except:
+        raise HTTPException(status_code=404, detail="ShoppingList not found")
+
+
+@app.put(
+    "/shoppinglists/{shoppinglist_id}/items/{item_id}", response_model=ListItem
+)
+async def update_list_item(
+    shoppinglist_id: str, item_id: str, update: ListItemUpdate
+) -> ListItem:
+    try:
+        return await con.update_list_item(shoppinglist_id, item_id, update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceModifiedError as e:
+        raise modified_error(e, None)
     except:
         raise HTTPException(
-            status_code=404, detail=f"Couldn't remove {item['item']} from the shopping list"
+            status_code=404, detail="Item not found in the shopping list"
         )
 
 
 # Items
 @app.get("/items/list", response_model=list[Item])
-async def list_items() -> list[Item]:
-    return con.list_items()
+async def list_items(
+    limit: int | None = Query(default=None, ge=1, le=settings.max_page_size),
+    continuation: str | None = None,
+    select: str | None = None,
+    prefix: str | None = None,
+) -> Response:
+    fields = parse_select(select, Item)
+    return await paged_response(
+        lambda n, token: con.list_items(n, token, fields, prefix), limit, continuation
+    )
 
 
 @app.post("/items", response_model=Item)
 async def create_item(item: ItemCreate) -> Item:
     try:
-        return con.create_item(item)
+        return await con.create_item(item)
     except ResourceExistsError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.post("/items/batch", response_model=list[Item])
+async def get_items(items: BatchRequest) -> list[Item]:
+    return await con.get_items(items.ids)
+
+
+@app.get("/items/search", response_model=list[Item])
+async def search_items(
+    q: str, limit: int = Query(default=10, ge=1, le=100)
+) -> list[Item]:
+    return await con.search_items(q, limit)
+
+
+@app.get("/items/export")
+async def export_items() -> StreamingResponse:
+    return StreamingResponse(ndjson(con.export_items()), media_type=NDJSON)
+
+
+@app.post("/items/import", response_model=ImportReport)
+async def import_items(request: Request, overwrite: bool = False) -> ImportReport:
+    return await con.import_items(ndjson_lines(request.stream()), overwrite)
+
+
 @app.get("/items/{item_id}", response_model=Item)
 async def get_item(item_id: str) -> Item:
     try:
-        return con.get_item(item_id)
+        return await con.get_item(item_id)
     except:
         raise HTTPException(status_code=404, detail="Item not found")
 
@@ -171,7 +631,7 @@ async def get_item(item_id: str) -> Item:
 # @app.put("/items/{item_id}", response_model=Item)
 # async def update_item(item_id: str, item: ItemUpdate) -> Item:
 #     try:
-#         return con.update_item(item_id, item)
+#         return await con.update_item(item_id, item)
 #     except:
 #         raise HTTPException(status_code=404, detail="Item not found")
 
@@ -179,6 +639,6 @@ async def get_item(item_id: str) -> Item:
 @app.delete("/items/{item_id}")
 async def delete_item(item_id: str) -> dict:
     try:
-        return con.delete_item(item_id)
+        return await con.delete_item(item_id)
     except:
         raise HTTPException(status_code=404, detail="Item not found")
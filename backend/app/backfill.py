@@ -0,0 +1,24 @@
+"""One-off backfill of the user -> shopping list membership index.
+
+Run from the backend directory with ``uv run python -m app.backfill``.
+"""
+
+import asyncio
+
+from .controller import Controller
+
+
+async def backfill() -> None:
+    con = Controller()
+    try:
+        print((await con.backfill_memberships())["message"])
+    finally:
+        await con.close()
+
+
+def main() -> None:
+    asyncio.run(backfill())
+
+
+if __name__ == "__main__":
+    main()
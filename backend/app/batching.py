@@ -0,0 +1,62 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+Flush = Callable[[Hashable, list], Awaitable[Any]]
+
+
+class WriteBatcher:
+    """Merges writes to the same key that arrive within ``window`` seconds.
+
+    Every caller of ``submit`` gets the result of the ``flush`` that wrote its
+    change, or its exception. A key's next batch waits for the previous one.
+    """
+
+    def __init__(self, window: float, flush: Flush) -> None:
+        self.window = window
+        self.flush = flush
+        self.pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = {}
+        self.flushing: dict[Hashable, asyncio.Task] = {}
+        self.changes = 0
+        self.flushes = 0
+
+    async def submit(self, key: Hashable, change: Any) -> Any:  # noqa: ANN401
+        self.changes += 1
+        future = asyncio.get_running_loop().create_future()
+        batch = self.pending.get(key)
+        if batch is None:
+            batch = self.pending[key] = []
+            task = asyncio.create_task(self._run(key, self.flushing.get(key)))
+            self.flushing[key] = task
+            task.add_done_callback(lambda x: self._done(key, x))
+        batch.append((change, future))
+        # The flush carries on for the others if this caller goes away
+        return await asyncio.shield(future)
+
+    async def _run(self, key: Hashable, previous: asyncio.Task | None) -> None:
+        await asyncio.sleep(self.window)
+        if previous is not None:
+            await asyncio.wait([previous])
+        batch = self.pending.pop(key)
+        self.flushes += 1
+        try:
+            result = await self.flush(key, [x for x, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:  # noqa: BLE001
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(result)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.flushing.get(key) is task:
+            del self.flushing[key]
+
+    def stats(self) -> dict:
+        return {"changes": self.changes, "flushes": self.flushes}
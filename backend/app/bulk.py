@@ -0,0 +1,126 @@
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from azure.core.exceptions import HttpResponseError
+
+from .storage import MAX_TRANSACTION, Table
+
+
+async def ndjson_lines(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, bytes]]:
+    """Split a byte stream into ``(line number, line)``, skipping blank lines."""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+    if buffer.strip():
+        yield number + 1, buffer
+
+
+async def ndjson(rows: AsyncIterator) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield row.model_dump_json().encode("utf-8") + b"\n"
+
+
+@dataclass
+class Write:
+    line: int
+    table: Table
+    operation: str
+    entity: dict
+    # Written once this write has succeeded, e.g. index rows of a new list
+    then: list["Write"] = field(default_factory=list)
+
+
+class BatchWriter:
+    """Groups writes per table and partition into transactions.
+
+    A batch is submitted as soon as it is full, with at most ``parallelism``
+    transactions in flight, so callers are held back instead of buffering the
+    whole import. A failed transaction is replayed one write at a time so that
+    only the offending lines are reported and the rest still land.
+    """
+
+    # Partly filled batches kept open before the oldest is sent as it is
+    MAX_PENDING = 64
+
+    def __init__(self, parallelism: int) -> None:
+        self.pending: dict[tuple[int, str], list[Write]] = {}
+        self.slots = asyncio.Semaphore(parallelism)
+        self.tasks: set[asyncio.Task] = set()
+        self.errors: dict[int, str] = {}
+
+    async def add(self, write: Write) -> None:
+        # Pending batches are only touched before the first await, so writes
+        # added concurrently by follow-ups can't interleave with each other
+        key = (id(write.table), write.entity["PartitionKey"])
+        ready = []
+        batch = self.pending.get(key)
+        if batch and any(x.entity["RowKey"] == write.entity["RowKey"] for x in batch):
+            # A transaction can only touch an entity once
+            ready.append(self.pending.pop(key))
+            batch = None
+        if batch is None:
+            batch = self.pending[key] = []
+        batch.append(write)
+        if len(batch) == MAX_TRANSACTION:
+            ready.append(self.pending.pop(key))
+        elif len(self.pending) > self.MAX_PENDING:
+            ready.append(self.pending.pop(next(iter(self.pending))))
+        for full in ready:
+            await self.submit(full)
+
+    async def submit(self, batch: list[Write]) -> None:
+        await self.slots.acquire()
+        task = asyncio.create_task(self.write(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def write(self, batch: list[Write]) -> None:
+        try:
+            done = await self.transact(batch)
+        finally:
+            self.slots.release()
+        # Only after releasing the slot, adding can wait for one
+        for write in done:
+            for follow_up in write.then:
+                await self.add(follow_up)
+
+    async def transact(self, batch: list[Write]) -> list[Write]:
+        table = batch[0].table
+        try:
+            await table.submit_transaction([(x.operation, x.entity) for x in batch])
+            return batch
+        except HttpResponseError:
+            pass
+        done = []
+        for write in batch:
+            try:
+                if write.operation == "create":
+                    await table.create_entity(entity=write.entity)
+                else:
+                    await table.upsert_entity(entity=write.entity)
+                done.append(write)
+            except HttpResponseError as e:
+                self.fail(write.line, e.message)
+        return done
+
+    def fail(self, line: int, error: str) -> None:
+        self.errors.setdefault(line, error)
+
+    async def close(self) -> None:
+        # Follow-up writes can queue new batches while earlier ones finish
+        while self.pending or self.tasks:
+            batches = list(self.pending.values())
+            self.pending.clear()
+            for batch in batches:
+                await self.submit(batch)
+            if self.tasks:
+                await asyncio.gather(*list(self.tasks))
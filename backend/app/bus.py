@@ -0,0 +1,143 @@
+import fcntl
+import json
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+Handler = Callable[[dict], None]
+
+
+class Bus(ABC):
+    """Carries change messages to every worker of a deployment, this one too.
+
+    Every worker applies every message in the same order through ``apply``.
+    ``applied`` counts the messages applied so far, so a caller can tell if
+    anything changed while it was waiting on storage.
+    """
+
+    def __init__(self, apply: Handler) -> None:
+        self.apply = apply
+        self.applied = 0
+
+    def deliver(self, message: dict) -> None:
+        self.applied += 1
+        self.apply(message)
+
+    @abstractmethod
+    def publish(self, message: dict) -> None:
+        """Send ``message`` to all workers, having applied it here on return."""
+
+    @abstractmethod
+    def poll(self) -> None:
+        """Apply messages from other workers that have arrived since last time."""
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBus(Bus):
+    """A single worker, messages are applied straight away."""
+
+    def publish(self, message: dict) -> None:
+        self.deliver(message)
+
+    def poll(self) -> None:
+        pass
+
+
+class FileBus(Bus):
+    """Messages appended as JSON lines to a file shared by the workers.
+
+    Writers append under an exclusive ``flock``, so the file order is the one
+    order every worker applies messages in. Past ``max_bytes`` the file is
+    replaced by one headed by ``checkpoint()``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        apply: Handler,
+        checkpoint: Callable[[], dict],
+        max_bytes: int = 1 << 20,
+    ) -> None:
+        super().__init__(apply)
+        self.path = path
+        self.checkpoint = checkpoint
+        self.max_bytes = max_bytes
+        self.lock = None
+        self.reader = None
+        self.buffer = b""
+
+    def _open(self) -> None:
+        if self.reader is not None:
+            return
+        self.lock = open(f"{self.path}.lock", "a")  # noqa: SIM115
+        with self._locked():
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o644))
+            self.reader = open(self.path, "rb")  # noqa: SIM115
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self.lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+    def _read(self) -> None:
+        data = self.reader.read()
+        if not data:
+            return
+        # A reader can catch a write half done, keep the rest for next time
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        for line in lines:
+            self.deliver(json.loads(line))
+
+    def poll(self) -> None:
+        self._open()
+        self._read()
+        try:
+            moved = os.stat(self.path).st_ino != os.fstat(self.reader.fileno()).st_ino
+        except FileNotFoundError:
+            moved = False
+        if moved:
+            # Nothing is written to the old file once it has been replaced
+            self._read()
+            self.reader.close()
+            self.reader = open(self.path, "rb")  # noqa: SIM115
+            self.buffer = b""
+            self._read()
+
+    def publish(self, message: dict) -> None:
+        self._open()
+        line = json.dumps(message).encode("utf-8") + b"\n"
+        with self._locked():
+            self.poll()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, line)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            self.poll()
+            if size > self.max_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        staging = f"{self.path}.new"
+        with open(staging, "wb") as f:
+            f.write(json.dumps(self.checkpoint()).encode("utf-8") + b"\n")
+        os.replace(staging, self.path)
+        # Take the checkpoint as read, this worker's state already matches it
+        self._read()
+        self.reader.close()
+        self.reader = open(self.path, "rb")  # noqa: SIM115
+        self.reader.seek(0, os.SEEK_END)
+        self.buffer = b""
+
+    def close(self) -> None:
+        for f in (self.reader, self.lock):
+            if f is not None:
+                f.close()
+        self.reader = self.lock = None
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -7,5 +9,42 @@ class Settings(BaseSettings):
 
     debug: bool = False
 
+    # Where entities live: Azure Table Storage, process memory or a SQLite file
+    storage_backend: Literal["azure", "memory", "sqlite"] = "azure"
+    table_connection: str = ""
+    sqlite_path: str = "shoppinglist.db"
+    # How new lists store their items: a JSON blob on the list entity, or one
+    # row per item in the listitems table (see app.migrate_items)
+    list_layout: Literal["blob", "rows"] = "blob"
+    # Attempts at a conditional list write before giving up on a conflict
+    write_retries: int = 5
+    # Seconds item edits to a list wait for more edits to the same list, so a
+    # burst is written at once. 0 writes every edit on its own.
+    write_coalesce_window: float = 0.0
+    # Changes kept per list for GET /shoppinglists/{id}/changes, older ones
+    # are dropped and clients that are further behind resync
+    change_log_size: int = 100
+
+    # Largest page a listing request may ask for, also the page size used when
+    # streaming a whole listing
+    max_page_size: int = 1000
+    # Transactions in flight at once during a bulk import
+    import_parallelism: int = 8
+
+    # Seconds of quiet before a list's event stream sends a keep-alive
+    feed_heartbeat: float = 15.0
+
+    # Read-through cache in front of users and items, per kind
+    cache_size: int = 1024
+    cache_ttl: float = 300.0
+
+    # Worker processes for app.serve, 0 for one per core
+    workers: int = 0
+    # File the workers of one deployment share cache invalidations and change
+    # events through, see app.bus. Empty when there's a single process.
+    bus_path: str = ""
+    # Seconds between checks for change events to push to live subscribers
+    bus_poll_interval: float = 0.1
+
 
 settings = Settings()
@@ -1,55 +1,304 @@
-import base64
-import hashlib
-import hmac
-import json
+import asyncio
 import logging
-import os
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from datetime import UTC, datetime
 
-from azure.core.exceptions import ResourceExistsError
-from azure.data.tables import TableServiceClient, UpdateMode
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from pydantic import BaseModel, ValidationError
 
+from .batching import WriteBatcher
+from .bulk import BatchWriter, Write
+from .bus import Bus, FileBus, LocalBus
+from .cache import MISSING, TTLCache
+from .config import settings
+from .encoding import dump_list, load_list
+from .events import ChangeFeed, InProcessFeed, list_delta
+from .metrics import InstrumentedTable
+from .rowid import make_rowid, make_rowids
 from .schemas import (
+    MAX_BATCH_SIZE,
     Item,
     ItemCreate,
+    ListChanges,
     ShoppingList,
     ShoppingListCreate,
+    ShoppingListExpanded,
     ShoppingListUpdate,
     Test,
     User,
     UserCreate,
     UserUpdate,
     EmailRequest,
-    ItemName
+    ImportReport,
+    ItemName,
+    ItemIds,
+    ItemsAdd,
+    ListItem,
+    ListItemUpdate,
+    RowError,
 )
+from .search import ItemIndex
+from .singleflight import SingleFlight
+from .storage import MAX_TRANSACTION, Entity, Table, combined_etag, get_backend
 from .util import log
 
 logger = logging.getLogger(__name__)
 
 
-def make_rowid(primaryKey: str, secret_key: str = os.environ["HASH_KEY"]) -> str:
-    message = primaryKey.lower().strip().encode("utf-8")
-    key = secret_key.encode("utf-8")
-
-    digest = hmac.new(key, message, hashlib.sha256).digest()
-    return base64.urlsafe_b64encode(digest).decode("utf-8").rstrip("=")
+def change_key(version: int) -> str:
+    # Zero padded, so a list's change log sorts by version
+    return f"{version:010d}"
 
 
 class Controller:
-    def __init__(self) -> None:
+    def __init__(self, feed: ChangeFeed | None = None) -> None:
         self.logger = logging.getLogger(__name__)
-        self.table_service = TableServiceClient.from_connection_string(
-            conn_str=os.environ["TABLE_CONNECTION"]
+        # Per-list change events for live subscribers
+        self.feed = feed or InProcessFeed()
+        self.storage = get_backend(settings)
+        self.users_table_client = self.table("users")
+        self.shoppinglists_table_client = self.table("lists")
+        self.items_table_client = self.table("items")
+        # user -> shoppinglist index, one partition per user id
+        self.memberships_table_client = self.table("memberships")
+        # Items of row-layout lists, one partition per shoppinglist id
+        self.listitems_table_client = self.table("listitems")
+        # Recent change events per list by version, one partition per list
+        self.listchanges_table_client = self.table("listchanges")
+        # Read-through caches per entity, plus listing pages keyed by query
+        self.users_cache = TTLCache(settings.cache_size, settings.cache_ttl)
+        self.items_cache = TTLCache(settings.cache_size, settings.cache_ttl)
+        self.user_pages = TTLCache(settings.cache_size, settings.cache_ttl)
+        self.item_pages = TTLCache(settings.cache_size, settings.cache_ttl)
+        # Storage reads in flight, shared by identical reads that arrive meanwhile
+        self.flights = SingleFlight()
+        # Item edits per list, written together when they arrive close together
+        self.list_writes = (
+            WriteBatcher(settings.write_coalesce_window, self._write_items)
+            if settings.write_coalesce_window > 0
+            else None
+        )
+        # Item names for search, built on open and kept current on writes
+        self.item_index = ItemIndex()
+        self.item_index_stale = False
+        # Every change that touches the caches, the index or the feed goes
+        # through the bus, so all workers of a deployment apply it
+        self.bus: Bus = (
+            FileBus(settings.bus_path, self._apply, self._checkpoint)
+            if settings.bus_path
+            else LocalBus(self._apply)
+        )
+        self.bus_poller: asyncio.Task | None = None
+        # Set once open has warmed up, cleared again when closing
+        self.ready = False
+
+    def table(self, table_name: str) -> InstrumentedTable:
+        # Every call is timed and counted towards the request's storage usage
+        return InstrumentedTable(self.storage.get_table(table_name), table_name)
+
+    async def open(self) -> None:
+        # Establish connections before the first request needs them
+        await self.storage.open()
+        # Catches up on change events before the index is built from storage
+        self.bus.poll()
+        await self.warm_up()
+        if settings.bus_path:
+            # Reads poll on their own, this is for events to live subscribers
+            self.bus_poller = asyncio.create_task(self._poll_bus())
+        self.ready = True
+
+    async def warm_up(self) -> None:
+        # One round trip to every table at once opens the pooled connections
+        # the first requests would otherwise wait on
+        started = time.perf_counter()
+        tables = [
+            self.users_table_client,
+            self.shoppinglists_table_client,
+            self.items_table_client,
+            self.memberships_table_client,
+            self.listitems_table_client,
+            self.listchanges_table_client,
+        ]
+        results = await asyncio.gather(
+            *(x.query_page("", 1) for x in tables), return_exceptions=True
+        )
+        for result in results:
+            # A table that doesn't exist yet is created by its first write
+            if isinstance(result, BaseException) and not isinstance(
+                result, ResourceNotFoundError
+            ):
+                raise result
+        await self.build_item_index()
+        self.logger.info(f"Warmed up in {time.perf_counter() - started:.3f} seconds")
+
+    async def close(self) -> None:
+        self.ready = False
+        if self.bus_poller is not None:
+            self.bus_poller.cancel()
+        self.bus.close()
+        await self.storage.close()
+
+    async def _poll_bus(self) -> None:
+        while True:
+            await asyncio.sleep(settings.bus_poll_interval)
+            self.bus.poll()
+
+    def _apply(self, message: dict) -> None:
+        # Runs in every worker for every change, the one making it included
+        kind = message["kind"]
+        if kind == "user":
+            self.users_cache.invalidate(message["id"])
+            self.user_pages.clear()
+        elif kind == "users":
+            self.users_cache.clear()
+            self.user_pages.clear()
+        elif kind == "item":
+            self.items_cache.invalidate(message["id"])
+            self.item_pages.clear()
+            if message["name"] is None:
+                self.item_index.remove(message["id"])
+            else:
+                self.item_index.add(message["id"], message["name"])
+        elif kind == "items":
+            self.items_cache.clear()
+            self.item_pages.clear()
+            self.item_index_stale = True
+        elif kind == "memberships":
+            # Nothing cached to drop, but moving ``applied`` keeps the users'
+            # listings from joining a read that started before the change
+            pass
+        elif kind == "event":
+            self.feed.publish(message["shoppinglist"], message["event"])
+        elif kind == "checkpoint":
+            self.feed.restore(message["versions"])
+
+    def _checkpoint(self) -> dict:
+        # What a worker that starts later can't get from storage
+        return {"kind": "checkpoint", "versions": self.feed.versions()}
+
+    def _shared(
+        self, name: str, key: Hashable, call: Callable[[], Awaitable]
+    ) -> Awaitable:
+        # Joins an identical read that is already in flight, unless a change
+        # has been applied since it started, which it might not reflect. So a
+        # read never returns anything older than the request that made it.
+        self.bus.poll()
+        return self.flights.run(name, (key, self.bus.applied), call)
+
+    def _fill(self, cache: TTLCache, key: Hashable, value: object, seen: int) -> None:
+        # A change applied while the value was being read may be newer than
+        # it, so it's only cached when nothing has come in since ``seen``
+        self.bus.poll()
+        if self.bus.applied == seen:
+            cache.set(key, value)
+
+    async def _add_memberships(
+        self, shoppinglist_id: str, user_ids: list[str]
+    ) -> None:
+        await asyncio.gather(
+            *(
+                self.memberships_table_client.upsert_entity(
+                    entity={"PartitionKey": user_id, "RowKey": shoppinglist_id}
+                )
+                for user_id in set(user_ids)
+            )
+        )
+
+    async def _remove_memberships(
+        self, shoppinglist_id: str, user_ids: list[str]
+    ) -> None:
+        await asyncio.gather(
+            *(
+                self.memberships_table_client.delete_entity(
+                    partition_key=user_id, row_key=shoppinglist_id
+                )
+                for user_id in set(user_ids)
+            )
         )
-        self.users_table_client = self.table_service.get_table_client("users")
-        self.shoppinglists_table_client = self.table_service.get_table_client("lists")
-        self.items_table_client = self.table_service.get_table_client("items")
+
+    async def _get_many(self, getter: Callable, ids: list[str]) -> list:
+        # Parallel point reads, ids that don't exist are left out of the result
+        results = await asyncio.gather(
+            *(getter(x) for x in dict.fromkeys(ids)), return_exceptions=True
+        )
+        found = []
+        for result in results:
+            if isinstance(result, ResourceNotFoundError):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            found.append(result)
+        return found
+
+    async def _list_page(
+        self,
+        table: Table,
+        pages: TTLCache,
+        model: type[BaseModel],
+        partition_key: str,
+        limit: int,
+        continuation: str | None,
+        select: list[str] | None,
+        prefix: str | None,
+    ) -> tuple[list, str | None]:
+        # One page of a catalogue partition, as models or, with select, as dicts
+        # holding the id and the selected fields only
+        key = (limit, continuation, None if select is None else tuple(select), prefix)
+        # Only first pages are cached. The ones after are reached by walking
+        # a whole listing, which would otherwise all be kept in memory
+        cacheable = continuation is None
+        self.bus.poll()
+        cached = pages.get(key) if cacheable else MISSING
+        if cached is not MISSING:
+            return list(cached[0]), cached[1]
+        seen = self.bus.applied
+
+        async def read() -> tuple[list, str | None]:
+            page = await table.query_page(
+                partition_key,
+                limit,
+                continuation,
+                select=None if select is None else [x for x in select if x != "id"],
+                starts_with=("name", prefix) if prefix else None,
+            )
+            rows = []
+            for entity in page.entities:
+                entity["id"] = entity["RowKey"]
+                if select is None:
+                    # Validated when written, so there's no need to check it again
+                    rows.append(model.model_construct(**entity))
+                else:
+                    rows.append({x: entity[x] for x in ("id", *select) if x in entity})
+            return rows, page.continuation
+
+        rows, next_continuation = await self._shared(f"{table.name} page", key, read)
+        if cacheable:
+            self._fill(pages, key, (rows, next_continuation), seen)
+        return list(rows), next_continuation
+
+    def cache_stats(self) -> dict:
+        return {
+            "users": self.users_cache.stats(),
+            "items": self.items_cache.stats(),
+            "user_pages": self.user_pages.stats(),
+            "item_pages": self.item_pages.stats(),
+            # Storage reads started and identical ones that joined them, per kind
+            "reads": self.flights.stats(),
+            # Item edits to lists and the writes they were merged into
+            "list_writes": self.list_writes and self.list_writes.stats(),
+        }
 
     @log
-    def test(self) -> Test:
+    async def test(self) -> Test:
         return {"test": "Dw it's working"}
 
     @log
-    def create_user(self, user: UserCreate) -> User:
+    async def create_user(self, user: UserCreate) -> User:
         row_key = make_rowid(user.email)
         entity = {
             "PartitionKey": "user",
@@ -58,204 +307,1158 @@ class Controller:
             "name": user.name.strip(),
         }
         try:
-            self.users_table_client.create_entity(entity=entity)
-            return User(id=row_key, **user.model_dump())
+            await self.users_table_client.create_entity(entity=entity)
         except ResourceExistsError as e:
             error_message = "A user with the name and email provided already exists."
             raise ResourceExistsError(error_message) from e
+        self.bus.publish({"kind": "user", "id": row_key})
+        return User(id=row_key, **user.model_dump())
 
     @log
-    def get_user(self, user_id: str) -> User:
-        entity = self.users_table_client.get_entity(
-            partition_key="user", row_key=user_id
+    async def get_user(self, user_id: str) -> User:
+        self.bus.poll()
+        cached = self.users_cache.get(user_id)
+        if cached is not MISSING:
+            return cached
+        seen = self.bus.applied
+        entity = await self._shared(
+            "user",
+            user_id,
+            lambda: self.users_table_client.get_entity(
+                partition_key="user", row_key=user_id
+            ),
+        )
+        user = User.model_construct(
+            id=entity["RowKey"], email=entity["email"], name=entity["name"]
         )
-        return User(id=entity["RowKey"], email=entity["email"], name=entity["name"])
+        self._fill(self.users_cache, user_id, user, seen)
+        return user
 
     @log
-    def update_user(self, user_id: str, user: UserUpdate) -> User:
-        entity = self.users_table_client.get_entity(
+    async def get_users(self, user_ids: list[str]) -> list[User]:
+        return await self._get_many(self.get_user, user_ids)
+
+    @log
+    async def update_user(self, user_id: str, user: UserUpdate) -> User:
+        entity = await self.users_table_client.get_entity(
             partition_key="user", row_key=user_id
         )
 
         if user.name is not None:
             entity["name"] = user.name
 
-        self.users_table_client.update_entity(entity=entity, mode=UpdateMode.REPLACE)
+        await self.users_table_client.update_entity(entity=entity)
+        self.bus.publish({"kind": "user", "id": user_id})
         return User(id=user_id, email=entity["email"], name=entity["name"])
 
     @log
-    def delete_user(self, user_id: str) -> dict:
-        self.users_table_client.delete_entity(partition_key="user", row_key=user_id)
+    async def delete_user(self, user_id: str) -> dict:
+        await self.users_table_client.delete_entity(
+            partition_key="user", row_key=user_id
+        )
+        self.bus.publish({"kind": "user", "id": user_id})
         return {"message": f"User {user_id} deleted"}
 
     @log
-    def list_users(self) -> list[User]:
-        all_entities = list(self.users_table_client.list_entities())
-        for entity in all_entities:
-            entity["id"] = entity["RowKey"]
-        return [User.model_validate(entity) for entity in all_entities]
+    async def list_users(
+        self,
+        limit: int,
+        continuation: str | None = None,
+        select: list[str] | None = None,
+        prefix: str | None = None,
+    ) -> tuple[list[User | dict], str | None]:
+        return await self._list_page(
+            self.users_table_client,
+            self.user_pages,
+            User,
+            "user",
+            limit,
+            continuation,
+            select,
+            prefix,
+        )
 
     # ShoppingLists db
+    def _to_shoppinglist(
+        self,
+        entity: Entity,
+        members: list[str] | None = None,
+        items: list[str] | None = None,
+    ) -> ShoppingList:
+        # Callers that have just decoded or written a blob column pass it in,
+        # so each one is only parsed once per request
+        return ShoppingList.model_construct(
+            id=entity["RowKey"],
+            name=entity["name"],
+            owner=entity["owner"],
+            items=load_list(entity["items"]) if items is None else items,
+            members=load_list(entity["members"]) if members is None else members,
+            etag=entity.etag,
+            version=entity.get("version", 0),
+        )
+
+    async def _list_item_rows(self, shoppinglist_id: str) -> list[Entity]:
+        rows = self.listitems_table_client.query_entities(shoppinglist_id)
+        return sorted([x async for x in rows], key=lambda x: x["position"])
+
+    async def _load_shoppinglist(
+        self,
+        entity: Entity,
+        members: list[str] | None = None,
+        items: list[str] | None = None,
+    ) -> ShoppingList:
+        # Lists without an items blob keep one row per item in listitems
+        if "items" in entity:
+            return self._to_shoppinglist(entity, members, items)
+        rows = await self._list_item_rows(entity["RowKey"])
+        return ShoppingList.model_construct(
+            id=entity["RowKey"],
+            name=entity["name"],
+            owner=entity["owner"],
+            items=[x["RowKey"] for x in rows],
+            members=load_list(entity["members"]) if members is None else members,
+            etag=combined_etag([entity.etag, *(x.etag for x in rows)]),
+            version=entity.get("version", 0),
+        )
+
+    async def _publish(
+        self, shoppinglist: ShoppingList, event_type: str, **fields  # noqa: ANN003
+    ) -> None:
+        await self._record(
+            shoppinglist.id,
+            shoppinglist.version,
+            [{"type": event_type, "etag": shoppinglist.etag, **fields}],
+        )
+
+    async def _record(
+        self, shoppinglist_id: str, version: int, events: list[dict]
+    ) -> None:
+        # Written after the list, so a failure in between leaves a gap in the
+        # log, which list_changes answers with a resync
+        events = [{"version": version, **x} for x in events]
+        table = self.listchanges_table_client
+        writes = [
+            table.upsert_entity(
+                entity={
+                    "PartitionKey": shoppinglist_id,
+                    "RowKey": change_key(version),
+                    "events": dump_list(events),
+                }
+            )
+        ]
+        if version > settings.change_log_size:
+            writes.append(
+                table.delete_entity(
+                    partition_key=shoppinglist_id,
+                    row_key=change_key(version - settings.change_log_size),
+                )
+            )
+        await asyncio.gather(*writes)
+        for event in events:
+            self._publish_event(shoppinglist_id, event)
+
+    async def _clear_changes(self, shoppinglist_id: str) -> None:
+        table = self.listchanges_table_client
+        await asyncio.gather(
+            *[
+                table.delete_entity(partition_key=shoppinglist_id, row_key=x["RowKey"])
+                async for x in table.query_entities(shoppinglist_id)
+            ]
+        )
+
+    def _publish_event(self, shoppinglist_id: str, event: dict) -> None:
+        self.bus.publish(
+            {"kind": "event", "shoppinglist": shoppinglist_id, "event": event}
+        )
+
+    async def _modify_shoppinglist(
+        self,
+        shoppinglist_id: str,
+        modify: Callable[[Entity], bool],
+        if_match: str | None = None,
+        entity: Entity | None = None,
+    ) -> Entity:
+        # ``modify`` changes the entity in place and returns whether anything
+        # changed. Conflicts are retried from a fresh read unless ``if_match``
+        if if_match is not None and entity is None:
+            entity = await self.shoppinglists_table_client.get_entity(
+                partition_key="shoppinglist", row_key=shoppinglist_id
+            )
+        if if_match is not None and "items" not in entity:
+            # Row lists hand out the ETag of the list and its item rows
+            current = await self._load_shoppinglist(entity)
+            if current.etag != if_match:
+                raise ResourceModifiedError("The shopping list has been modified.")
+            if_match = entity.etag
+        attempts = 0
+        while True:
+            if entity is None:
+                entity = await self.shoppinglists_table_client.get_entity(
+                    partition_key="shoppinglist", row_key=shoppinglist_id
+                )
+            if if_match is not None and entity.etag != if_match:
+                raise ResourceModifiedError("The shopping list has been modified.")
+            if not modify(entity):
+                return entity
+            entity["version"] = entity.get("version", 0) + 1
+            try:
+                entity.etag = await self.shoppinglists_table_client.update_entity(
+                    entity=entity, etag=entity.etag
+                )
+                return entity
+            except ResourceModifiedError:
+                attempts += 1
+                if if_match is not None or attempts > settings.write_retries:
+                    raise
+                self.logger.info(f"Write conflict on {shoppinglist_id}, retrying")
+                entity = None
+
+    async def _advance(
+        self, shoppinglist_id: str, entity: Entity
+    ) -> tuple[Entity, bool]:
+        # The rows are already written, so this retries until it lands. Not
+        # in order when another change got in since ``entity`` was read
+        version = entity.get("version", 0)
+        while True:
+            entity["version"] = entity.get("version", 0) + 1
+            try:
+                entity.etag = await self.shoppinglists_table_client.update_entity(
+                    entity=entity, etag=entity.etag
+                )
+                return entity, entity["version"] == version + 1
+            except ResourceModifiedError:
+                entity = await self.shoppinglists_table_client.get_entity(
+                    partition_key="shoppinglist", row_key=shoppinglist_id
+                )
+
+    async def _write_item_rows(
+        self,
+        shoppinglist_id: str,
+        rows: list[Entity],
+        item_ids: list[str],
+        added_by: dict[str, str | None] | None = None,
+        atomic: bool = True,
+    ) -> None:
+        # Only writes the rows that differ, appending keeps existing positions.
+        # Unless ``atomic`` is off they have to fit in one transaction
+        by_id = {x["RowKey"]: x for x in rows}
+        wanted = set(item_ids)
+        kept = [x for x in item_ids if x in by_id]
+        appending = (
+            kept == [x["RowKey"] for x in rows if x["RowKey"] in wanted]
+            and item_ids[: len(kept)] == kept
+        )
+        start = rows[-1]["position"] + 1 - len(kept) if rows and appending else 0
+        added_at = datetime.now(UTC).isoformat()
+        added_by = added_by or {}
+
+        # Rows read from the table carry their ETag, so updates and deletes
+        # only apply to the version that was read
+        operations = [("delete", x) for x in rows if x["RowKey"] not in wanted]
+        for position, item_id in enumerate(item_ids, start=start):
+            row = by_id.get(item_id)
+            if row is None:
+                entity = {
+                    "PartitionKey": shoppinglist_id,
+                    "RowKey": item_id,
+                    "position": position,
+                    "quantity": 1,
+                    "checked": False,
+                    "added_by": added_by.get(item_id),
+                    "added_at": added_at,
+                }
+                operations.append(("create", entity))
+            elif not appending and row["position"] != position:
+                row["position"] = position
+                operations.append(("update", row))
+        if not operations:
+            return
+        if len(operations) <= MAX_TRANSACTION:
+            await self.listitems_table_client.submit_transaction(operations)
+            return
+        if atomic:
+            # Readers would see half the change if it failed partway
+            raise ValueError(
+                f"A change can write at most {MAX_TRANSACTION} of a list's items"
+            )
+
+        # Rows no one reads yet or any more, so each is written on its own
+        table = self.listitems_table_client
+        writes = []
+        for operation, x in operations:
+            if operation == "delete":
+                writes.append(
+                    table.delete_entity(
+                        partition_key=shoppinglist_id, row_key=x["RowKey"], etag=x.etag
+                    )
+                )
+            elif operation == "create":
+                writes.append(table.create_entity(entity=x))
+            else:
+                writes.append(table.update_entity(entity=x, etag=x.etag))
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _set_items(
+        self,
+        shoppinglist_id: str,
+        change: Callable[[list[str]], list[str]],
+        if_match: str | None = None,
+        added_by: str | None = None,
+    ) -> ShoppingList:
+        # Edits without if_match are held for write_coalesce_window when set
+        if if_match is None and self.list_writes is not None:
+            return await self.list_writes.submit(shoppinglist_id, (change, added_by))
+        return await self._write_items(shoppinglist_id, [(change, added_by)], if_match)
+
+    async def _write_items(
+        self,
+        shoppinglist_id: str,
+        changes: list[tuple[Callable[[list[str]], list[str]], str | None]],
+        if_match: str | None = None,
+    ) -> ShoppingList:
+        # Applies ``(change, added_by)`` pairs in order with one read and one
+        # write of the list, publishing a single event for all of them
+        def apply(current_items: list[str]) -> tuple[list[str], dict]:
+            items, added_by = current_items, {}
+            for change, who in changes:
+                before = set(items)
+                items = list(dict.fromkeys(change(items)))
+                added_by.update({x: who for x in items if x not in before})
+            return items, added_by
+
+        entity = await self.shoppinglists_table_client.get_entity(
+            partition_key="shoppinglist", row_key=shoppinglist_id
+        )
+        if "items" in entity:
+            delta, items = None, []
+
+            def modify(entity: Entity) -> bool:
+                nonlocal delta
+                current_items = load_list(entity["items"])
+                items[:] = apply(current_items)[0]
+                # Only the attempt that gets written is published
+                delta = None
+                if items == current_items:
+                    return False
+                entity["items"] = dump_list(items)
+                delta = list_delta(current_items, items)
+                return True
+
+            entity = await self._modify_shoppinglist(
+                shoppinglist_id, modify, if_match, entity=entity
+            )
+            updated = self._to_shoppinglist(entity, items=items)
+            if delta is not None:
+                await self._publish(updated, "items", **delta)
+            return updated
+
+        attempts = 0
+        while True:
+            rows = await self._list_item_rows(shoppinglist_id)
+            etag = combined_etag([entity.etag, *(x.etag for x in rows)])
+            if if_match is not None and etag != if_match:
+                raise ResourceModifiedError("The shopping list has been modified.")
+            current_items = [x["RowKey"] for x in rows]
+            new_items, added_by = apply(current_items)
+            if new_items == current_items:
+                return await self._load_shoppinglist(entity)
+            try:
+                await self._write_item_rows(shoppinglist_id, rows, new_items, added_by)
+            except ValueError:
+                if len(changes) == 1:
+                    raise
+                # Edits held together that only fit one at a time
+                for change in changes:
+                    updated = await self._write_items(shoppinglist_id, [change])
+                return updated
+            except (ResourceExistsError, ResourceModifiedError, ResourceNotFoundError):
+                attempts += 1
+                if if_match is not None or attempts > settings.write_retries:
+                    raise ResourceModifiedError(
+                        "The shopping list has been modified."
+                    ) from None
+                self.logger.info(f"Write conflict on {shoppinglist_id}, retrying")
+                continue
+            entity, in_order = await self._advance(shoppinglist_id, entity)
+            updated = await self._load_shoppinglist(entity)
+            if in_order:
+                await self._publish(
+                    updated, "items", **list_delta(current_items, new_items)
+                )
+            else:
+                await self._publish(updated, "resync")
+            return updated
+
     @log
-    def create_shoppinglist(self, shoppinglist: ShoppingListCreate) -> ShoppingList:
+    async def create_shoppinglist(
+        self, shoppinglist: ShoppingListCreate
+    ) -> ShoppingList:
         row_key = make_rowid(f"{shoppinglist.name}_{shoppinglist.owner}")
         entity = {
             "PartitionKey": "shoppinglist",
             "RowKey": row_key,
             "name": shoppinglist.name,
             "owner": shoppinglist.owner,
-            "members": json.dumps(shoppinglist.members),
-            "items": json.dumps(shoppinglist.items),
+            "members": dump_list(shoppinglist.members),
         }
+        if settings.list_layout == "blob":
+            entity["items"] = dump_list(shoppinglist.items)
         try:
-            self.shoppinglists_table_client.create_entity(entity=entity)
-            return ShoppingList(id=row_key, **shoppinglist.model_dump())
+            etag = await self.shoppinglists_table_client.create_entity(entity=entity)
         except ResourceExistsError as e:
             error_message = "You already have a shopping list with that name."
             raise ResourceExistsError(error_message) from e
+        if settings.list_layout == "rows":
+            # Before the list is indexed, so it's never listed without the
+            # items it was created with
+            items = list(dict.fromkeys(shoppinglist.items))
+            await self._write_item_rows(
+                row_key,
+                [],
+                items,
+                dict.fromkeys(items, shoppinglist.owner),
+                atomic=False,
+            )
+        user_ids = [shoppinglist.owner, *shoppinglist.members]
+        await self._add_memberships(row_key, user_ids)
+        self.bus.publish({"kind": "memberships", "users": list(set(user_ids))})
+        if settings.list_layout == "rows":
+            return await self.get_shoppinglist(row_key)
+        return ShoppingList.model_construct(
+            id=row_key, etag=etag, **shoppinglist.model_dump()
+        )
 
     @log
-    def get_shoppinglist(self, shoppinglist_id: str) -> ShoppingList:
-        entity = self.shoppinglists_table_client.get_entity(
-            partition_key="shoppinglist", row_key=shoppinglist_id
-        )
-        return ShoppingList(
-            id=entity["RowKey"],
-            name=entity["name"],
-            owner=entity["owner"],
-            items=json.loads(entity["items"]),
-            members=json.loads(entity["members"]),
-        )
+    async def get_shoppinglist(self, shoppinglist_id: str) -> ShoppingList:
+        async def read() -> ShoppingList:
+            entity = await self.shoppinglists_table_client.get_entity(
+                partition_key="shoppinglist", row_key=shoppinglist_id
+            )
+            return await self._load_shoppinglist(entity)
+
+        return await self._shared("shoppinglist", shoppinglist_id, read)
 
     @log
-    def update_shoppinglist(
-        self, shoppinglist_id: str, shoppinglist: ShoppingListUpdate
+    async def update_shoppinglist(
+        self,
+        shoppinglist_id: str,
+        shoppinglist: ShoppingListUpdate,
+        if_match: str | None = None,
     ) -> ShoppingList:
-        entity = self.shoppinglists_table_client.get_entity(
+        entity = await self.shoppinglists_table_client.get_entity(
             partition_key="shoppinglist", row_key=shoppinglist_id
         )
+        uses_rows = "items" not in entity
+        if uses_rows and shoppinglist.items is not None:
+            # The item rows are a change of their own, written first so that
+            # If-Match is checked against the rows they replace
+            updated = await self._set_items(
+                shoppinglist_id, lambda _: shoppinglist.items, if_match
+            )
+            if shoppinglist.members is None:
+                return updated
+            # The members then go on from the list as the items left it
+            entity = None
+            if if_match is not None:
+                if_match = updated.etag
 
-        if shoppinglist.items is not None:
-            entity["items"] = json.dumps(shoppinglist.items)
-        if shoppinglist.members is not None:
-            entity["members"] = json.dumps(shoppinglist.members)
+        current_members, current_items, changed = [], [], set()
+
+        def modify(entity: Entity) -> bool:
+            changed.clear()
+            current_members[:] = load_list(entity["members"])
+            if shoppinglist.members not in (None, current_members):
+                entity["members"] = dump_list(shoppinglist.members)
+                changed.add("members")
+            # Row lists have written their items on their own, above
+            if shoppinglist.items is not None and not uses_rows:
+                current_items[:] = load_list(entity["items"])
+                if shoppinglist.items != current_items:
+                    entity["items"] = dump_list(shoppinglist.items)
+                    changed.add("items")
+            return bool(changed)
 
-        self.shoppinglists_table_client.update_entity(
-            entity=entity, mode=UpdateMode.REPLACE
+        entity = await self._modify_shoppinglist(
+            shoppinglist_id, modify, if_match, entity=entity
         )
-        return ShoppingList(
-            id=shoppinglist_id,
-            name=entity["name"],
-            owner=entity["owner"],
-            items=json.loads(entity["items"]),
-            members=json.loads(entity["members"]),
+        if shoppinglist.members is not None:
+            await self._add_memberships(
+                shoppinglist_id, list(set(shoppinglist.members) - set(current_members))
+            )
+            removed = set(current_members) - set(shoppinglist.members)
+            await self._remove_memberships(
+                shoppinglist_id, list(removed - {entity["owner"]})
+            )
+        updated = await self._load_shoppinglist(
+            entity,
+            members=(
+                current_members
+                if shoppinglist.members is None
+                else shoppinglist.members
+            ),
+            items=None if uses_rows else shoppinglist.items,
         )
+        # One write, so one version for both
+        events = []
+        if "members" in changed:
+            delta = list_delta(current_members, shoppinglist.members)
+            events.append({"type": "members", "etag": updated.etag, **delta})
+        if "items" in changed:
+            delta = list_delta(current_items, shoppinglist.items)
+            events.append({"type": "items", "etag": updated.etag, **delta})
+        if events:
+            await self._record(shoppinglist_id, updated.version, events)
+        return updated
 
     @log
-    def delete_shoppinglist(self, shoppinglist_id: str) -> dict:
-        self.shoppinglists_table_client.delete_entity(
+    async def delete_shoppinglist(
+        self, shoppinglist_id: str, if_match: str | None = None
+    ) -> dict:
+        entity = await self.shoppinglists_table_client.get_entity(
             partition_key="shoppinglist", row_key=shoppinglist_id
         )
+        if if_match is not None:
+            current = await self._load_shoppinglist(entity)
+            if current.etag != if_match:
+                raise ResourceModifiedError("The shopping list has been modified.")
+        # Conditional, so members invited in the meantime aren't left indexed
+        await self.shoppinglists_table_client.delete_entity(
+            partition_key="shoppinglist", row_key=shoppinglist_id, etag=entity.etag
+        )
+        await self._remove_memberships(
+            shoppinglist_id, [entity["owner"], *load_list(entity["members"])]
+        )
+        if "items" not in entity:
+            await self._write_item_rows(
+                shoppinglist_id,
+                await self._list_item_rows(shoppinglist_id),
+                [],
+                atomic=False,
+            )
+        # The change log goes with the list, so the deletion isn't logged
+        await self._clear_changes(shoppinglist_id)
+        self._publish_event(
+            shoppinglist_id,
+            {"version": entity.get("version", 0) + 1, "type": "deleted"},
+        )
         return {"message": f"ShoppingList {shoppinglist_id} deleted"}
 
+    async def watch_shoppinglist(self, shoppinglist_id: str) -> AsyncIterator[dict]:
+        # Subscribes before reading the snapshot so nothing falls in between,
+        # events up to the snapshot's version may already be in it
+        async with self.feed.subscribe(shoppinglist_id) as queue:
+            snapshot = await self.get_shoppinglist(shoppinglist_id)
+            yield {
+                "version": snapshot.version,
+                "type": "snapshot",
+                "etag": snapshot.etag,
+                "list": snapshot.model_dump(),
+            }
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), settings.feed_heartbeat
+                    )
+                except TimeoutError:
+                    yield {"type": "heartbeat"}
+                    continue
+                yield event
+                if event["type"] == "deleted":
+                    return
+
     @log
-    def list_shoppinglists(self, user_id: str) -> list[ShoppingList]:
-        all_entities = list(self.shoppinglists_table_client.list_entities())
-        for entity in all_entities:
-            entity["id"] = entity["RowKey"]
-            entity["members"] = json.loads(entity["members"])
-            entity["items"] = json.loads(entity["items"])
-        return [
-            ShoppingList.model_validate(entity)
-            for entity in all_entities
-            if user_id in [entity["owner"], *entity["members"]]
-        ]
-    
-    def invite_to_shopping(self, shoppinglist_id: str, email: EmailRequest):
-        print(email)
-        entity = self.shoppinglists_table_client.get_entity(
+    async def list_changes(self, shoppinglist_id: str, since: int) -> ListChanges:
+        # One range query over the log. Anything the log can't answer for is
+        # a resync: too old, newer than the list, or a missing entry
+        entity = await self.shoppinglists_table_client.get_entity(
             partition_key="shoppinglist", row_key=shoppinglist_id
         )
-        current_members = json.loads(entity["members"])
-        if make_rowid(email.email) not in current_members:
-            entity["members"] = json.dumps([*current_members, make_rowid(email.email)])
-            self.shoppinglists_table_client.update_entity(
-                entity=entity, mode=UpdateMode.REPLACE
+        version = entity.get("version", 0)
+        resync = ListChanges(version=version, resync=True)
+        if since > version or version - since > settings.change_log_size:
+            return resync
+        if since == version:
+            return ListChanges(version=version)
+        entries = self.listchanges_table_client.query_entities(
+            shoppinglist_id, after=change_key(since)
+        )
+        try:
+            # Entries past ``version`` are from changes made since it was read
+            logged = [x async for x in entries if x["RowKey"] <= change_key(version)]
+        except ResourceNotFoundError:
+            return resync
+        expected = [change_key(x) for x in range(since + 1, version + 1)]
+        if [x["RowKey"] for x in logged] != expected:
+            return resync
+        changes = [y for x in logged for y in load_list(x["events"])]
+        if any(x["type"] == "resync" for x in changes):
+            return resync
+        return ListChanges(version=version, changes=changes)
+
+    async def _membership_page(
+        self, user_id: str, limit: int | None, continuation: str | None
+    ) -> tuple[list[str], str | None]:
+        async def read() -> tuple[list[str], str | None]:
+            if limit is None:
+                memberships = self.memberships_table_client.query_entities(user_id)
+                return [x["RowKey"] async for x in memberships], None
+            page = await self.memberships_table_client.query_page(
+                user_id, limit, continuation
             )
-        return ShoppingList(
-            id=shoppinglist_id,
-            name=entity["name"],
-            owner=entity["owner"],
-            items=json.loads(entity["items"]),
-            members=json.loads(entity["members"]),
+            return [x["RowKey"] for x in page.entities], page.continuation
+
+        return await self._shared("memberships", (user_id, limit, continuation), read)
+
+    @log
+    async def list_shoppinglist_ids(self, user_id: str) -> list[str]:
+        # Only the memberships index, none of the lists themselves
+        shoppinglist_ids, _ = await self._membership_page(user_id, None, None)
+        return shoppinglist_ids
+
+    @log
+    async def list_shoppinglists(
+        self, user_id: str, limit: int | None = None, continuation: str | None = None
+    ) -> tuple[list[ShoppingList], str | None]:
+        shoppinglist_ids, continuation = await self._membership_page(
+            user_id, limit, continuation
         )
-    
-    def delete_from_shopping(self, shoppinglist_id: str, email: EmailRequest):
-        entity = self.shoppinglists_table_client.get_entity(
-            partition_key="shoppinglist", row_key=shoppinglist_id
+        results = await asyncio.gather(
+            *(self.get_shoppinglist(x) for x in shoppinglist_ids),
+            return_exceptions=True,
         )
-        current_members = json.loads(entity["members"])
-        if make_rowid(email.email) in current_members:
-            current_members.remove(make_rowid(email.email))
-            entity["members"] = json.dumps(current_members)
-            self.shoppinglists_table_client.update_entity(
-                entity=entity, mode=UpdateMode.REPLACE
+        shoppinglists = []
+        for shoppinglist_id, result in zip(shoppinglist_ids, results, strict=True):
+            if isinstance(result, ResourceNotFoundError):
+                # Index row outlived its list, clean it up on the way past
+                await self._remove_memberships(shoppinglist_id, [user_id])
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                shoppinglists.append(result)
+        return shoppinglists, continuation
+
+    @log
+    async def expand_shoppinglists(
+        self, shoppinglists: list[ShoppingList], expand: set[str]
+    ) -> list[ShoppingListExpanded]:
+        # Resolve the ids of every list in batches per kind, then embed them
+        async def resolve(get_many: Callable, ids: list[str]) -> dict:
+            ids = list(dict.fromkeys(ids))
+            found = {}
+            for i in range(0, len(ids), MAX_BATCH_SIZE):
+                batch = await get_many(ids[i : i + MAX_BATCH_SIZE])
+                found.update({x.id: x for x in batch})
+            return found
+
+        items, members = {}, {}
+        if "items" in expand:
+            item_ids = [x for slist in shoppinglists for x in slist.items]
+            items = await resolve(self.get_items, item_ids)
+        if "members" in expand:
+            member_ids = [x for slist in shoppinglists for x in slist.members]
+            members = await resolve(self.get_users, member_ids)
+        return [
+            ShoppingListExpanded.model_construct(
+                id=slist.id,
+                name=slist.name,
+                owner=slist.owner,
+                etag=slist.etag,
+                version=slist.version,
+                items=[items[x] for x in slist.items if x in items]
+                if "items" in expand
+                else slist.items,
+                members=[members[x] for x in slist.members if x in members]
+                if "members" in expand
+                else slist.members,
             )
-        return ShoppingList(
-            id=shoppinglist_id,
-            name=entity["name"],
-            owner=entity["owner"],
-            items=json.loads(entity["items"]),
-            members=json.loads(entity["members"]),
-        )
+            for slist in shoppinglists
+        ]
+
+    @log
+    async def backfill_memberships(self) -> dict:
+        count = 0
+        async for entity in self.shoppinglists_table_client.list_entities():
+            await self._add_memberships(
+                entity["RowKey"], [entity["owner"], *load_list(entity["members"])]
+            )
+            count += 1
+        return {"message": f"Indexed memberships for {count} shopping lists"}
     
-    def delete_item_from_shopping(self, shoppinglist_id: str, item: ItemName):
-        entity = self.shoppinglists_table_client.get_entity(
+    async def invite_to_shopping(
+        self, shoppinglist_id: str, email: EmailRequest, if_match: str | None = None
+    ) -> ShoppingList:
+        user_id = make_rowid(email.email)
+
+        changed = False
+        members = []
+
+        def modify(entity: Entity) -> bool:
+            nonlocal changed
+            members[:] = load_list(entity["members"])
+            changed = user_id not in members
+            if changed:
+                members.append(user_id)
+                entity["members"] = dump_list(members)
+            return changed
+
+        entity = await self._modify_shoppinglist(shoppinglist_id, modify, if_match)
+        await self._add_memberships(shoppinglist_id, [user_id])
+        updated = await self._load_shoppinglist(entity, members)
+        if changed:
+            await self._publish(updated, "members", added=[user_id], removed=[])
+        return updated
+
+    async def delete_from_shopping(
+        self, shoppinglist_id: str, email: EmailRequest, if_match: str | None = None
+    ) -> ShoppingList:
+        user_id = make_rowid(email.email)
+
+        changed = False
+        members = []
+
+        def modify(entity: Entity) -> bool:
+            nonlocal changed
+            members[:] = load_list(entity["members"])
+            changed = user_id in members
+            if changed:
+                members.remove(user_id)
+                entity["members"] = dump_list(members)
+            return changed
+
+        entity = await self._modify_shoppinglist(shoppinglist_id, modify, if_match)
+        if user_id != entity["owner"]:
+            await self._remove_memberships(shoppinglist_id, [user_id])
+        updated = await self._load_shoppinglist(entity, members)
+        if changed:
+            await self._publish(updated, "members", added=[], removed=[user_id])
+        return updated
+
+    async def delete_item_from_shopping(
+        self, shoppinglist_id: str, item: ItemName, if_match: str | None = None
+    ) -> ShoppingList:
+        item_id = make_rowid(item.item)
+        return await self._set_items(
+            shoppinglist_id, lambda items: [x for x in items if x != item_id], if_match
+        )
+
+    @log
+    async def add_items_to_shopping(
+        self, shoppinglist_id: str, items: ItemsAdd, if_match: str | None = None
+    ) -> ShoppingList:
+        return await self._set_items(
+            shoppinglist_id,
+            lambda current: [*current, *items.items],
+            if_match,
+            added_by=items.added_by,
+        )
+
+    @log
+    async def remove_items_from_shopping(
+        self, shoppinglist_id: str, items: ItemIds, if_match: str | None = None
+    ) -> ShoppingList:
+        removed = set(items.items)
+        return await self._set_items(
+            shoppinglist_id,
+            lambda current: [x for x in current if x not in removed],
+            if_match,
+        )
+
+    @log
+    async def reorder_shopping_items(
+        self, shoppinglist_id: str, items: ItemIds, if_match: str | None = None
+    ) -> ShoppingList:
+        def reorder(current_items: list[str]) -> list[str]:
+            # Listed items move to the front in the given order, the rest keep
+            # their relative order behind them. Unknown ids are ignored.
+            present = set(current_items)
+            ordered = [x for x in dict.fromkeys(items.items) if x in present]
+            moved = set(ordered)
+            return ordered + [x for x in current_items if x not in moved]
+
+        return await self._set_items(shoppinglist_id, reorder, if_match)
+
+    @log
+    async def get_list_items(self, shoppinglist_id: str) -> list[ListItem]:
+        entity = await self.shoppinglists_table_client.get_entity(
             partition_key="shoppinglist", row_key=shoppinglist_id
         )
-        current_items = json.loads(entity["items"])
-        if make_rowid(item.item) in current_items:
-            current_items.remove(make_rowid(item.item))
-            entity["items"] = json.dumps(current_items)
-            self.shoppinglists_table_client.update_entity(
-                entity=entity, mode=UpdateMode.REPLACE
+        if "items" in entity:
+            return [ListItem.model_construct(id=x) for x in load_list(entity["items"])]
+        return [
+            ListItem(id=row["RowKey"], **row)
+            for row in await self._list_item_rows(shoppinglist_id)
+        ]
+
+    @log
+    async def update_list_item(
+        self, shoppinglist_id: str, item_id: str, update: ListItemUpdate
+    ) -> ListItem:
+        entity = await self.shoppinglists_table_client.get_entity(
+            partition_key="shoppinglist", row_key=shoppinglist_id
+        )
+        if "items" in entity:
+            raise ValueError(
+                "This list stores its items as a blob, migrate it to per-item rows "
+                "with `python -m app.migrate_items` to set item attributes."
             )
-        return ShoppingList(
-            id=shoppinglist_id,
-            name=entity["name"],
-            owner=entity["owner"],
-            items=json.loads(entity["items"]),
-            members=json.loads(entity["members"]),
+        changes = update.model_dump(exclude_none=True)
+        attempts = 0
+        while True:
+            row = await self.listitems_table_client.get_entity(
+                partition_key=shoppinglist_id, row_key=item_id
+            )
+            row.update(changes)
+            try:
+                await self.listitems_table_client.update_entity(
+                    entity=row, etag=row.etag
+                )
+                break
+            except ResourceModifiedError:
+                attempts += 1
+                if attempts > settings.write_retries:
+                    raise
+        list_item = ListItem(id=item_id, **row)
+        entity, in_order = await self._advance(shoppinglist_id, entity)
+        event = (
+            {"type": "item", "item": list_item.model_dump(mode="json")}
+            if in_order
+            else {"type": "resync"}
         )
+        await self._record(shoppinglist_id, entity["version"], [event])
+        return list_item
 
+    @log
+    async def migrate_list_items(self) -> dict:
+        # Rows go in before the blob is dropped, so it can be re-run safely
+        count = 0
+        async for entity in self.shoppinglists_table_client.list_entities():
+            while "items" in entity:
+                shoppinglist_id = entity["RowKey"]
+                rows = await self._list_item_rows(shoppinglist_id)
+                items = list(dict.fromkeys(load_list(entity["items"])))
+                await self._write_item_rows(
+                    shoppinglist_id,
+                    rows,
+                    items,
+                    dict.fromkeys(items, entity["owner"]),
+                    atomic=False,
+                )
+                del entity["items"]
+                try:
+                    await self.shoppinglists_table_client.update_entity(
+                        entity=entity, etag=entity.etag
+                    )
+                    count += 1
+                except ResourceModifiedError:
+                    entity = await self.shoppinglists_table_client.get_entity(
+                        partition_key="shoppinglist", row_key=shoppinglist_id
+                    )
+        return {"message": f"Migrated {count} shopping lists to per-item rows"}
 
     # Items db
     @log
-    def create_item(self, item: ItemCreate) -> Item:
+    async def create_item(self, item: ItemCreate) -> Item:
         row_key = make_rowid(item.name)
         entity = {"PartitionKey": "item", "RowKey": row_key, "name": item.name}
         try:
-            self.items_table_client.create_entity(entity=entity)
-            return Item(id=row_key, **item.model_dump())
+            await self.items_table_client.create_entity(entity=entity)
         except ResourceExistsError as e:
             error_message = "An item with the name provided already exists."
             raise ResourceExistsError(error_message) from e
+        self.bus.publish({"kind": "item", "id": row_key, "name": item.name})
+        return Item(id=row_key, **item.model_dump())
 
     @log
-    def get_item(self, item_id: str) -> Item:
-        entity = self.items_table_client.get_entity(
-            partition_key="item", row_key=item_id
+    async def get_item(self, item_id: str) -> Item:
+        self.bus.poll()
+        cached = self.items_cache.get(item_id)
+        if cached is not MISSING:
+            return cached
+        seen = self.bus.applied
+        entity = await self._shared(
+            "item",
+            item_id,
+            lambda: self.items_table_client.get_entity(
+                partition_key="item", row_key=item_id
+            ),
         )
-        return Item(id=entity["RowKey"], name=entity["name"])
+        item = Item.model_construct(id=entity["RowKey"], name=entity["name"])
+        self._fill(self.items_cache, item_id, item, seen)
+        return item
 
     @log
-    def delete_item(self, item_id: str) -> dict:
-        self.items_table_client.delete_entity(partition_key="item", row_key=item_id)
+    async def get_items(self, item_ids: list[str]) -> list[Item]:
+        return await self._get_many(self.get_item, item_ids)
+
+    @log
+    async def search_items(self, query: str, limit: int = 10) -> list[Item]:
+        self.bus.poll()
+        if self.item_index_stale:
+            # Searches that come in meanwhile wait on the same scan
+            await self.flights.run("item_index", None, self.build_item_index)
+        return [
+            Item.model_construct(id=item_id, name=name)
+            for item_id, name in self.item_index.search(query, limit)
+        ]
+
+    async def build_item_index(self) -> None:
+        self.item_index_stale = False
+        index = ItemIndex()
+        self.bus.poll()
+        seen = self.bus.applied
+        items = []
+        try:
+            async for entity in self.items_table_client.list_entities():
+                index.add(entity["RowKey"], entity["name"])
+                if len(items) < settings.cache_size:
+                    items.append((entity["RowKey"], entity["name"]))
+        except ResourceNotFoundError:
+            # No items table yet, nothing to index
+            pass
+        # An item changed during the scan may be missing from it, as in _fill,
+        # so the next search scans again
+        self.bus.poll()
+        if self.bus.applied != seen:
+            self.item_index_stale = True
+            self.logger.info("Items changed while indexing, index left stale")
+            return
+        self.item_index = index
+        # The scan has read the items already, so the cache starts out warm
+        for item_id, name in items:
+            self.items_cache.set(item_id, Item.model_construct(id=item_id, name=name))
+        self.logger.info(f"Indexed {len(index)} items for search")
+
+    @log
+    async def delete_item(self, item_id: str) -> dict:
+        await self.items_table_client.delete_entity(
+            partition_key="item", row_key=item_id
+        )
+        self.bus.publish({"kind": "item", "id": item_id, "name": None})
         return {"message": f"Item {item_id} deleted"}
 
     @log
-    def list_items(self) -> list[Item]:
-        all_entities = list(self.items_table_client.list_entities())
-        for entity in all_entities:
-            entity["id"] = entity["RowKey"]
-        return [Item.model_validate(entity) for entity in all_entities]
+    async def list_items(
+        self,
+        limit: int,
+        continuation: str | None = None,
+        select: list[str] | None = None,
+        prefix: str | None = None,
+    ) -> tuple[list[Item | dict], str | None]:
+        return await self._list_page(
+            self.items_table_client,
+            self.item_pages,
+            Item,
+            "item",
+            limit,
+            continuation,
+            select,
+            prefix,
+        )
+
+    # Bulk export / import
+    async def export_users(self) -> AsyncIterator[User]:
+        async for entity in self.users_table_client.list_entities():
+            yield User(id=entity["RowKey"], email=entity["email"], name=entity["name"])
+
+    async def export_items(self) -> AsyncIterator[Item]:
+        async for entity in self.items_table_client.list_entities():
+            yield Item(id=entity["RowKey"], name=entity["name"])
+
+    async def export_shoppinglists(self) -> AsyncIterator[ShoppingList]:
+        async for entity in self.shoppinglists_table_client.list_entities():
+            yield await self._load_shoppinglist(entity)
+
+    async def _import(
+        self,
+        lines: AsyncIterator[tuple[int, bytes]],
+        model: type[BaseModel],
+        key_of: Callable[[BaseModel], str],
+        to_write: Callable[[int, BaseModel, str, str], Write],
+        overwrite: bool,
+        replace: Callable[[list[tuple[str, BaseModel]]], Awaitable] | None = None,
+    ) -> ImportReport:
+        # Rows are written in batches as they are parsed, a bad or clashing
+        # row is reported by line number and the rest carry on. ``replace``
+        # gets the rows an overwrite is about to write, before they are.
+        writer = BatchWriter(settings.import_parallelism)
+        operation = "upsert" if overwrite else "create"
+        total = 0
+        parsed: list[tuple[int, BaseModel]] = []
+
+        async def flush() -> None:
+            row_keys = make_rowids(key_of(row) for _, row in parsed)
+            if overwrite and replace is not None:
+                await replace(list(zip(row_keys, (x for _, x in parsed), strict=True)))
+            for (line, row), row_key in zip(parsed, row_keys, strict=True):
+                await writer.add(to_write(line, row, row_key, operation))
+            parsed.clear()
+
+        async for line, raw in lines:
+            total += 1
+            try:
+                parsed.append((line, model.model_validate_json(raw)))
+            except ValidationError as e:
+                writer.fail(line, str(e))
+                continue
+            if len(parsed) == MAX_TRANSACTION:
+                await flush()
+        await flush()
+        await writer.close()
+        errors = [RowError(line=k, error=v) for k, v in sorted(writer.errors.items())]
+        return ImportReport(
+            imported=total - len(errors), failed=len(errors), errors=errors
+        )
+
+    @log
+    async def import_users(
+        self, lines: AsyncIterator[tuple[int, bytes]], overwrite: bool = False
+    ) -> ImportReport:
+        def to_write(
+            line: int, user: UserCreate, row_key: str, operation: str
+        ) -> Write:
+            entity = {
+                "PartitionKey": "user",
+                "RowKey": row_key,
+                "email": user.email,
+                "name": user.name.strip(),
+            }
+            return Write(line, self.users_table_client, operation, entity)
+
+        try:
+            return await self._import(
+                lines, UserCreate, lambda x: x.email, to_write, overwrite
+            )
+        finally:
+            self.bus.publish({"kind": "users"})
+
+    @log
+    async def import_items(
+        self, lines: AsyncIterator[tuple[int, bytes]], overwrite: bool = False
+    ) -> ImportReport:
+        def to_write(
+            line: int, item: ItemCreate, row_key: str, operation: str
+        ) -> Write:
+            entity = {
+                "PartitionKey": "item",
+                "RowKey": row_key,
+                "name": item.name,
+            }
+            return Write(line, self.items_table_client, operation, entity)
+
+        try:
+            return await self._import(
+                lines, ItemCreate, lambda x: x.name, to_write, overwrite
+            )
+        finally:
+            self.bus.publish({"kind": "items"})
+            await self.build_item_index()
+
+    @log
+    async def import_shoppinglists(
+        self, lines: AsyncIterator[tuple[int, bytes]], overwrite: bool = False
+    ) -> ImportReport:
+        # Lists being overwritten, with the version they move on to
+        replaced: dict[str, int] = {}
+        # Owners and members of the imported lists
+        user_ids: set[str] = set()
+
+        async def replace(rows: list[tuple[str, ShoppingListCreate]]) -> None:
+            # Like delete_shoppinglist, but the rows the new list writes again
+            # are left for it to overwrite
+            async def clear(row_key: str, shoppinglist: ShoppingListCreate) -> None:
+                try:
+                    entity = await self.shoppinglists_table_client.get_entity(
+                        partition_key="shoppinglist", row_key=row_key
+                    )
+                except ResourceNotFoundError:
+                    return
+                replaced[row_key] = entity.get("version", 0) + 1
+                kept = {shoppinglist.owner, *shoppinglist.members}
+                dropped = {entity["owner"], *load_list(entity["members"])} - kept
+                rows = await self._list_item_rows(row_key)
+                if settings.list_layout == "rows":
+                    items = set(shoppinglist.items)
+                    # Still in order, so only the other rows are deleted
+                    kept_rows = [x["RowKey"] for x in rows if x["RowKey"] in items]
+                else:
+                    kept_rows = []
+                await asyncio.gather(
+                    self._remove_memberships(row_key, list(dropped)),
+                    self._write_item_rows(row_key, rows, kept_rows, atomic=False),
+                    self._clear_changes(row_key),
+                )
+
+            await asyncio.gather(*(clear(*x) for x in rows))
+
+        def to_write(
+            line: int, shoppinglist: ShoppingListCreate, row_key: str, operation: str
+        ) -> Write:
+            entity = {
+                "PartitionKey": "shoppinglist",
+                "RowKey": row_key,
+                "name": shoppinglist.name,
+                "owner": shoppinglist.owner,
+                "members": dump_list(shoppinglist.members),
+            }
+            if row_key in replaced:
+                # Clients holding the old list resync rather than apply changes
+                entity["version"] = replaced[row_key]
+            user_ids.update([shoppinglist.owner, *shoppinglist.members])
+            # Index and item rows only once the list itself is in, so a
+            # rejected row never shows up in anyone's lists
+            then = [
+                Write(
+                    line,
+                    self.memberships_table_client,
+                    "upsert",
+                    {"PartitionKey": user_id, "RowKey": row_key},
+                )
+                for user_id in dict.fromkeys(
+                    [shoppinglist.owner, *shoppinglist.members]
+                )
+            ]
+            item_ids = list(dict.fromkeys(shoppinglist.items))
+            if settings.list_layout == "blob":
+                entity["items"] = dump_list(item_ids)
+            else:
+                added_at = datetime.now(UTC).isoformat()
+                then += [
+                    Write(
+                        line,
+                        self.listitems_table_client,
+                        "upsert",
+                        {
+                            "PartitionKey": row_key,
+                            "RowKey": item_id,
+                            "position": position,
+                            "quantity": 1,
+                            "checked": False,
+                            "added_by": shoppinglist.owner,
+                            "added_at": added_at,
+                        },
+                    )
+                    for position, item_id in enumerate(item_ids)
+                ]
+            return Write(
+                line, self.shoppinglists_table_client, operation, entity, then
+            )
+
+        try:
+            return await self._import(
+                lines,
+                ShoppingListCreate,
+                lambda x: f"{x.name}_{x.owner}",
+                to_write,
+                overwrite,
+                replace,
+            )
+        finally:
+            if user_ids:
+                self.bus.publish({"kind": "memberships", "users": sorted(user_ids)})
+            for shoppinglist_id, version in replaced.items():
+                self._publish_event(
+                    shoppinglist_id, {"version": version, "type": "resync"}
+                )
@@ -0,0 +1,38 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:  # noqa: ANN401
+    if isinstance(obj, BaseModel):
+        # Pydantic's own serializer, spliced in without a round-trip via dicts
+        return orjson.Fragment(obj.model_dump_json())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:  # noqa: ANN401
+    """JSON for dicts, lists and models, in any mix."""
+    return orjson.dumps(content, default=_default)
+
+
+def load_list(blob: str) -> list:
+    """A list column, like a list's ``members`` or ``items``."""
+    return orjson.loads(blob)
+
+
+def dump_list(values: list) -> str:
+    return orjson.dumps(values).decode("utf-8")
+
+
+class TrustedJSONResponse(JSONResponse):
+    """A JSON response encoded by orjson, with no validation on the way.
+
+    Returning a response skips FastAPI's check of the body against the
+    route's ``response_model``, which for models built from storage only
+    repeats work. Only use it for content that already matches the model.
+    """
+
+    def render(self, content: Any) -> bytes:  # noqa: ANN401
+        return dumps(content)
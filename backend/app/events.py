@@ -0,0 +1,96 @@
+import asyncio
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+
+def list_delta(before: list[str], after: list[str]) -> dict:
+    """What turns ``before`` into ``after``.
+
+    Apply it by dropping ``removed`` and appending ``added``. ``order`` is only
+    present when that doesn't give the new order, and is then the whole list.
+    """
+    before_set, after_set = set(before), set(after)
+    removed = [x for x in before if x not in after_set]
+    added = [x for x in after if x not in before_set]
+    delta = {"added": added, "removed": removed}
+    if [x for x in before if x in after_set] + added != after:
+        delta["order"] = after
+    return delta
+
+
+class ChangeFeed(ABC):
+    """Fan-out of change events per shopping list.
+
+    Events are small dicts carrying the ``version`` the list was moved to by
+    the change they describe, so a subscriber can tell when it has missed one.
+    A change that touches several things is one event each, sharing a version.
+    """
+
+    @abstractmethod
+    def publish(self, shoppinglist_id: str, event: dict) -> None:
+        """Send ``event`` to the list's subscribers."""
+
+    @abstractmethod
+    def version(self, shoppinglist_id: str) -> int:
+        """The highest version published for the list."""
+
+    @abstractmethod
+    def versions(self) -> dict[str, int]:
+        """The current version of every list, see ``restore``."""
+
+    @abstractmethod
+    def restore(self, versions: dict[str, int]) -> None:
+        """Carry on from ``versions``, e.g. as taken by another process."""
+
+    @abstractmethod
+    def subscribe(self, shoppinglist_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Async context manager yielding a queue of the list's events."""
+
+
+class InProcessFeed(ChangeFeed):
+    """Delivers events to subscribers in this process only.
+
+    Each subscriber gets a bounded queue. One that falls ``queue_size`` events
+    behind has its backlog replaced by a single ``resync`` event rather than
+    holding up publishers or growing without bound.
+    """
+
+    def __init__(self, queue_size: int = 100) -> None:
+        self.queue_size = queue_size
+        self.subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self.current: dict[str, int] = defaultdict(int)
+
+    def publish(self, shoppinglist_id: str, event: dict) -> None:
+        self.current[shoppinglist_id] = max(
+            self.current[shoppinglist_id], event["version"]
+        )
+        for queue in self.subscribers.get(shoppinglist_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"version": event["version"], "type": "resync"})
+
+    def version(self, shoppinglist_id: str) -> int:
+        return self.current.get(shoppinglist_id, 0)
+
+    def versions(self) -> dict[str, int]:
+        return dict(self.current)
+
+    def restore(self, versions: dict[str, int]) -> None:
+        for shoppinglist_id, version in versions.items():
+            self.current[shoppinglist_id] = max(self.current[shoppinglist_id], version)
+
+    @asynccontextmanager
+    async def subscribe(self, shoppinglist_id: str) -> AsyncIterator[asyncio.Queue]:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers[shoppinglist_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers[shoppinglist_id].discard(queue)
+            if not self.subscribers[shoppinglist_id]:
+                del self.subscribers[shoppinglist_id]
@@ -0,0 +1,264 @@
+import math
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .storage import Entity, Page, Table
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Summary:
+    """Count and sum of observations plus quantiles over a recent window.
+
+    Quantiles are computed from the last ``window`` observations when metrics
+    are rendered, so recording stays O(1).
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self) -> dict[float, float]:
+        values = sorted(self.recent)
+        if not values:
+            return {q: math.nan for q in QUANTILES}
+        return {
+            q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES
+        }
+
+
+class SummaryFamily:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.series: dict[tuple[str, ...], Summary] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = Summary()
+        series.observe(value)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} summary",
+        ]
+        for label_values, series in sorted(self.series.items()):
+            labels = [
+                f'{k}="{escape(v)}"' for k, v in zip(self.labels, label_values)
+            ]
+            for q, value in series.quantiles().items():
+                quantile = ",".join([*labels, f'quantile="{q}"'])
+                lines.append(f"{self.name}{{{quantile}}} {value}")
+            joined = ",".join(labels)
+            lines.append(f"{self.name}_sum{{{joined}}} {series.sum}")
+            lines.append(f"{self.name}_count{{{joined}}} {series.count}")
+        return lines
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = SummaryFamily(
+    "http_request_duration_seconds",
+    "Time to handle a request, by route template.",
+    ("method", "route", "status"),
+)
+request_storage_calls = SummaryFamily(
+    "http_request_storage_calls",
+    "Storage round-trips made while handling a request.",
+    ("method", "route"),
+)
+request_storage_seconds = SummaryFamily(
+    "http_request_storage_seconds",
+    "Time spent in storage calls per request, summed over concurrent calls.",
+    ("method", "route"),
+)
+storage_duration = SummaryFamily(
+    "storage_call_duration_seconds",
+    "Latency of a single storage call.",
+    ("table", "operation"),
+)
+FAMILIES = (
+    request_duration,
+    request_storage_calls,
+    request_storage_seconds,
+    storage_duration,
+)
+
+
+def render() -> str:
+    return "\n".join(line for x in FAMILIES for line in x.render()) + "\n"
+
+
+@dataclass
+class RequestStats:
+    storage_calls: int = 0
+    storage_seconds: float = 0.0
+
+
+# Set per request by MetricsMiddleware. Tasks started with asyncio.gather copy
+# the context, so they still add to the same RequestStats.
+current_request: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+def record_storage_call(table: str, operation: str, elapsed: float) -> None:
+    storage_duration.observe(elapsed, table, operation)
+    stats = current_request.get()
+    if stats is not None:
+        stats.storage_calls += 1
+        stats.storage_seconds += elapsed
+
+
+class MetricsMiddleware:
+    """Records latency and storage usage of every HTTP request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            # The router stores the matched route in the scope; label by its
+            # template so ids in the path don't create a series per request
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            request_duration.observe(elapsed, method, path, str(status))
+            request_storage_calls.observe(stats.storage_calls, method, path)
+            request_storage_seconds.observe(stats.storage_seconds, method, path)
+
+
+class InstrumentedTable(Table):
+    """Times every call made through ``table`` and counts it as a round-trip.
+
+    A scan is counted as one call and timed while it is producing entities.
+    """
+
+    def __init__(self, table: Table, name: str) -> None:
+        self.table = table
+        self.name = name
+
+    async def create_entity(self, entity: dict) -> str:
+        start = time.perf_counter()
+        try:
+            return await self.table.create_entity(entity)
+        finally:
+            self.record("create_entity", start)
+
+    async def get_entity(self, partition_key: str, row_key: str) -> Entity:
+        start = time.perf_counter()
+        try:
+            return await self.table.get_entity(partition_key, row_key)
+        finally:
+            self.record("get_entity", start)
+
+    async def update_entity(self, entity: dict, etag: str | None = None) -> str:
+        start = time.perf_counter()
+        try:
+            return await self.table.update_entity(entity, etag=etag)
+        finally:
+            self.record("update_entity", start)
+
+    async def upsert_entity(self, entity: dict) -> str:
+        start = time.perf_counter()
+        try:
+            return await self.table.upsert_entity(entity)
+        finally:
+            self.record("upsert_entity", start)
+
+    async def delete_entity(
+        self, partition_key: str, row_key: str, etag: str | None = None
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            await self.table.delete_entity(partition_key, row_key, etag=etag)
+        finally:
+            self.record("delete_entity", start)
+
+    async def submit_transaction(self, operations: list[tuple[str, dict]]) -> None:
+        start = time.perf_counter()
+        try:
+            await self.table.submit_transaction(operations)
+        finally:
+            self.record("submit_transaction", start)
+
+    def list_entities(self) -> AsyncIterator[Entity]:
+        return self.scan("list_entities", self.table.list_entities())
+
+    def query_entities(
+        self, partition_key: str, after: str | None = None
+    ) -> AsyncIterator[Entity]:
+        return self.scan(
+            "query_entities", self.table.query_entities(partition_key, after)
+        )
+
+    async def query_page(
+        self,
+        partition_key: str,
+        limit: int,
+        continuation: str | None = None,
+        select: list[str] | None = None,
+        starts_with: tuple[str, str] | None = None,
+    ) -> Page:
+        start = time.perf_counter()
+        try:
+            return await self.table.query_page(
+                partition_key, limit, continuation, select, starts_with
+            )
+        finally:
+            self.record("query_page", start)
+
+    async def scan(
+        self, operation: str, entities: AsyncIterator[Entity]
+    ) -> AsyncIterator[Entity]:
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    entity = await anext(entities)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield entity
+        finally:
+            record_storage_call(self.name, operation, elapsed)
+
+    def record(self, operation: str, start: float) -> None:
+        record_storage_call(self.name, operation, time.perf_counter() - start)
@@ -0,0 +1,25 @@
+"""One-off migration of shopping lists from the items blob to per-item rows.
+
+Run from the backend directory with ``uv run python -m app.migrate_items``, then
+set ``LIST_LAYOUT=rows`` so new lists are created with per-item rows too.
+"""
+
+import asyncio
+
+from .controller import Controller
+
+
+async def migrate() -> None:
+    con = Controller()
+    try:
+        print((await con.migrate_list_items())["message"])
+    finally:
+        await con.close()
+
+
+def main() -> None:
+    asyncio.run(migrate())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+
+from pydantic import BaseModel, EmailStr, Field
 
 
 class Test(BaseModel):
@@ -35,6 +37,15 @@ class ShoppingList(BaseModel):
     owner: str
     members: list = []
     items: list = []
+    # Version the list was read at, sent as the ETag header rather than in the body
+    etag: str | None = Field(default=None, exclude=True)
+    # Goes up by one with every change, see GET /shoppinglists/{id}/changes
+    version: int = 0
+
+
+class ShoppingListExpanded(ShoppingList):
+    members: list[User | str] = []
+    items: list[Item | str] = []
 
 
 class ShoppingListCreate(BaseModel):
@@ -48,8 +59,50 @@ class ShoppingListUpdate(BaseModel):
     members: list | None = None
     items: list | None = None
 
+
+class ListChanges(BaseModel):
+    # The list's current version, to ask for the changes since next time
+    version: int
+    # Change events after the requested version, oldest first
+    changes: list[dict] = []
+    # Set instead of changes when they are no longer all logged, the list
+    # has to be fetched again
+    resync: bool = False
+
 class EmailRequest(BaseModel):
     email: EmailStr
 
 class ItemName(BaseModel):
-    item: str
\ No newline at end of file
+    item: str
+
+# Ids one batch lookup may ask for, each one is a point read
+MAX_BATCH_SIZE = 100
+
+class BatchRequest(BaseModel):
+    ids: list[str] = Field(max_length=MAX_BATCH_SIZE)
+
+class ItemIds(BaseModel):
+    items: list[str]
+
+class ItemsAdd(ItemIds):
+    added_by: str | None = None
+
+class ListItem(BaseModel):
+    id: str  # item RowKey
+    quantity: int = 1
+    checked: bool = False
+    added_by: str | None = None
+    added_at: datetime | None = None
+
+class ListItemUpdate(BaseModel):
+    quantity: int | None = None
+    checked: bool | None = None
+
+class RowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: list[RowError]
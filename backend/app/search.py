@@ -0,0 +1,105 @@
+import bisect
+import math
+from collections import defaultdict
+
+# A candidate needs this share of trigrams in common with the query to match
+MIN_SIMILARITY = 0.3
+# Bound on prefix entries looked at, so one-letter queries stay cheap
+MAX_PREFIX_SCAN = 500
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class ItemIndex:
+    """In-process search index over item names.
+
+    Keeps a sorted list of ``(word, item id)`` for prefix lookups, plus
+    trigram posting lists so that misspelt queries still find near matches.
+    Matches rank as exact name, then name prefix, then word prefix. When those
+    don't fill the result, trigram similarity tops it up.
+    """
+
+    def __init__(self) -> None:
+        self.names: dict[str, str] = {}
+        self.keys: dict[str, str] = {}
+        self.grams: dict[str, set[str]] = {}
+        self.prefixes: list[tuple[str, str]] = []
+        self.postings: dict[str, set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _prefix_keys(self, item_id: str) -> list[tuple[str, str]]:
+        key = self.keys[item_id]
+        return [(x, item_id) for x in dict.fromkeys([key, *key.split()])]
+
+    def add(self, item_id: str, name: str) -> None:
+        if item_id in self.names:
+            self.remove(item_id)
+        self.names[item_id] = name
+        self.keys[item_id] = normalize(name)
+        self.grams[item_id] = trigrams(self.keys[item_id])
+        for key in self._prefix_keys(item_id):
+            bisect.insort(self.prefixes, key)
+        for gram in self.grams[item_id]:
+            self.postings[gram].add(item_id)
+
+    def remove(self, item_id: str) -> None:
+        if item_id not in self.names:
+            return
+        for key in self._prefix_keys(item_id):
+            i = bisect.bisect_left(self.prefixes, key)
+            if i < len(self.prefixes) and self.prefixes[i] == key:
+                del self.prefixes[i]
+        for gram in self.grams[item_id]:
+            self.postings[gram].discard(item_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+        del self.names[item_id], self.keys[item_id], self.grams[item_id]
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, str]]:
+        """Up to ``limit`` ``(item id, name)`` pairs, best match first."""
+        query = normalize(query)
+        if not query:
+            return []
+        scores: dict[str, float] = {}
+
+        start = bisect.bisect_left(self.prefixes, (query,))
+        end = min(len(self.prefixes), start + MAX_PREFIX_SCAN)
+        for word, item_id in self.prefixes[start:end]:
+            if not word.startswith(query):
+                break
+            key = self.keys[item_id]
+            score = 3.0 if key == query else 2.0 if key.startswith(query) else 1.0
+            scores[item_id] = max(score, scores.get(item_id, 0.0))
+
+        if len(scores) < limit:
+            self._similar(query, scores)
+
+        best = sorted(
+            scores,
+            key=lambda x: (-scores[x], len(self.keys[x]), self.keys[x]),
+        )
+        return [(x, self.names[x]) for x in best[:limit]]
+
+    def _similar(self, query: str, scores: dict[str, float]) -> None:
+        # Similarity is shared / distinct trigrams, so a match shares at least
+        # ``needed`` of the query's trigrams and must turn up in one of the
+        # rarest ``len(grams) - needed + 1`` posting lists
+        grams = trigrams(query)
+        needed = math.ceil(MIN_SIMILARITY * len(grams))
+        postings = sorted((self.postings.get(x, set()) for x in grams), key=len)
+        for item_id in set().union(*postings[: len(grams) - needed + 1]):
+            if item_id in scores:
+                continue
+            common = len(grams & self.grams[item_id])
+            similarity = common / (len(grams) + len(self.grams[item_id]) - common)
+            if similarity >= MIN_SIMILARITY:
+                scores[item_id] = similarity
@@ -0,0 +1,38 @@
+"""Runs the API in several worker processes.
+
+Run from the backend directory with ``uv run python -m app.serve``. Starts
+``WORKERS`` uvicorn workers, one per core by default. The workers pass cache
+invalidations and change events to each other through ``BUS_PATH``, which is
+put in a fresh temporary directory unless set. Storage has to be shared as
+well, so more than one worker needs ``azure`` or ``sqlite`` storage.
+"""
+
+import argparse
+import os
+import tempfile
+
+import uvicorn
+
+from .config import settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")  # noqa: S104
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.workers)
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1:
+        if settings.storage_backend == "memory":
+            parser.error("memory storage is per process, use azure or sqlite")
+        if not settings.bus_path:
+            # Read by the workers' own settings when they start
+            bus_dir = tempfile.mkdtemp(prefix="shoppinglist-")
+            os.environ["BUS_PATH"] = os.path.join(bus_dir, "bus")
+    uvicorn.run("app:app", host=args.host, port=args.port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
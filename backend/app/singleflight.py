@@ -0,0 +1,42 @@
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+class SingleFlight:
+    """Lets concurrent identical calls share one execution and its result.
+
+    Callers that join share the returned object, so results must not be
+    mutated.
+    """
+
+    def __init__(self) -> None:
+        self.flights: dict[tuple[str, Hashable], asyncio.Future] = {}
+        self.calls: Counter[str] = Counter()
+        self.coalesced: Counter[str] = Counter()
+
+    async def run(
+        self, name: str, key: Hashable, call: Callable[[], Awaitable[Any]]
+    ) -> Any:  # noqa: ANN401
+        flight = self.flights.get((name, key))
+        if flight is None:
+            self.calls[name] += 1
+            flight = asyncio.ensure_future(call())
+            self.flights[(name, key)] = flight
+            flight.add_done_callback(lambda x: self._land(name, key, x))
+        else:
+            self.coalesced[name] += 1
+        return await asyncio.shield(flight)
+
+    def _land(self, name: str, key: Hashable, flight: asyncio.Future) -> None:
+        del self.flights[(name, key)]
+        # Retrieved here in case every caller gave up before it finished
+        if not flight.cancelled():
+            flight.exception()
+
+    def stats(self) -> dict:
+        return {
+            x: {"calls": self.calls[x], "coalesced": self.coalesced[x]}
+            for x in sorted(self.calls)
+        }
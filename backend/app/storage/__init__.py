@@ -0,0 +1,37 @@
+from ..config import Settings
+from .base import (
+    MAX_TRANSACTION,
+    Entity,
+    Page,
+    StorageBackend,
+    Table,
+    combined_etag,
+    decode_continuation,
+)
+
+
+def get_backend(settings: Settings) -> StorageBackend:
+    if settings.storage_backend == "memory":
+        from .memory import MemoryBackend
+
+        return MemoryBackend()
+    if settings.storage_backend == "sqlite":
+        from .sqlite import SqliteBackend
+
+        return SqliteBackend(settings.sqlite_path)
+
+    from .azure import AzureBackend
+
+    return AzureBackend(settings.table_connection)
+
+
+__all__ = [
+    "MAX_TRANSACTION",
+    "Entity",
+    "Page",
+    "StorageBackend",
+    "Table",
+    "combined_etag",
+    "decode_continuation",
+    "get_backend",
+]
@@ -0,0 +1,187 @@
+from collections.abc import AsyncIterator
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.data.tables import (
+    TableEntity,
+    TableErrorCode,
+    TableTransactionError,
+    UpdateMode,
+)
+from azure.data.tables.aio import TableClient, TableServiceClient
+
+from .base import (
+    Entity,
+    Page,
+    StorageBackend,
+    Table,
+    check_transaction,
+    decode_continuation,
+    encode_continuation,
+    prefix_bound,
+)
+
+
+def to_entity(entity: TableEntity) -> Entity:
+    return Entity(entity, etag=entity.metadata["etag"])
+
+
+def conditions(etag: str | None) -> dict:
+    if etag is None:
+        return {}
+    return {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+
+
+TRANSACTION_ERRORS = {
+    TableErrorCode.ENTITY_ALREADY_EXISTS: ResourceExistsError,
+    TableErrorCode.UPDATE_CONDITION_NOT_SATISFIED: ResourceModifiedError,
+    TableErrorCode.RESOURCE_NOT_FOUND: ResourceNotFoundError,
+    TableErrorCode.ENTITY_NOT_FOUND: ResourceNotFoundError,
+}
+
+
+def to_operation(operation: str, entity: dict) -> tuple:
+    if operation == "create":
+        return (operation, entity)
+    if operation == "upsert":
+        return (operation, entity, {"mode": UpdateMode.REPLACE})
+    etag = conditions(getattr(entity, "etag", None))
+    if operation == "update":
+        return (operation, entity, {"mode": UpdateMode.REPLACE, **etag})
+    return (operation, entity, etag)
+
+
+class AzureTable(Table):
+    def __init__(self, table_client: TableClient) -> None:
+        self.table_client = table_client
+
+    async def create_entity(self, entity: dict) -> str:
+        metadata = await self.table_client.create_entity(entity=entity)
+        return metadata["etag"]
+
+    async def get_entity(self, partition_key: str, row_key: str) -> Entity:
+        return to_entity(
+            await self.table_client.get_entity(
+                partition_key=partition_key, row_key=row_key
+            )
+        )
+
+    async def update_entity(self, entity: dict, etag: str | None = None) -> str:
+        metadata = await self.table_client.update_entity(
+            entity=entity, mode=UpdateMode.REPLACE, **conditions(etag)
+        )
+        return metadata["etag"]
+
+    async def upsert_entity(self, entity: dict) -> str:
+        metadata = await self.table_client.upsert_entity(
+            entity=entity, mode=UpdateMode.REPLACE
+        )
+        return metadata["etag"]
+
+    async def delete_entity(
+        self, partition_key: str, row_key: str, etag: str | None = None
+    ) -> None:
+        await self.table_client.delete_entity(
+            partition_key=partition_key, row_key=row_key, **conditions(etag)
+        )
+
+    async def submit_transaction(self, operations: list[tuple[str, dict]]) -> None:
+        check_transaction(operations)
+        try:
+            await self.table_client.submit_transaction(
+                [
+                    to_operation(operation, entity)
+                    for operation, entity in operations
+                ]
+            )
+        except TableTransactionError as e:
+            # Raised as the single-entity calls would, so callers handle both
+            error = TRANSACTION_ERRORS.get(e.error_code)
+            if error is None:
+                raise
+            raise error(e.message) from e
+
+    async def list_entities(self) -> AsyncIterator[Entity]:
+        async for entity in self.table_client.list_entities():
+            yield to_entity(entity)
+
+    async def query_entities(
+        self, partition_key: str, after: str | None = None
+    ) -> AsyncIterator[Entity]:
+        query_filter = "PartitionKey eq @partition_key"
+        parameters = {"partition_key": partition_key}
+        if after is not None:
+            query_filter += " and RowKey gt @after"
+            parameters["after"] = after
+        async for entity in self.table_client.query_entities(
+            query_filter, parameters=parameters
+        ):
+            yield to_entity(entity)
+
+    async def query_page(
+        self,
+        partition_key: str,
+        limit: int,
+        continuation: str | None = None,
+        select: list[str] | None = None,
+        starts_with: tuple[str, str] | None = None,
+    ) -> Page:
+        query_filter = "PartitionKey eq @partition_key"
+        parameters = {"partition_key": partition_key}
+        if starts_with is not None and starts_with[1]:
+            # Property names can't be parameters, callers only pass known ones
+            name = starts_with[0]
+            query_filter += f" and {name} ge @prefix and {name} lt @bound"
+            parameters |= {
+                "prefix": starts_with[1],
+                "bound": prefix_bound(starts_with[1]),
+            }
+        pages = self.table_client.query_entities(
+            query_filter,
+            parameters=parameters,
+            results_per_page=limit,
+            select=None if select is None else ["PartitionKey", "RowKey", *select],
+        ).by_page(
+            # The service's own next-key headers, carried opaquely
+            continuation_token=decode_continuation(continuation)
+            if continuation
+            else None
+        )
+        try:
+            entities = [to_entity(x) async for x in await anext(pages)]
+        except StopAsyncIteration:
+            return Page([], None)
+        token = pages.continuation_token
+        return Page(entities, encode_continuation(token) if token else None)
+
+
+class AzureBackend(StorageBackend):
+    def __init__(self, connection_string: str) -> None:
+        self.table_service = TableServiceClient.from_connection_string(
+            conn_str=connection_string
+        )
+        self.tables: dict[str, AzureTable] = {}
+
+    def get_table(self, table_name: str) -> AzureTable:
+        if table_name not in self.tables:
+            # Table clients share the service transport and so its connection pool
+            self.tables[table_name] = AzureTable(
+                self.table_service.get_table_client(table_name)
+            )
+        return self.tables[table_name]
+
+    async def create_table(self, table_name: str) -> None:
+        try:
+            await self.table_service.create_table(table_name)
+        except ResourceExistsError:
+            pass
+
+    async def open(self) -> None:
+        await self.table_service.__aenter__()
+
+    async def close(self) -> None:
+        await self.table_service.close()
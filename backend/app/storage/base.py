@@ -0,0 +1,177 @@
+import base64
+import binascii
+import hashlib
+import json
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+
+class Entity(dict):
+    """Entity properties plus the ETag of the version that was read."""
+
+    def __init__(
+        self, *args, etag: str | None = None, **kwargs  # noqa: ANN002, ANN003
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.etag = etag
+
+
+def new_etag() -> str:
+    return f'W/"{uuid.uuid4().hex}"'
+
+
+def combined_etag(etags: list[str | None]) -> str:
+    """A single ETag that changes whenever any of ``etags`` does."""
+    digest = hashlib.sha256("".join(x or "" for x in etags).encode("utf-8"))
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+@dataclass
+class Page:
+    entities: list[Entity]
+    # Opaque token for the next page, None once the query is exhausted
+    continuation: str | None
+
+
+def encode_continuation(key: dict[str, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_continuation(token: str) -> dict[str, str]:
+    """Inverse of ``encode_continuation``, ValueError if ``token`` is garbled."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid continuation token") from e
+    if not isinstance(key, dict) or not all(
+        isinstance(key.get(x), str) for x in ("PartitionKey", "RowKey")
+    ):
+        raise ValueError("Invalid continuation token")
+    return key
+
+
+def prefix_bound(prefix: str) -> str:
+    """The smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def project(entity: Entity, select: list[str] | None) -> Entity:
+    if select is None:
+        return entity
+    keys = {"PartitionKey", "RowKey", *select}
+    return Entity({k: v for k, v in entity.items() if k in keys}, etag=entity.etag)
+
+
+# Azure's limit on operations in one transaction
+MAX_TRANSACTION = 100
+TRANSACTION_OPERATIONS = ("create", "upsert", "update", "delete")
+
+
+def check_transaction(operations: list[tuple[str, dict]]) -> None:
+    """Reject batches Azure would refuse, so every backend behaves alike."""
+    if not 0 < len(operations) <= MAX_TRANSACTION:
+        raise ValueError(f"A transaction holds 1 to {MAX_TRANSACTION} operations")
+    if len({x[1]["PartitionKey"] for x in operations}) > 1:
+        raise ValueError("A transaction can only touch one partition")
+    if len({x[1]["RowKey"] for x in operations}) < len(operations):
+        raise ValueError("A transaction can only touch each entity once")
+    if any(x[0] not in TRANSACTION_OPERATIONS for x in operations):
+        raise ValueError(
+            f"Only {', '.join(TRANSACTION_OPERATIONS)} are supported in a transaction"
+        )
+
+
+class Table(ABC):
+    """A table of entities addressed by ``PartitionKey`` and ``RowKey``.
+
+    Mirrors the subset of the Azure Tables API the controller uses. Every backend
+    raises the ``azure.core.exceptions`` errors (``ResourceExistsError``,
+    ``ResourceNotFoundError``, ``ResourceModifiedError``) so callers can handle
+    failures the same way regardless of where the data lives.
+
+    Writes return the new ETag. Passing ``etag`` makes a write conditional on the
+    stored entity still being at that version, otherwise ResourceModifiedError.
+    """
+
+    @abstractmethod
+    async def create_entity(self, entity: dict) -> str:
+        """Insert a new entity, raising ResourceExistsError if the key is taken."""
+
+    @abstractmethod
+    async def get_entity(self, partition_key: str, row_key: str) -> Entity:
+        """Fetch one entity, raising ResourceNotFoundError if it is missing."""
+
+    @abstractmethod
+    async def update_entity(self, entity: dict, etag: str | None = None) -> str:
+        """Replace an existing entity, raising ResourceNotFoundError if missing."""
+
+    @abstractmethod
+    async def upsert_entity(self, entity: dict) -> str:
+        """Insert or replace an entity."""
+
+    @abstractmethod
+    async def delete_entity(
+        self, partition_key: str, row_key: str, etag: str | None = None
+    ) -> None:
+        """Delete an entity. Deleting a missing entity is not an error."""
+
+    @abstractmethod
+    def list_entities(self) -> AsyncIterator[Entity]:
+        """Iterate over every entity in the table."""
+
+    @abstractmethod
+    def query_entities(
+        self, partition_key: str, after: str | None = None
+    ) -> AsyncIterator[Entity]:
+        """Iterate over the entities in a single partition in ``RowKey`` order.
+
+        With ``after`` only the entities whose ``RowKey`` sorts after it.
+        """
+
+    @abstractmethod
+    async def submit_transaction(self, operations: list[tuple[str, dict]]) -> None:
+        """Apply ``(operation, entity)`` pairs all or nothing.
+
+        ``create`` and ``upsert`` write the entity. ``update`` replaces and
+        ``delete`` removes an existing one, conditional on its ``etag`` when
+        the entity is an ``Entity`` that has one. The operations must share a
+        partition, touch each entity once and number at most
+        ``MAX_TRANSACTION``. If any of them fails none is applied and the error
+        the single-entity call would have raised is raised, or another
+        ``HttpResponseError``.
+        """
+
+    @abstractmethod
+    async def query_page(
+        self,
+        partition_key: str,
+        limit: int,
+        continuation: str | None = None,
+        select: list[str] | None = None,
+        starts_with: tuple[str, str] | None = None,
+    ) -> Page:
+        """Fetch up to ``limit`` entities of a partition in ``RowKey`` order.
+
+        ``continuation`` is the token of the previous page. ``select`` limits the
+        returned properties (keys are always included) and ``starts_with`` is a
+        ``(property, prefix)`` filter, both applied by the store. A page may hold
+        fewer than ``limit`` entities even when more follow.
+        """
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def get_table(self, table_name: str) -> Table:
+        """Return a handle to ``table_name``. The table need not exist yet."""
+
+    @abstractmethod
+    async def create_table(self, table_name: str) -> None:
+        """Create ``table_name`` if it does not already exist."""
+
+    async def open(self) -> None:  # noqa: B027
+        """Establish connections ahead of the first request."""
+
+    async def close(self) -> None:  # noqa: B027
+        """Release connections held by the backend."""
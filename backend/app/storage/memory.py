@@ -0,0 +1,144 @@
+import copy
+from collections import defaultdict
+from collections.abc import AsyncIterator
+
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+
+from .base import (
+    Entity,
+    Page,
+    StorageBackend,
+    Table,
+    check_transaction,
+    decode_continuation,
+    encode_continuation,
+    new_etag,
+    project,
+)
+
+
+class MemoryTable(Table):
+    """Process-local table, for tests, load testing and profiling."""
+
+    def __init__(self) -> None:
+        # PartitionKey -> RowKey -> (etag, properties)
+        self.partitions: dict[str, dict[str, tuple[str, dict]]] = defaultdict(dict)
+
+    def _check(self, partition_key: str, row_key: str, etag: str | None) -> None:
+        stored = self.partitions[partition_key].get(row_key)
+        if stored is None:
+            raise ResourceNotFoundError("The specified resource does not exist.")
+        if etag is not None and stored[0] != etag:
+            raise ResourceModifiedError("The update condition was not satisfied.")
+
+    def _put(self, entity: dict) -> str:
+        etag = new_etag()
+        self.partitions[entity["PartitionKey"]][entity["RowKey"]] = (
+            etag,
+            copy.deepcopy(dict(entity)),
+        )
+        return etag
+
+    async def create_entity(self, entity: dict) -> str:
+        if entity["RowKey"] in self.partitions[entity["PartitionKey"]]:
+            raise ResourceExistsError("The specified entity already exists.")
+        return self._put(entity)
+
+    async def get_entity(self, partition_key: str, row_key: str) -> Entity:
+        self._check(partition_key, row_key, None)
+        etag, properties = self.partitions[partition_key][row_key]
+        return Entity(copy.deepcopy(properties), etag=etag)
+
+    async def update_entity(self, entity: dict, etag: str | None = None) -> str:
+        self._check(entity["PartitionKey"], entity["RowKey"], etag)
+        return self._put(entity)
+
+    async def upsert_entity(self, entity: dict) -> str:
+        return self._put(entity)
+
+    async def delete_entity(
+        self, partition_key: str, row_key: str, etag: str | None = None
+    ) -> None:
+        if row_key not in self.partitions[partition_key]:
+            return
+        self._check(partition_key, row_key, etag)
+        del self.partitions[partition_key][row_key]
+
+    async def submit_transaction(self, operations: list[tuple[str, dict]]) -> None:
+        check_transaction(operations)
+        # Nothing awaits in between, so checking first then writing is atomic
+        for operation, entity in operations:
+            if operation == "create" and (
+                entity["RowKey"] in self.partitions[entity["PartitionKey"]]
+            ):
+                raise ResourceExistsError("The specified entity already exists.")
+            if operation in ("update", "delete"):
+                self._check(
+                    entity["PartitionKey"],
+                    entity["RowKey"],
+                    getattr(entity, "etag", None),
+                )
+        for operation, entity in operations:
+            if operation == "delete":
+                del self.partitions[entity["PartitionKey"]][entity["RowKey"]]
+            else:
+                self._put(entity)
+
+    async def list_entities(self) -> AsyncIterator[Entity]:
+        for partition_key in sorted(self.partitions):
+            async for entity in self.query_entities(partition_key):
+                yield entity
+
+    async def query_entities(
+        self, partition_key: str, after: str | None = None
+    ) -> AsyncIterator[Entity]:
+        partition = self.partitions.get(partition_key, {})
+        for row_key in sorted(partition):
+            if after is not None and row_key <= after:
+                continue
+            if row_key in partition:
+                etag, properties = partition[row_key]
+                yield Entity(copy.deepcopy(properties), etag=etag)
+
+    async def query_page(
+        self,
+        partition_key: str,
+        limit: int,
+        continuation: str | None = None,
+        select: list[str] | None = None,
+        starts_with: tuple[str, str] | None = None,
+    ) -> Page:
+        # The token holds the last RowKey returned, the next page starts after it
+        after = decode_continuation(continuation)["RowKey"] if continuation else None
+        partition = self.partitions.get(partition_key, {})
+        entities = []
+        for row_key in sorted(partition):
+            if after is not None and row_key <= after:
+                continue
+            etag, properties = partition[row_key]
+            if starts_with is not None:
+                value = properties.get(starts_with[0])
+                if not isinstance(value, str) or not value.startswith(starts_with[1]):
+                    continue
+            if len(entities) == limit:
+                last = entities[-1]["RowKey"]
+                token = {"PartitionKey": partition_key, "RowKey": last}
+                return Page(entities, encode_continuation(token))
+            entity = Entity(copy.deepcopy(properties), etag=etag)
+            entities.append(project(entity, select))
+        return Page(entities, None)
+
+
+class MemoryBackend(StorageBackend):
+    def __init__(self) -> None:
+        self.tables: dict[str, MemoryTable] = defaultdict(MemoryTable)
+
+    def get_table(self, table_name: str) -> MemoryTable:
+        return self.tables[table_name]
+
+    async def create_table(self, table_name: str) -> None:
+        self.get_table(table_name)
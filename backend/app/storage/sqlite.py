@@ -0,0 +1,289 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+from collections.abc import AsyncIterator
+
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+
+from .base import (
+    Entity,
+    Page,
+    StorageBackend,
+    Table,
+    check_transaction,
+    decode_continuation,
+    encode_continuation,
+    new_etag,
+    prefix_bound,
+    project,
+)
+
+# Same rules as Azure table names, which also keeps them safe to interpolate
+TABLE_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9]{2,62}$")
+PAGE_SIZE = 1000
+
+
+class SqliteTable(Table):
+    """A table stored as ``(PartitionKey, RowKey, etag, data)`` rows.
+
+    The composite primary key doubles as the index for point reads and single
+    partition queries, and ``WITHOUT ROWID`` keeps rows clustered on it.
+    """
+
+    def __init__(self, backend: "SqliteBackend", table_name: str) -> None:
+        self.backend = backend
+        self.table_name = table_name
+        self.created = False
+
+    async def _execute(self, sql: str, params: tuple = ()) -> tuple[list, int]:
+        if not self.created:
+            await self.backend.create_table(self.table_name)
+            self.created = True
+        return await self.backend.execute(sql.format(table=self.table_name), params)
+
+    async def _check_written(
+        self, partition_key: str, row_key: str, rowcount: int, etag: str | None
+    ) -> None:
+        # Work out why a keyed write touched nothing
+        if rowcount:
+            return
+        rows, _ = await self._execute(
+            'SELECT 1 FROM "{table}" WHERE PartitionKey = ? AND RowKey = ?',
+            (partition_key, row_key),
+        )
+        if rows and etag is not None:
+            raise ResourceModifiedError("The update condition was not satisfied.")
+        if not rows:
+            raise ResourceNotFoundError("The specified resource does not exist.")
+
+    async def create_entity(self, entity: dict) -> str:
+        etag = new_etag()
+        try:
+            await self._execute(
+                'INSERT INTO "{table}" VALUES (?, ?, ?, ?)',
+                (entity["PartitionKey"], entity["RowKey"], etag, json.dumps(entity)),
+            )
+        except sqlite3.IntegrityError as e:
+            raise ResourceExistsError("The specified entity already exists.") from e
+        return etag
+
+    async def get_entity(self, partition_key: str, row_key: str) -> Entity:
+        rows, _ = await self._execute(
+            'SELECT etag, data FROM "{table}" WHERE PartitionKey = ? AND RowKey = ?',
+            (partition_key, row_key),
+        )
+        if not rows:
+            raise ResourceNotFoundError("The specified resource does not exist.")
+        return Entity(json.loads(rows[0][1]), etag=rows[0][0])
+
+    async def update_entity(self, entity: dict, etag: str | None = None) -> str:
+        new = new_etag()
+        _, rowcount = await self._execute(
+            'UPDATE "{table}" SET etag = ?, data = ? '
+            "WHERE PartitionKey = ? AND RowKey = ? AND etag = coalesce(?, etag)",
+            (new, json.dumps(entity), entity["PartitionKey"], entity["RowKey"], etag),
+        )
+        await self._check_written(
+            entity["PartitionKey"], entity["RowKey"], rowcount, etag
+        )
+        return new
+
+    async def upsert_entity(self, entity: dict) -> str:
+        etag = new_etag()
+        await self._execute(
+            'INSERT OR REPLACE INTO "{table}" VALUES (?, ?, ?, ?)',
+            (entity["PartitionKey"], entity["RowKey"], etag, json.dumps(entity)),
+        )
+        return etag
+
+    async def delete_entity(
+        self, partition_key: str, row_key: str, etag: str | None = None
+    ) -> None:
+        _, rowcount = await self._execute(
+            'DELETE FROM "{table}" '
+            "WHERE PartitionKey = ? AND RowKey = ? AND etag = coalesce(?, etag)",
+            (partition_key, row_key, etag),
+        )
+        if etag is not None:
+            try:
+                await self._check_written(partition_key, row_key, rowcount, etag)
+            except ResourceNotFoundError:
+                pass
+
+    async def submit_transaction(self, operations: list[tuple[str, dict]]) -> None:
+        check_transaction(operations)
+        if not self.created:
+            await self.backend.create_table(self.table_name)
+            self.created = True
+        statements = []
+        for operation, entity in operations:
+            keys = (entity["PartitionKey"], entity["RowKey"])
+            etag = getattr(entity, "etag", None)
+            row = (self.table_name, *keys)
+            if operation == "update":
+                sql = (
+                    f'UPDATE "{self.table_name}" SET etag = ?, data = ? '
+                    "WHERE PartitionKey = ? AND RowKey = ? AND etag = coalesce(?, etag)"
+                )
+                params = (new_etag(), json.dumps(entity), *keys, etag)
+                statements.append((sql, params, row))
+            elif operation == "delete":
+                sql = (
+                    f'DELETE FROM "{self.table_name}" '
+                    "WHERE PartitionKey = ? AND RowKey = ? AND etag = coalesce(?, etag)"
+                )
+                statements.append((sql, (*keys, etag), row))
+            else:
+                sql = (
+                    "INSERT" if operation == "create" else "INSERT OR REPLACE"
+                ) + f' INTO "{self.table_name}" VALUES (?, ?, ?, ?)'
+                statements.append((sql, (*keys, new_etag(), json.dumps(entity)), None))
+        try:
+            await self.backend.transaction(statements)
+        except sqlite3.IntegrityError as e:
+            raise ResourceExistsError("The specified entity already exists.") from e
+
+    async def _paged(self, where: str, params: tuple) -> AsyncIterator[Entity]:
+        # Keyset pagination so no cursor is held open between pages
+        last_key = ("", "")
+        while True:
+            rows, _ = await self._execute(
+                'SELECT PartitionKey, RowKey, etag, data FROM "{table}" '
+                f"WHERE {where} (PartitionKey, RowKey) > (?, ?) "
+                f"ORDER BY PartitionKey, RowKey LIMIT {PAGE_SIZE}",
+                (*params, *last_key),
+            )
+            for row in rows:
+                yield Entity(json.loads(row[3]), etag=row[2])
+            if len(rows) < PAGE_SIZE:
+                return
+            last_key = (rows[-1][0], rows[-1][1])
+
+    def list_entities(self) -> AsyncIterator[Entity]:
+        return self._paged("", ())
+
+    async def query_page(
+        self,
+        partition_key: str,
+        limit: int,
+        continuation: str | None = None,
+        select: list[str] | None = None,
+        starts_with: tuple[str, str] | None = None,
+    ) -> Page:
+        # The token holds the last RowKey returned, the next page starts after it
+        after = decode_continuation(continuation)["RowKey"] if continuation else ""
+        where, params = "PartitionKey = ? AND RowKey > ?", [partition_key, after]
+        if starts_with is not None and starts_with[1]:
+            path = f"$.{starts_with[0]}"
+            where += " AND json_extract(data, ?) >= ? AND json_extract(data, ?) < ?"
+            params += [path, starts_with[1], path, prefix_bound(starts_with[1])]
+        rows, _ = await self._execute(
+            'SELECT RowKey, etag, data FROM "{table}" '
+            f"WHERE {where} ORDER BY RowKey LIMIT ?",
+            (*params, limit + 1),
+        )
+        entities = [
+            project(Entity(json.loads(data), etag=etag), select)
+            for _, etag, data in rows[:limit]
+        ]
+        if len(rows) <= limit:
+            return Page(entities, None)
+        token = {"PartitionKey": partition_key, "RowKey": rows[limit - 1][0]}
+        return Page(entities, encode_continuation(token))
+
+    def query_entities(
+        self, partition_key: str, after: str | None = None
+    ) -> AsyncIterator[Entity]:
+        return self._paged(
+            "PartitionKey = ? AND RowKey > ? AND", (partition_key, after or "")
+        )
+
+
+class SqliteBackend(StorageBackend):
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.connection: sqlite3.Connection | None = None
+        self.lock = threading.Lock()
+        self.tables: dict[str, SqliteTable] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        return self.connection
+
+    def _execute(self, sql: str, params: tuple) -> tuple[list, int]:
+        with self.lock:
+            cursor = self._connect().execute(sql, params)
+            return cursor.fetchall(), cursor.rowcount
+
+    async def execute(self, sql: str, params: tuple = ()) -> tuple[list, int]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    def _transaction(
+        self, statements: list[tuple[str, tuple, tuple[str, str, str] | None]]
+    ) -> None:
+        # Statements given the (table, PartitionKey, RowKey) they must write
+        # undo the whole transaction when they don't
+        with self.lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params, row in statements:
+                    if connection.execute(sql, params).rowcount or row is None:
+                        continue
+                    table, partition_key, row_key = row
+                    if connection.execute(
+                        f'SELECT 1 FROM "{table}" '
+                        "WHERE PartitionKey = ? AND RowKey = ?",
+                        (partition_key, row_key),
+                    ).fetchone():
+                        raise ResourceModifiedError(
+                            "The update condition was not satisfied."
+                        )
+                    raise ResourceNotFoundError(
+                        "The specified resource does not exist."
+                    )
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    async def transaction(
+        self, statements: list[tuple[str, tuple, tuple[str, str, str] | None]]
+    ) -> None:
+        await asyncio.to_thread(self._transaction, statements)
+
+    def get_table(self, table_name: str) -> SqliteTable:
+        if not TABLE_NAME.match(table_name):
+            raise ValueError(f"Invalid table name {table_name!r}")
+        if table_name not in self.tables:
+            self.tables[table_name] = SqliteTable(self, table_name)
+        return self.tables[table_name]
+
+    async def create_table(self, table_name: str) -> None:
+        if not TABLE_NAME.match(table_name):
+            raise ValueError(f"Invalid table name {table_name!r}")
+        await self.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table_name}" ('
+            "PartitionKey TEXT NOT NULL, RowKey TEXT NOT NULL, "
+            "etag TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (PartitionKey, RowKey)) WITHOUT ROWID"
+        )
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._connect)
+
+    async def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -1,4 +1,5 @@
 import functools
+import inspect
 import logging
 import time
 from collections.abc import Callable
@@ -9,9 +10,14 @@ from .config import settings
 
 
 # Logging
+@functools.cache
+def configure_logging() -> None:
+    logging.basicConfig(level=logging.DEBUG if settings.debug else logging.INFO)
+
+
 class MyLogger:
     def __init__(self) -> None:
-        logging.basicConfig(level=logging.DEBUG if settings.debug else logging.INFO)
+        configure_logging()
 
     def get_logger(self, name: str | None = None) -> logging.Logger:
         return logging.getLogger(name)
@@ -21,72 +27,75 @@ def get_default_logger() -> logging.Logger:
     return MyLogger().get_logger()
 
 
+def format_call(args: tuple, kwargs: dict) -> str:
+    args_repr = [repr(a) for a in args]
+    kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
+    return ", ".join(args_repr + kwargs_repr)
+
+
 def log(
     _func: Callable | None = None, *, my_logger: MyLogger | logging.Logger = None
 ) -> str:
     def decorator_log(func: Callable) -> Callable:
+        # Everything that does not depend on the call is worked out once here,
+        # and calls are only traced at DEBUG, so otherwise a call costs a
+        # level check.
+        configure_logging()
+        name = func.__name__
+        if my_logger is None:
+            logger = logging.getLogger(func.__module__)
+        elif isinstance(my_logger, MyLogger):
+            logger = my_logger.get_logger(name)
+        else:
+            logger = my_logger
+
+        def log_call(args: tuple, kwargs: dict) -> bool:
+            if not logger.isEnabledFor(logging.DEBUG):
+                return False
+            logger.debug(
+                "function %s called with args %s", name, format_call(args, kwargs)
+            )
+            return True
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> str:  # noqa: ANN002, ANN003
+                traced = log_call(args, kwargs)
+                try:
+                    start_time = time.perf_counter()
+
+                    result = await func(*args, **kwargs)
+
+                    if traced:
+                        elapsed_time = time.perf_counter() - start_time
+                        logger.debug(
+                            "function %s completed in %.4f seconds", name, elapsed_time
+                        )
+                    return result
+                except Exception as e:
+                    logger.exception("Exception raised in %s. exception: %s", name, e)
+                    raise
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> str:  # noqa: ANN002, ANN003
-            logger = get_default_logger()
-            try:
-                if my_logger is None:
-                    first_args = next(
-                        iter(args), None
-                    )  # capture first arg to check for `self`
-                    logger_params = [  # does kwargs have any logger
-                        x
-                        for x in kwargs.values()
-                        if isinstance(x, logging.Logger | MyLogger)
-                    ] + [  # # does args have any logger
-                        x for x in args if isinstance(x, logging.Logger | MyLogger)
-                    ]
-                    if hasattr(first_args, "__dict__"):  # is first argument `self`
-                        logger_params = logger_params + [
-                            x
-                            # does class (dict) members have any logger
-                            for x in first_args.__dict__.values()
-                            if isinstance(x, logging.Logger | MyLogger)
-                        ]
-                    h_logger = next(
-                        iter(logger_params), MyLogger()
-                    )  # get the next/first/default logger
-                else:
-                    h_logger = my_logger  # logger is passed explicitly to the decorator
-
-                logger = (
-                    h_logger.get_logger(func.__name__)
-                    if isinstance(h_logger, MyLogger)
-                    else h_logger
-                )
-
-                args_repr = [repr(a) for a in args]
-                kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
-                signature = ", ".join(args_repr + kwargs_repr)
-                if settings.debug:
-                    logger.debug(
-                        f"function {func.__name__} called with args {signature}"
-                    )
-                else:
-                    logger.info(f"function {func.__name__} called")
-            except Exception as e:
-                raise e
-
+            traced = log_call(args, kwargs)
             try:
-                start_time = time.time()
+                start_time = time.perf_counter()
 
                 result = func(*args, **kwargs)
 
-                end_time = time.time()
-                elapsed_time = end_time - start_time
-                logger.info(
-                    f"function {func.__name__} completed in {elapsed_time:.4f} seconds"
-                )
+                if traced:
+                    elapsed_time = time.perf_counter() - start_time
+                    logger.debug(
+                        "function %s completed in %.4f seconds", name, elapsed_time
+                    )
                 return result
             except Exception as e:
-                logger.exception(
-                    f"Exception raised in {func.__name__}. exception: {e!s}"
-                )
-                raise e
+                logger.exception("Exception raised in %s. exception: %s", name, e)
+                raise
 
         return wrapper
 
@@ -0,0 +1,88 @@
+"""Bulk import and export throughput.
+
+Loads the same catalogue of items twice, once with one ``POST /items`` per row
+(``--clients`` at a time) and once as a single NDJSON ``POST /items/import``,
+then exports it again, and reports rows/second for each. Run it against a
+local storage stand-in, SQLite shows the cost of the round-trips saved by
+transactional batches better than memory does:
+
+    export STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/bulk.db HASH_KEY=benchmark
+    uv run python -m benchmarks.bulk --rows 5000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app import app, con
+
+from .concurrency import TABLES
+
+
+async def one_by_one(
+    client: httpx.AsyncClient, names: list[str], clients: int
+) -> float:
+    queue = iter(names)
+
+    async def worker() -> None:
+        for name in queue:
+            response = await client.post("/items", json={"name": name})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return len(names) / (time.perf_counter() - start)
+
+
+async def bulk_import(client: httpx.AsyncClient, names: list[str]) -> float:
+    async def body() -> None:
+        for name in names:
+            yield (json.dumps({"name": name}) + "\n").encode("utf-8")
+
+    start = time.perf_counter()
+    response = await client.post("/items/import", content=body())
+    response.raise_for_status()
+    report = response.json()
+    if report["failed"]:
+        raise RuntimeError(f"{report['failed']} rows failed: {report['errors'][:3]}")
+    return len(names) / (time.perf_counter() - start)
+
+
+async def export(client: httpx.AsyncClient) -> float:
+    start = time.perf_counter()
+    rows = 0
+    async with client.stream("GET", "/items/export") as response:
+        async for _ in response.aiter_lines():
+            rows += 1
+    return rows / (time.perf_counter() - start)
+
+
+async def main(n_rows: int, clients: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        for table in TABLES:
+            await con.storage.create_table(table)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+            run = time.time_ns()
+            single = await one_by_one(
+                client, [f"single {run} {i}" for i in range(n_rows)], clients
+            )
+            bulk = await bulk_import(client, [f"bulk {run} {i}" for i in range(n_rows)])
+            exported = await export(client)
+    print(f"{'path':>12} {'rows/s':>10}")
+    print(f"{'POST /items':>12} {single:>10.1f}")
+    print(f"{'import':>12} {bulk:>10.1f}")
+    print(f"{'export':>12} {exported:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.clients))
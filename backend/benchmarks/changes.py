@@ -0,0 +1,145 @@
+"""Cost of refreshing a list through its changes rather than refetching it.
+
+Creates lists of ``--items`` items, then repeatedly makes ``--edits`` edits
+and refreshes a client copy of each list both ways: the whole list from
+``GET /shoppinglists/{id}``, and the deltas from
+``GET /shoppinglists/{id}/changes?since=``. Reports response bytes and
+milliseconds per refresh. The client copy kept up to date from the deltas
+must match the list as stored after every round, otherwise the check fails:
+
+    export STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/changes.db HASH_KEY=benchmark
+    uv run python -m benchmarks.changes --items 10 100 1000 --layout rows
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app import app, con
+from app.config import settings
+
+from .concurrency import TABLES
+
+
+def apply(shoppinglist: dict, changes: list[dict]) -> None:
+    # What a client does with each event, see app.events.list_delta
+    for change in changes:
+        if change["type"] not in ("items", "members"):
+            continue
+        values = shoppinglist[change["type"]]
+        removed = set(change["removed"])
+        values[:] = change.get(
+            "order",
+            [x for x in values if x not in removed]
+            + [x for x in change["added"] if x not in values],
+        )
+
+
+async def timed(
+    client: httpx.AsyncClient, path: str, **kwargs  # noqa: ANN003
+) -> tuple:
+    start = time.perf_counter()
+    response = await client.get(path, **kwargs)
+    response.raise_for_status()
+    return response, time.perf_counter() - start
+
+
+async def run(
+    client: httpx.AsyncClient, user_id: str, n_items: int, rounds: int, edits: int
+) -> tuple[float, float, float, float, int]:
+    response = await client.post(
+        "/shoppinglists",
+        json={
+            "name": f"Changes {time.time_ns()}",
+            "owner": user_id,
+            "items": [f"item-{i}" for i in range(n_items)],
+        },
+    )
+    response.raise_for_status()
+    copy = response.json()
+    path = f"/shoppinglists/{copy['id']}"
+    full_bytes = full_time = delta_bytes = delta_time = 0.0
+    mismatches = 0
+    for n in range(rounds):
+        for i in range(edits):
+            if i % 2:
+                response = await client.request(
+                    "DELETE", f"{path}/items/remove", json={"items": [f"added-{n}"]}
+                )
+            else:
+                response = await client.post(
+                    f"{path}/items/add", json={"items": [f"added-{n}"]}
+                )
+            response.raise_for_status()
+        response, elapsed = await timed(client, path)
+        full_bytes += len(response.content)
+        full_time += elapsed
+        stored = response.json()
+
+        response, elapsed = await timed(
+            client, f"{path}/changes", params={"since": copy["version"]}
+        )
+        delta_bytes += len(response.content)
+        delta_time += elapsed
+        changes = response.json()
+        if changes["resync"]:
+            copy = stored
+        else:
+            apply(copy, changes["changes"])
+            copy["version"] = changes["version"]
+        if copy != stored:
+            mismatches += 1
+            copy = stored
+    return (
+        full_bytes / rounds,
+        full_time / rounds * 1000,
+        delta_bytes / rounds,
+        delta_time / rounds * 1000,
+        mismatches,
+    )
+
+
+async def main(levels: list[int], rounds: int, edits: int, layout: str) -> int:
+    settings.list_layout = layout
+    transport = httpx.ASGITransport(app=app)
+    mismatches = 0
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            for table in TABLES:
+                await con.storage.create_table(table)
+            email = f"changes{time.time_ns()}@example.com"
+            response = await client.post(
+                "/users", json={"name": "Benchmark", "email": email}
+            )
+            user_id = response.json()["id"]
+            print(
+                f"{'items':>6} {'full bytes':>11} {'full ms':>8}"
+                f" {'changes bytes':>14} {'changes ms':>11} {'mismatches':>11}"
+            )
+            for n_items in levels:
+                full_bytes, full_ms, delta_bytes, delta_ms, failed = await run(
+                    client, user_id, n_items, rounds, edits
+                )
+                mismatches += failed
+                print(
+                    f"{n_items:>6} {full_bytes:>11.0f} {full_ms:>8.2f}"
+                    f" {delta_bytes:>14.0f} {delta_ms:>11.2f} {failed:>11}"
+                )
+    print(f"Mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--edits", type=int, default=2)
+    parser.add_argument("--layout", choices=["blob", "rows"], default="blob")
+    args = parser.parse_args()
+    raise SystemExit(
+        asyncio.run(main(args.items, args.rounds, args.edits, args.layout))
+    )
@@ -0,0 +1,126 @@
+"""Storage reads saved by coalescing identical concurrent reads.
+
+Seeds a list, then opens it from ``--clients`` clients at once, the way a
+household does when everyone looks at the same list, and reports storage
+calls per page load and how many reads joined one already in flight. Each
+round reorders the list's items while a burst of loads is in flight, and
+every load of the burst that starts once the reorder has returned must show
+the new order, so coalescing is never seen serving a read older than its
+request. Point reads made for GET requests answer ``--latency`` seconds late,
+as from a remote store, so that a read of the old order can still be in flight
+once the reorder is done:
+
+    export STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/coalescing.db HASH_KEY=benchmark
+    uv run python -m benchmarks.coalescing --clients 1 4 16 64
+"""
+
+import argparse
+import asyncio
+
+import httpx
+
+from app import app, con, metrics
+from app.storage import Entity, Table
+
+from .concurrency import seed
+
+
+class Slow:
+    """Delays the answer to point reads shared between requests."""
+
+    def __init__(self, table: Table, latency: float) -> None:
+        self.table = table
+        self.latency = latency
+
+    def __getattr__(self, name: str):  # noqa: ANN204
+        return getattr(self.table, name)
+
+    async def get_entity(self, partition_key: str, row_key: str) -> Entity:
+        entity = await self.table.get_entity(partition_key, row_key)
+        # Reads behind a write stay quick, so the write can overtake a read
+        if asyncio.current_task() in con.flights.flights.values():
+            await asyncio.sleep(self.latency)
+        return entity
+
+
+def storage_calls() -> int:
+    return sum(x.count for x in metrics.storage_duration.series.values())
+
+
+def coalesced() -> int:
+    return sum(x["coalesced"] for x in con.flights.stats().values())
+
+
+async def burst(
+    client: httpx.AsyncClient, user_id: str, shoppinglist_id: str, clients: int
+) -> list[list[str]]:
+    async def page_load() -> list[list[str]]:
+        # The list page: the user's lists, then the open one with its items
+        response = await client.get(f"/shoppinglists/{user_id}/list")
+        response.raise_for_status()
+        listed = next(x for x in response.json() if x["id"] == shoppinglist_id)
+        response = await client.get(
+            f"/shoppinglists/{shoppinglist_id}", params={"expand": "items,members"}
+        )
+        response.raise_for_status()
+        return [listed["items"], [x["id"] for x in response.json()["items"]]]
+
+    loads = await asyncio.gather(*(page_load() for _ in range(clients)))
+    return [x for load in loads for x in load]
+
+
+async def main(levels: list[int], rounds: int, n_items: int, latency: float) -> int:
+    for client in (
+        con.users_table_client,
+        con.items_table_client,
+        con.shoppinglists_table_client,
+    ):
+        client.table = Slow(client.table, latency)
+    transport = httpx.ASGITransport(app=app)
+    stale = 0
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            user_id = await seed(client, n_items)
+            lists = (await client.get(f"/shoppinglists/{user_id}/list")).json()
+            shoppinglist_id, items = lists[0]["id"], lists[0]["items"]
+            print(f"{'clients':>8} {'storage calls/load':>19} {'coalesced/load':>15}")
+            for clients in levels:
+                calls, joined = storage_calls(), coalesced()
+                for _ in range(rounds):
+                    # May see either order, but has reads in flight to join
+                    racing = asyncio.create_task(
+                        burst(client, user_id, shoppinglist_id, clients)
+                    )
+                    while not any(x == "shoppinglist" for x, _ in con.flights.flights):
+                        await asyncio.sleep(0)
+                    items = items[1:] + items[:1]
+                    response = await client.put(
+                        f"/shoppinglists/{shoppinglist_id}", json={"items": items}
+                    )
+                    response.raise_for_status()
+                    seen = await burst(client, user_id, shoppinglist_id, clients)
+                    stale += sum(x != items for x in seen)
+                    await racing
+                loads = 2 * clients * rounds
+                # Less the reorder: a read, then writes to the list and its log
+                calls = storage_calls() - calls - 3 * rounds
+                print(
+                    f"{clients:>8} {calls / loads:>19.2f}"
+                    f" {(coalesced() - joined) / loads:>15.2f}"
+                )
+    print(f"Stale reads: {stale}")
+    return 1 if stale else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    raise SystemExit(
+        asyncio.run(main(args.clients, args.rounds, args.items, args.latency))
+    )
@@ -0,0 +1,87 @@
+"""Concurrency benchmark for the backend API.
+
+Drives the FastAPI app in-process over ASGI with an increasing number of
+concurrent clients and reports throughput for each level. Storage calls go to
+the configured backend. ``STORAGE_BACKEND=memory`` measures the API layer on
+its own; for realistic storage latency point ``TABLE_CONNECTION`` at a local
+Azurite container:
+
+    docker run -p 10002:10002 mcr.microsoft.com/azure-storage/azurite \\
+        azurite-table --tableHost 0.0.0.0
+    export TABLE_CONNECTION="DefaultEndpointsProtocol=http;\\
+AccountName=devstoreaccount1;AccountKey=<azurite key>;\\
+TableEndpoint=http://127.0.0.1:10002/devstoreaccount1;"
+    export HASH_KEY=benchmark
+    uv run python -m benchmarks.concurrency
+
+If the event loop is never blocked, requests/second should keep climbing with
+the number of clients until storage latency stops being the bottleneck.
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app import app, con
+
+TABLES = ("users", "lists", "items", "memberships", "listitems", "listchanges")
+
+
+async def seed(client: httpx.AsyncClient, n_items: int) -> str:
+    for table in TABLES:
+        await con.storage.create_table(table)
+    user = {"name": "Benchmark", "email": "benchmark@example.com"}
+    await client.post("/users", json=user)
+    user_id = (await client.get("/users/list")).json()
+    user_id = next(x["id"] for x in user_id if x["email"] == user["email"])
+    items = []
+    for i in range(n_items):
+        response = await client.post("/items", json={"name": f"Benchmark item {i}"})
+        if response.status_code == 200:
+            items.append(response.json()["id"])
+    await client.post(
+        "/shoppinglists",
+        json={"name": "Benchmark", "owner": user_id, "items": items},
+    )
+    return user_id
+
+
+async def run_level(
+    client: httpx.AsyncClient, user_id: str, concurrency: int, n_requests: int
+) -> float:
+    queue = iter(range(n_requests))
+
+    async def worker() -> None:
+        for _ in queue:
+            response = await client.get(f"/shoppinglists/{user_id}/list")
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return n_requests / (time.perf_counter() - start)
+
+
+async def main(levels: list[int], n_requests: int, n_items: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            user_id = await seed(client, n_items)
+            print(f"{'clients':>8} {'req/s':>10}")
+            for concurrency in levels:
+                rps = await run_level(client, user_id, concurrency, n_requests)
+                print(f"{concurrency:>8} {rps:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--items", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests, args.items))
@@ -0,0 +1,429 @@
+"""Load test of the backend API with a realistic request mix.
+
+Seeds ``--users`` users, ``--lists`` shopping lists and ``--items`` items
+through the bulk import endpoints, then runs virtual clients that each loop
+over weighted scenarios for ``--duration`` seconds at every ``--clients``
+level:
+
+- ``page_load``: the user, their lists, then the names of every item on them,
+  as the frontend does when a page is opened
+- ``add_item``: add an item to one of the user's lists
+- ``invite``: invite another user to one of the user's lists
+
+Reports throughput, latency percentiles per route and scenario and, when the
+app runs in process, storage round-trips per request. ``--output`` writes the
+same as JSON together with the commit it ran on, and ``--baseline`` compares
+against an earlier file, so hot path regressions show up between commits:
+
+    export STORAGE_BACKEND=memory HASH_KEY=benchmark
+    uv run python -m benchmarks.load --output before.json
+    uv run python -m benchmarks.load --baseline before.json
+
+By default the app is driven in process over ASGI against whichever storage
+``STORAGE_BACKEND`` selects (``memory``, or ``azure`` pointed at Azurite, see
+``benchmarks/concurrency.py``). ``--url`` targets a running server instead.
+Per-call INFO logging is silenced unless ``--log-level INFO`` is given.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import subprocess
+import time
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+
+PERCENTILES = (50, 90, 99)
+# Ids per batch lookup the API takes, app.schemas.MAX_BATCH_SIZE
+BATCH_SIZE = 100
+
+
+@dataclass
+class Dataset:
+    users: list[dict]
+    items: list[str]
+    # Lists each user owns or is a member of
+    lists_of: dict[str, list[str]]
+
+
+@dataclass
+class Recorder:
+    """Latencies and failures per route template and per scenario."""
+
+    routes: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    scenarios: dict[str, list[float]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    errors: Counter = field(default_factory=Counter)
+
+    async def call(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        route: str,
+        path: str,
+        **kwargs,  # noqa: ANN003
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        self.routes[f"{method} {route}"].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[f"{method} {route}"] += 1
+        return response
+
+
+Scenario = Callable[[Recorder, httpx.AsyncClient, Dataset, random.Random], Awaitable]
+
+
+async def page_load(
+    rec: Recorder, client: httpx.AsyncClient, data: Dataset, rng: random.Random
+) -> None:
+    user = rng.choice(data.users)
+    await rec.call(client, "GET", "/users/{user_id}", f"/users/{user['id']}")
+    response = await rec.call(
+        client,
+        "GET",
+        "/shoppinglists/{user_id}/list",
+        f"/shoppinglists/{user['id']}/list",
+    )
+    item_ids = sorted({x for slist in response.json() for x in slist["items"]})
+    for i in range(0, len(item_ids), BATCH_SIZE):
+        ids = item_ids[i : i + BATCH_SIZE]
+        await rec.call(client, "POST", "/items/batch", "/items/batch", json={"ids": ids})
+
+
+async def add_item(
+    rec: Recorder, client: httpx.AsyncClient, data: Dataset, rng: random.Random
+) -> None:
+    user = rng.choice(data.users)
+    if not data.lists_of[user["id"]]:
+        return
+    shoppinglist_id = rng.choice(data.lists_of[user["id"]])
+    await rec.call(
+        client,
+        "POST",
+        "/shoppinglists/{shoppinglist_id}/items/add",
+        f"/shoppinglists/{shoppinglist_id}/items/add",
+        json={"items": [rng.choice(data.items)], "added_by": user["id"]},
+    )
+
+
+async def invite(
+    rec: Recorder, client: httpx.AsyncClient, data: Dataset, rng: random.Random
+) -> None:
+    user = rng.choice(data.users)
+    if not data.lists_of[user["id"]]:
+        return
+    shoppinglist_id = rng.choice(data.lists_of[user["id"]])
+    await rec.call(
+        client,
+        "PUT",
+        "/shoppinglists/{shoppinglist_id}/members/invite",
+        f"/shoppinglists/{shoppinglist_id}/members/invite",
+        json={"email": rng.choice(data.users)["email"]},
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "page_load": page_load,
+    "add_item": add_item,
+    "invite": invite,
+}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(
+                f"Unknown scenario {name!r}, pick from {', '.join(SCENARIOS)}"
+            )
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def import_rows(client: httpx.AsyncClient, kind: str, rows: list[dict]) -> None:
+    body = "\n".join(json.dumps(x) for x in rows)
+    response = await client.post(f"/{kind}/import", content=body)
+    response.raise_for_status()
+    if response.json()["failed"]:
+        raise RuntimeError(f"Seeding {kind} failed: {response.json()['errors'][:3]}")
+
+
+async def export_rows(client: httpx.AsyncClient, kind: str) -> list[dict]:
+    response = await client.get(f"/{kind}/export")
+    response.raise_for_status()
+    return [json.loads(x) for x in response.text.splitlines() if x]
+
+
+async def seed(
+    client: httpx.AsyncClient,
+    n_users: int,
+    n_lists: int,
+    n_items: int,
+    list_size: int,
+    rng: random.Random,
+) -> Dataset:
+    # Names are tagged per run so a shared server can be seeded again
+    tag = time.time_ns()
+    await import_rows(
+        client,
+        "users",
+        [
+            {"name": f"Load {i}", "email": f"load{i}.{tag}@example.com"}
+            for i in range(n_users)
+        ],
+    )
+    await import_rows(
+        client, "items", [{"name": f"Load item {tag} {i}"} for i in range(n_items)]
+    )
+    users = [x for x in await export_rows(client, "users") if str(tag) in x["email"]]
+    items = [
+        x["id"] for x in await export_rows(client, "items") if str(tag) in x["name"]
+    ]
+
+    user_ids = [x["id"] for x in users]
+    await import_rows(
+        client,
+        "shoppinglists",
+        [
+            {
+                "name": f"Load list {tag} {i}",
+                "owner": rng.choice(user_ids),
+                "members": rng.sample(user_ids, min(3, len(user_ids))),
+                "items": rng.sample(items, min(list_size, len(items))),
+            }
+            for i in range(n_lists)
+        ],
+    )
+    lists_of = defaultdict(list)
+    for slist in await export_rows(client, "shoppinglists"):
+        if str(tag) in slist["name"]:
+            for user_id in {slist["owner"], *slist["members"]}:
+                lists_of[user_id].append(slist["id"])
+    return Dataset(users, items, lists_of)
+
+
+def percentile(values: list[float], p: float) -> float:
+    # Nearest rank on sorted values
+    return values[max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))]
+
+
+def summarize(samples: list[float], errors: int, seconds: float) -> dict:
+    values = sorted(samples)
+    summary = {
+        "count": len(values),
+        "errors": errors,
+        "per_second": len(values) / seconds,
+        "mean_ms": sum(values) / len(values) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = percentile(values, p) * 1000
+    return summary
+
+
+def storage_calls() -> dict[str, tuple[int, float]]:
+    # Count and total of storage round-trips per route, from the in-process
+    # metrics, keyed the same way as Recorder.routes
+    from app import metrics
+
+    return {
+        f"{method} {route}": (series.count, series.sum)
+        for (method, route), series in metrics.request_storage_calls.series.items()
+    }
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    data: Dataset,
+    clients: int,
+    duration: float,
+    mix: dict[str, float],
+    rng: random.Random,
+    in_process: bool,
+) -> dict:
+    rec = Recorder()
+    names, weights = list(mix), list(mix.values())
+    before = storage_calls() if in_process else {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_rng: random.Random) -> None:
+        while time.perf_counter() < deadline:
+            name = worker_rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            await SCENARIOS[name](rec, client, data, worker_rng)
+            rec.scenarios[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(worker(random.Random(rng.random())) for _ in range(clients))
+    )
+    seconds = time.perf_counter() - start
+
+    routes = {
+        route: summarize(samples, rec.errors[route], seconds)
+        for route, samples in sorted(rec.routes.items())
+    }
+    if in_process:
+        after = storage_calls()
+        for route, summary in routes.items():
+            count, total = after.get(route, (0, 0.0))
+            count_before, total_before = before.get(route, (0, 0.0))
+            if count > count_before:
+                summary["storage_calls"] = (total - total_before) / (
+                    count - count_before
+                )
+    return {
+        "clients": clients,
+        "seconds": seconds,
+        "requests_per_second": sum(len(x) for x in rec.routes.values()) / seconds,
+        "routes": routes,
+        "scenarios": {
+            name: summarize(samples, 0, seconds)
+            for name, samples in sorted(rec.scenarios.items())
+        },
+    }
+
+
+def report(level: dict, baseline: dict | None) -> None:
+    print(
+        f"\n{level['clients']} clients, "
+        f"{level['requests_per_second']:.1f} req/s over {level['seconds']:.1f}s"
+    )
+    width = max(len(x) for kind in ("routes", "scenarios") for x in level[kind])
+    header = f"{'':<{width}} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}"
+    header += f" {'err':>5} {'storage':>7}"
+    if baseline:
+        header += f" {'p50 vs base':>11} {'p99 vs base':>11}"
+    print(header)
+    for kind in ("routes", "scenarios"):
+        for name, s in level[kind].items():
+            calls = s.get("storage_calls")
+            line = (
+                f"{name:<{width}} {s['per_second']:>8.1f} {s['p50_ms']:>8.2f}"
+                f" {s['p90_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['errors']:>5}"
+                f" {'' if calls is None else f'{calls:.1f}':>7}"
+            )
+            old = (baseline or {}).get(kind, {}).get(name)
+            if old:
+                for p in ("p50_ms", "p99_ms"):
+                    line += f" {(s[p] / old[p] - 1) * 100:>+10.1f}%"
+            print(line)
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    if args.url:
+        target = args.url
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+        lifespan = None
+    else:
+        from app import app, con
+
+        from .concurrency import TABLES
+
+        target = f"in process ({con.storage.__class__.__name__})"
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://benchmark",
+            timeout=None,
+        )
+        lifespan = app.router.lifespan_context(app)
+
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+            for table in TABLES:
+                await con.storage.create_table(table)
+        try:
+            data = await seed(
+                client, args.users, args.lists, args.items, args.list_items, rng
+            )
+            levels = []
+            for clients in args.clients:
+                level = await run_level(
+                    client,
+                    data,
+                    clients,
+                    args.duration,
+                    args.mix,
+                    rng,
+                    in_process=lifespan is not None,
+                )
+                levels.append(level)
+                old = next(
+                    (x for x in args.baseline_levels if x["clients"] == clients), None
+                )
+                report(level, old)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+    if args.output:
+        result = {
+            "commit": commit(),
+            "started": datetime.now(UTC).isoformat(),
+            "target": target,
+            "config": {
+                "users": args.users,
+                "lists": args.lists,
+                "items": args.items,
+                "list_items": args.list_items,
+                "duration": args.duration,
+                "mix": args.mix,
+                "seed": args.seed,
+            },
+            "levels": levels,
+        }
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=400)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--list-items", type=int, default=30, help="items per list")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="per level")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default="page_load=8,add_item=1,invite=1",
+        help="scenario weights, e.g. page_load=8,add_item=1,invite=1",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="run against this server instead")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    args.baseline_levels = (
+        json.loads(Path(args.baseline).read_text())["levels"] if args.baseline else []
+    )
+    logging.basicConfig(level=args.log_level)
+    for name in ("app", "httpx"):
+        logging.getLogger(name).setLevel(args.log_level)
+    asyncio.run(main(args))
@@ -0,0 +1,162 @@
+"""Per-call overhead of the ``@log`` decorator, before and after.
+
+Times a trivial method undecorated, with the decorator as it was before
+(``legacy_log``, kept here for comparison) and with ``app.util.log``, and
+reports each one's overhead per call for sync and async functions. Log
+records go to ``os.devnull`` so the numbers show the cost of the decorator
+itself, not terminal output. ``--level DEBUG`` includes argument formatting
+and the call and completion records, which the current decorator only
+emits at DEBUG. Importing ``app`` builds the controller, so run it against
+the in-memory backend:
+
+    export STORAGE_BACKEND=memory HASH_KEY=benchmark
+    uv run python -m benchmarks.log_overhead
+    uv run python -m benchmarks.log_overhead --level DEBUG
+"""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import time
+import timeit
+from collections.abc import Callable
+
+
+def legacy_log(func: Callable) -> Callable:
+    # The decorator before it was reworked: a logger looked up, logging
+    # configured and every argument repr'd on each call, then two records
+    # formatted eagerly at INFO
+    from app.config import settings
+
+    def log_call(args: tuple, kwargs: dict) -> logging.Logger:
+        logging.basicConfig(level=logging.DEBUG if settings.debug else logging.INFO)
+        first = next(iter(args), None)
+        loggers = [x for x in kwargs.values() if isinstance(x, logging.Logger)]
+        loggers += [x for x in args if isinstance(x, logging.Logger)]
+        if hasattr(first, "__dict__"):
+            loggers += [
+                x for x in first.__dict__.values() if isinstance(x, logging.Logger)
+            ]
+        logger = next(iter(loggers), logging.getLogger())
+        args_repr = [repr(a) for a in args]
+        kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
+        signature = ", ".join(args_repr + kwargs_repr)
+        if settings.debug:
+            logger.debug(f"function {func.__name__} called with args {signature}")
+        else:
+            logger.info(f"function {func.__name__} called")
+        return logger
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs) -> str:  # noqa: ANN002, ANN003
+            logger = log_call(args, kwargs)
+            start_time = time.time()
+            result = await func(*args, **kwargs)
+            elapsed_time = time.time() - start_time
+            logger.info(
+                f"function {func.__name__} completed in {elapsed_time:.4f} seconds"
+            )
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> str:  # noqa: ANN002, ANN003
+        logger = log_call(args, kwargs)
+        start_time = time.time()
+        result = func(*args, **kwargs)
+        elapsed_time = time.time() - start_time
+        logger.info(f"function {func.__name__} completed in {elapsed_time:.4f} seconds")
+        return result
+
+    return wrapper
+
+
+def run(n_calls: int) -> None:
+    from app.util import log
+
+    class Service:
+        def __init__(self) -> None:
+            self.logger = logging.getLogger(__name__)
+            self.payload = {"name": "Benchmark", "email": "benchmark@example.com"}
+
+        def plain(self, item_id: str, *, expand: str | None = None) -> str:
+            return item_id
+
+        @legacy_log
+        def before(self, item_id: str, *, expand: str | None = None) -> str:
+            return item_id
+
+        @log
+        def after(self, item_id: str, *, expand: str | None = None) -> str:
+            return item_id
+
+        async def plain_async(self, item_id: str) -> str:
+            return item_id
+
+        @legacy_log
+        async def before_async(self, item_id: str) -> str:
+            return item_id
+
+        @log
+        async def after_async(self, item_id: str) -> str:
+            return item_id
+
+    service = Service()
+    loop = asyncio.new_event_loop()
+
+    def per_call(stmt: callable) -> float:
+        return min(timeit.repeat(stmt, number=n_calls, repeat=5)) / n_calls * 1e6
+
+    def per_async_call(coro_fn: callable) -> float:
+        async def many() -> None:
+            for _ in range(n_calls):
+                await coro_fn("item")
+
+        runs = timeit.repeat(
+            lambda: loop.run_until_complete(many()), number=1, repeat=5
+        )
+        return min(runs) / n_calls * 1e6
+
+    rows = [
+        (
+            "sync",
+            per_call(lambda: service.plain("item", expand="items")),
+            per_call(lambda: service.before("item", expand="items")),
+            per_call(lambda: service.after("item", expand="items")),
+        ),
+        (
+            "async",
+            per_async_call(service.plain_async),
+            per_async_call(service.before_async),
+            per_async_call(service.after_async),
+        ),
+    ]
+    loop.close()
+
+    print(
+        f"{'':>6} {'plain us':>10} {'before us':>10} {'after us':>10}"
+        f" {'before +us':>11} {'after +us':>10}"
+    )
+    for name, plain, before, after in rows:
+        print(
+            f"{name:>6} {plain:>10.3f} {before:>10.3f} {after:>10.3f}"
+            f" {before - plain:>11.3f} {after - plain:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--level", default="INFO", choices=["DEBUG", "INFO", "WARNING"])
+    args = parser.parse_args()
+    logging.basicConfig(
+        stream=open(os.devnull, "w"),  # noqa: SIM115
+        level=getattr(logging, args.level),
+    )
+    run(args.calls)
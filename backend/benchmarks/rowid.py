@@ -0,0 +1,58 @@
+"""Row id hashing cost.
+
+Times a fresh HMAC per call against the copied key, the memo and the batch
+API. Importing ``app`` builds the controller, so run it against the
+in-memory backend:
+
+    export STORAGE_BACKEND=memory HASH_KEY=benchmark
+    uv run python -m benchmarks.rowid
+
+``tests/test_rowid.py`` checks that the backend and frontend copies agree.
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import timeit
+
+
+def fresh(primary_key: str) -> str:
+    # How ids were made before app.rowid, a new keyed HMAC every time
+    message = primary_key.lower().strip().encode("utf-8")
+    key = os.environ["HASH_KEY"].encode("utf-8")
+    digest = hmac.new(key, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode("utf-8").rstrip("=")
+
+
+def bench(n_keys: int, repeat: int) -> None:
+    from app.rowid import make_rowid, make_rowids
+
+    keys = [f"user{i}@example.com" for i in range(n_keys)]
+    hot = keys[: min(n_keys, 100)]
+
+    timings = {
+        "fresh hmac": min(
+            timeit.repeat(lambda: [fresh(x) for x in keys], number=1, repeat=repeat)
+        ),
+        "batch": min(timeit.repeat(lambda: make_rowids(keys), number=1, repeat=repeat)),
+        "memo, hot": min(
+            timeit.repeat(
+                lambda: [make_rowid(hot[i % len(hot)]) for i in range(n_keys)],
+                number=1,
+                repeat=repeat,
+            )
+        ),
+    }
+    print(f"{'path':>12} {'us/id':>8}")
+    for name, seconds in timings.items():
+        print(f"{name:>12} {seconds / n_keys * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    bench(args.keys, args.repeat)
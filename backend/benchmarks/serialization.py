@@ -0,0 +1,84 @@
+"""Response serialization cost on large lists.
+
+Seeds a catalogue of ``--items`` items, a list holding all of them and a user
+who is a member of ``--lists`` such lists, then times the read endpoints whose
+cost is mostly building and encoding the response body: a list, the same list
+with its items expanded, every list of the user, and the item catalogue both
+as a cached page and streamed whole. Storage is in process memory, so the
+numbers are the API layer's own:
+
+    export STORAGE_BACKEND=memory HASH_KEY=benchmark
+    uv run python -m benchmarks.serialization --items 5000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app import app, con
+
+from .concurrency import TABLES
+
+
+async def seed(client: httpx.AsyncClient, n_items: int, n_lists: int) -> dict:
+    for table in TABLES:
+        await con.storage.create_table(table)
+    user = {"name": "Benchmark", "email": "benchmark@example.com"}
+    owner = (await client.post("/users", json=user)).json()["id"]
+    body = "\n".join(
+        json.dumps({"name": f"Benchmark item {i}"}) for i in range(n_items)
+    )
+    (await client.post("/items/import", content=body)).raise_for_status()
+    items = [x["id"] for x in (await client.get("/items/list")).json()]
+    lists = []
+    for i in range(n_lists):
+        shoppinglist = {
+            "name": f"Benchmark {i}",
+            "owner": owner,
+            "members": [f"member{n}" for n in range(20)],
+            "items": items,
+        }
+        lists.append((await client.post("/shoppinglists", json=shoppinglist)).json())
+    return {"owner": owner, "list": lists[0]["id"]}
+
+
+async def timed(client: httpx.AsyncClient, path: str, repeat: int) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(response.content)
+
+
+async def main(n_items: int, n_lists: int, repeat: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+            ids = await seed(client, n_items, n_lists)
+            paths = {
+                "list": f"/shoppinglists/{ids['list']}",
+                "list, expanded": f"/shoppinglists/{ids['list']}?expand=items",
+                "user's lists": f"/shoppinglists/{ids['owner']}/list",
+                "items page": "/items/list?limit=1000",
+                "items, all": "/items/list",
+            }
+            results = {k: await timed(client, v, repeat) for k, v in paths.items()}
+    print(f"{'endpoint':>16} {'ms':>8} {'KiB':>8}")
+    for name, (ms, size) in results.items():
+        print(f"{name:>16} {ms:>8.2f} {size / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--lists", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.lists, args.repeat))
@@ -0,0 +1,161 @@
+"""Cold start time of the API process.
+
+Starts the server ``--runs`` times per launch mode and times how long it takes
+to accept connections, to report ready on ``/ready`` and to answer the
+requests of a first page load, then the same requests again once warm. The
+modes are the production entrypoint (``app.serve``), the same with no compiled
+bytecode to reuse, and the old ``uvicorn --reload`` entrypoint. Storage is a
+SQLite file seeded with ``--items`` items unless ``STORAGE_BACKEND`` says
+otherwise, in which case the environment is passed on as it is:
+
+    uv run python -m benchmarks.startup --runs 5 --items 2000
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import httpx
+
+BACKEND = Path(__file__).resolve().parents[1]
+MODES = {
+    "serve": ["-m", "app.serve", "--workers", "1"],
+    "serve, no bytecode": ["-m", "app.serve", "--workers", "1"],
+    "uvicorn --reload": ["-m", "uvicorn", "app:app", "--reload"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(mode: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *MODES[mode], "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+        cwd=BACKEND,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def wait_for(check: Callable[[], bool], timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            raise RuntimeError("The server didn't come up")
+        time.sleep(0.005)
+
+
+def listening(port: int) -> bool:
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=1).close()
+    except OSError:
+        return False
+    return True
+
+
+def ready(client: httpx.Client) -> bool:
+    try:
+        return client.get("/ready").status_code == 200
+    except httpx.TransportError:
+        return False
+
+
+def page_load(client: httpx.Client, item_id: str) -> float:
+    # What the frontend asks for when it first opens
+    started = time.perf_counter()
+    for path in ("/users/list?limit=20", f"/items/{item_id}", "/items/search?q=startup"):
+        client.get(path).raise_for_status()
+    return time.perf_counter() - started
+
+
+def seed(env: dict, items: int) -> str:
+    port = free_port()
+    server = start("serve", port, env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            wait_for(lambda: ready(client))
+            body = "".join(
+                json.dumps({"name": f"Startup item {i}"}) + "\n" for i in range(items)
+            )
+            client.post(
+                "/items/import", content=body, params={"overwrite": "true"}
+            ).raise_for_status()
+            return client.get("/items/search", params={"q": "startup"}).json()[0]["id"]
+    finally:
+        stop(server)
+
+
+def measure(mode: str, env: dict, item_id: str) -> dict:
+    with tempfile.TemporaryDirectory() as pycache:
+        if mode == "serve, no bytecode":
+            # An empty cache directory, so every module is compiled from source
+            env = {**env, "PYTHONPYCACHEPREFIX": pycache}
+        return measure_once(mode, env, item_id)
+
+
+def measure_once(mode: str, env: dict, item_id: str) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = start(mode, port, env)
+    try:
+        wait_for(lambda: listening(port))
+        result = {"listening": time.perf_counter() - started}
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            wait_for(lambda: ready(client))
+            result["ready"] = time.perf_counter() - started
+            result["first"] = page_load(client, item_id)
+            result["warm"] = page_load(client, item_id)
+        return result
+    finally:
+        stop(server)
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, "HASH_KEY": os.environ.get("HASH_KEY", "startup")}
+        if "STORAGE_BACKEND" not in os.environ:
+            env["STORAGE_BACKEND"] = "sqlite"
+            env["SQLITE_PATH"] = str(Path(directory) / "startup.db")
+        # A single process, whatever the environment says
+        env.pop("BUS_PATH", None)
+        item_id = seed(env, args.items)
+
+        print(
+            f"{'mode':>20} {'listening s':>12} {'ready s':>8}"
+            f" {'first load ms':>14} {'warm load ms':>13}"
+        )
+        for mode in MODES:
+            runs = [measure(mode, env, item_id) for _ in range(args.runs)]
+            median = {x: statistics.median(r[x] for r in runs) for x in runs[0]}
+            print(
+                f"{mode:>20} {median['listening']:>12.3f} {median['ready']:>8.3f}"
+                f" {median['first'] * 1000:>14.1f} {median['warm'] * 1000:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--items", type=int, default=2000)
+    main(parser.parse_args())
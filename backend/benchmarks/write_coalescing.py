@@ -0,0 +1,114 @@
+"""Writes saved by coalescing bursts of item edits to one list.
+
+Adds items to a list in bursts of ``--burst`` concurrent requests, the way
+a user ticking through a shopping list does, with coalescing off and then
+with a ``--window`` second window, for both list layouts. Reports storage
+writes per edit and per burst, edits/second and failed edits. An edit fails
+when its response is an error or lacks its item, or when the list misses it
+after the burst. Without coalescing large bursts fail once conflicting
+writes run out of retries; with it any failure makes the check fail:
+
+    export STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/coalescing.db HASH_KEY=benchmark
+    uv run python -m benchmarks.write_coalescing --burst 1 5 20
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app import app, con, metrics
+from app.batching import WriteBatcher
+from app.config import settings
+
+from .concurrency import TABLES
+
+WRITES = {"create_entity", "update_entity", "upsert_entity", "delete_entity"}
+
+
+def list_writes() -> int:
+    # Writes to the list and its item rows, a transaction counting as one
+    return sum(
+        x.count
+        for (table, operation), x in metrics.storage_duration.series.items()
+        if table in ("lists", "listitems")
+        and (operation in WRITES or operation == "submit_transaction")
+    )
+
+
+async def run(
+    client: httpx.AsyncClient, user_id: str, burst: int, bursts: int
+) -> tuple[float, float, int]:
+    response = await client.post(
+        "/shoppinglists",
+        json={"name": f"Coalescing {time.time_ns()}", "owner": user_id},
+    )
+    response.raise_for_status()
+    shoppinglist_id = response.json()["id"]
+    path = f"/shoppinglists/{shoppinglist_id}/items/add"
+    added, failed = [], set()
+
+    async def add(item_id: str) -> None:
+        response = await client.post(path, json={"items": [item_id]})
+        if response.status_code != 200 or item_id not in response.json()["items"]:
+            failed.add(item_id)
+
+    writes = list_writes()
+    start = time.perf_counter()
+    for n in range(bursts):
+        items = [f"item-{n}-{i}" for i in range(burst)]
+        await asyncio.gather(*(add(x) for x in items))
+        added += items
+        stored = (await client.get(f"/shoppinglists/{shoppinglist_id}")).json()
+        failed.update(set(added) - set(stored["items"]))
+    elapsed = time.perf_counter() - start
+    return (list_writes() - writes) / len(added), len(added) / elapsed, len(failed)
+
+
+async def main(levels: list[int], bursts: int, window: float) -> int:
+    transport = httpx.ASGITransport(app=app)
+    errors = 0
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            for table in TABLES:
+                await con.storage.create_table(table)
+            email = f"coalescing{time.time_ns()}@example.com"
+            response = await client.post(
+                "/users", json={"name": "Benchmark", "email": email}
+            )
+            user_id = response.json()["id"]
+            print(
+                f"{'layout':>6} {'window s':>9} {'burst':>6}"
+                f" {'writes/edit':>12} {'writes/burst':>13} {'edits/s':>9}"
+                f" {'failed':>7}"
+            )
+            for layout in ("blob", "rows"):
+                settings.list_layout = layout
+                for coalesce in (0.0, window):
+                    con.list_writes = (
+                        WriteBatcher(coalesce, con._write_items) if coalesce else None
+                    )
+                    for burst in levels:
+                        per_edit, rate, failed = await run(
+                            client, user_id, burst, bursts
+                        )
+                        if coalesce:
+                            errors += failed
+                        print(
+                            f"{layout:>6} {coalesce:>9} {burst:>6} {per_edit:>12.2f}"
+                            f" {per_edit * burst:>13.2f} {rate:>9.1f} {failed:>7}"
+                        )
+    print(f"Failed edits with coalescing: {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--window", type=float, default=0.02)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.burst, args.bursts, args.window)))
@@ -0,0 +1,45 @@
+import os
+
+# Read when the app is imported, so set before the tests import it
+os.environ.setdefault("HASH_KEY", "tests")
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.pop("BUS_PATH", None)
+
+from collections.abc import Iterator  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import app  # noqa: E402
+from app.config import settings  # noqa: E402
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(params=["blob", "rows"])
+def layout(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setattr(settings, "list_layout", request.param)
+    return request.param
+
+
+@pytest.fixture
+def user(client: TestClient) -> dict:
+    response = client.post(
+        "/users", json={"name": "Owner", "email": f"{os.urandom(6).hex()}@example.com"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+@pytest.fixture
+def shoppinglist(client: TestClient, user: dict, layout: str) -> dict:
+    response = client.post(
+        "/shoppinglists",
+        json={"name": f"List {os.urandom(6).hex()}", "owner": user["id"]},
+    )
+    response.raise_for_status()
+    return response.json()
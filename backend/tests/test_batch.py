@@ -0,0 +1,36 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import con
+from app.schemas import MAX_BATCH_SIZE
+
+
+def test_batch_lookup_is_bounded(client: TestClient) -> None:
+    ids = [f"item-{i}" for i in range(101)]
+    assert client.post("/items/batch", json={"ids": ids[:100]}).status_code == 200
+    assert client.post("/items/batch", json={"ids": ids}).status_code == 422
+    assert client.post("/users/batch", json={"ids": ids}).status_code == 422
+
+
+def test_expand_looks_up_in_bounded_batches(
+    client: TestClient, shoppinglist: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    names = [f"Batch {os.urandom(4).hex()} {i}" for i in range(MAX_BATCH_SIZE + 50)]
+    ids = [client.post("/items", json={"name": x}).json()["id"] for x in names]
+    for i in range(0, len(ids), MAX_BATCH_SIZE):
+        batch = ids[i : i + MAX_BATCH_SIZE]
+        client.post(f"{path}/items/add", json={"items": batch}).raise_for_status()
+    sizes = []
+    get_items = con.get_items
+
+    async def counted(item_ids: list[str]) -> list:
+        sizes.append(len(item_ids))
+        return await get_items(item_ids)
+
+    monkeypatch.setattr(con, "get_items", counted)
+    expanded = client.get(path, params={"expand": "items"}).json()
+    assert [x["id"] for x in expanded["items"]] == ids
+    assert sizes == [MAX_BATCH_SIZE, 50]
@@ -0,0 +1,65 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from app import con
+
+
+def test_user_update_is_read_back(client: TestClient, user: dict) -> None:
+    # Both reads fill the cache before the change
+    assert client.get(f"/users/{user['id']}").json()["name"] == "Owner"
+    assert user in client.get("/users/list").json()
+
+    client.put(f"/users/{user['id']}", json={"name": "Renamed"}).raise_for_status()
+
+    assert client.get(f"/users/{user['id']}").json()["name"] == "Renamed"
+    assert {**user, "name": "Renamed"} in client.get("/users/list").json()
+
+
+def test_deleted_user_is_gone(client: TestClient, user: dict) -> None:
+    client.get(f"/users/{user['id']}").raise_for_status()
+    client.delete(f"/users/{user['id']}").raise_for_status()
+    assert client.get(f"/users/{user['id']}").status_code == 404
+
+
+def test_item_create_and_delete_reach_search(client: TestClient) -> None:
+    name = f"Kiwi {os.urandom(4).hex()}"
+    search = {"q": name.lower()}
+    assert client.get("/items/search", params=search).json() == []
+
+    item = client.post("/items", json={"name": name}).json()
+    client.get(f"/items/{item['id']}").raise_for_status()
+    assert item["id"] in [x["id"] for x in client.get("/items/search", params=search).json()]
+
+    client.delete(f"/items/{item['id']}").raise_for_status()
+    assert client.get(f"/items/{item['id']}").status_code == 404
+    assert client.get("/items/search", params=search).json() == []
+
+
+def test_invite_and_removal_reach_the_listing(
+    client: TestClient, user: dict, shoppinglist: dict
+) -> None:
+    email = f"{os.urandom(6).hex()}@example.com"
+    member = client.post("/users", json={"name": "Member", "email": email}).json()
+    listing = f"/shoppinglists/{member['id']}/list"
+    assert client.get(listing).json() == []
+
+    path = f"/shoppinglists/{shoppinglist['id']}/members"
+    client.put(f"{path}/invite", json={"email": email}).raise_for_status()
+    assert [x["id"] for x in client.get(listing).json()] == [shoppinglist["id"]]
+
+    client.request("DELETE", f"{path}/delete", json={"email": email}).raise_for_status()
+    assert client.get(listing).json() == []
+
+
+def test_only_first_pages_are_cached(client: TestClient) -> None:
+    for i in range(3):
+        client.post("/items", json={"name": f"Page {os.urandom(4).hex()} {i}"})
+    con.item_pages.clear()
+
+    response = client.get("/items/list", params={"limit": 1})
+    while "X-Continuation-Token" in response.headers:
+        token = response.headers["X-Continuation-Token"]
+        response = client.get("/items/list", params={"limit": 1, "continuation": token})
+    assert client.get("/items/list").status_code == 200
+    assert len(con.item_pages.data) == 2
@@ -0,0 +1,124 @@
+import os
+from collections.abc import AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import con
+from app.config import settings
+from app.controller import change_key
+from app.schemas import ShoppingListUpdate
+
+
+def apply(shoppinglist: dict, changes: list[dict]) -> None:
+    for change in changes:
+        if change["type"] not in ("items", "members"):
+            continue
+        values = shoppinglist[change["type"]]
+        removed = set(change["removed"])
+        values[:] = change.get(
+            "order",
+            [x for x in values if x not in removed]
+            + [x for x in change["added"] if x not in values],
+        )
+
+
+def refresh(client: TestClient, shoppinglist: dict) -> dict:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    response = client.get(f"{path}/changes", params={"since": shoppinglist["version"]})
+    response.raise_for_status()
+    changes = response.json()
+    assert not changes["resync"]
+    copy = {**shoppinglist, "items": [*shoppinglist["items"]]}
+    copy["members"] = [*shoppinglist["members"]]
+    apply(copy, changes["changes"])
+    copy["version"] = changes["version"]
+    return copy
+
+
+def test_changes_rebuild_the_list(client: TestClient, shoppinglist: dict) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    client.post(f"{path}/items/add", json={"items": ["milk", "eggs"]})
+    client.request("DELETE", f"{path}/items/remove", json={"items": ["milk"]})
+    client.put(f"{path}/items/reorder", json={"items": ["eggs"]})
+    stored = client.get(path).json()
+    copy = refresh(client, shoppinglist)
+    assert (copy["items"], copy["version"]) == (stored["items"], stored["version"])
+
+
+def test_lost_race_keeps_the_winners_change(
+    client: TestClient, user: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # A reorder loses its write to an update that makes the same order, and
+    # then has nothing left to do
+    monkeypatch.setattr(settings, "list_layout", "blob")
+    email = f"{os.urandom(6).hex()}@example.com"
+    member = client.post("/users", json={"name": "Member", "email": email}).json()
+    shoppinglist = client.post(
+        "/shoppinglists",
+        json={"name": f"Race {email}", "owner": user["id"], "items": ["a", "b"]},
+    ).json()
+    table = con.shoppinglists_table_client
+    update_entity = table.update_entity
+    raced = False
+
+    async def racing_update_entity(**kwargs) -> str:  # noqa: ANN003
+        nonlocal raced
+        if not raced:
+            raced = True
+            monkeypatch.setattr(table, "update_entity", update_entity)
+            await con.update_shoppinglist(
+                shoppinglist["id"],
+                ShoppingListUpdate(members=[member["id"]], items=["b", "a"]),
+            )
+        return await update_entity(**kwargs)
+
+    monkeypatch.setattr(table, "update_entity", racing_update_entity)
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    response = client.put(f"{path}/items/reorder", json={"items": ["b", "a"]})
+    response.raise_for_status()
+    assert raced
+
+    stored = client.get(path).json()
+    copy = refresh(client, shoppinglist)
+    assert copy["version"] == stored["version"] == shoppinglist["version"] + 1
+    assert (copy["items"], copy["members"]) == (["b", "a"], [member["id"]])
+
+
+def test_unchanged_update_is_not_a_change(
+    client: TestClient, shoppinglist: dict
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    client.put(path, json={"items": ["milk"]}).raise_for_status()
+    version = client.get(path).json()["version"]
+
+    response = client.put(path, json={"items": ["milk"], "members": []})
+    response.raise_for_status()
+    assert response.json()["version"] == version
+    changes = client.get(f"{path}/changes", params={"since": version}).json()
+    assert changes == {"version": version, "changes": [], "resync": False}
+
+
+def test_changes_are_read_in_one_query(
+    client: TestClient, shoppinglist: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    for item in ("milk", "eggs", "bread"):
+        client.post(f"{path}/items/add", json={"items": [item]}).raise_for_status()
+    table = con.listchanges_table_client
+    query_entities = table.query_entities
+    queries = []
+
+    def counted(partition_key: str, after: str | None = None) -> AsyncIterator:
+        queries.append(after)
+        return query_entities(partition_key, after)
+
+    monkeypatch.setattr(table, "get_entity", None)
+    monkeypatch.setattr(table, "query_entities", counted)
+    copy = refresh(client, shoppinglist)
+    assert copy["items"] == client.get(path).json()["items"]
+    assert queries == [change_key(shoppinglist["version"])]
+
+    # Nothing new costs the read of the list only
+    refresh(client, copy)
+    assert len(queries) == 1
@@ -0,0 +1,181 @@
+"""Reads across workers never show a change they should have been told of.
+
+Starts ``app.serve`` with several workers on a throwaway SQLite file, then
+changes a user, creates and deletes an item and edits a list. After every
+change the result is read back over fresh connections, which the kernel
+spreads over the workers, each of which had the old state cached by then.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import suppress
+from pathlib import Path
+
+import httpx
+import pytest
+
+WORKERS = 3
+ROUNDS = 3
+READS = 12
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def request(base_url: str, method: str, path: str, **kwargs) -> httpx.Response:  # noqa: ANN003
+    # A new connection each time, so consecutive requests land on any worker
+    async with httpx.AsyncClient(base_url=base_url, timeout=10) as client:
+        return await client.request(method, path, **kwargs)
+
+
+async def wait_until_up(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await request(base_url, "GET", "/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("The server didn't come up")
+        await asyncio.sleep(0.2)
+
+
+@pytest.fixture
+def base_url(tmp_path: Path) -> Iterator[str]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": str(tmp_path / "coherence.db"),
+    }
+    env.pop("BUS_PATH", None)
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            *("-m", "app.serve", "--workers", str(WORKERS)),
+            *("--host", "127.0.0.1", "--port", str(port)),
+        ],
+        env=env,
+        cwd=Path(__file__).resolve().parents[1],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_up(base_url))
+        yield base_url
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+class Check:
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.stale = Counter()
+
+    async def read_all(
+        self,
+        name: str,
+        path: str,
+        fresh: Callable[[httpx.Response], bool],
+        **kwargs,  # noqa: ANN003
+    ) -> None:
+        responses = await asyncio.gather(
+            *(request(self.base_url, "GET", path, **kwargs) for _ in range(READS))
+        )
+        self.stale[name] += sum(not fresh(x) for x in responses)
+
+    async def call(self, method: str, path: str, **kwargs) -> dict:  # noqa: ANN003
+        response = await request(self.base_url, method, path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+
+async def watch(base_url: str, shoppinglist_id: str, events: asyncio.Queue) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        path = f"/shoppinglists/{shoppinglist_id}/events"
+        async with client.stream("GET", path) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    await events.put(json.loads(line[len("data: ") :]))
+
+
+async def run(base_url: str) -> Counter:
+    check = Check(base_url)
+    tag = time.time_ns()
+    user = await check.call(
+        "POST", "/users", json={"name": "Round 0", "email": f"c{tag}@example.com"}
+    )
+    shoppinglist = await check.call(
+        "POST", "/shoppinglists", json={"name": f"Coherence {tag}", "owner": user["id"]}
+    )
+    events: asyncio.Queue = asyncio.Queue()
+    watcher = asyncio.create_task(watch(base_url, shoppinglist["id"], events))
+    version = (await asyncio.wait_for(events.get(), 10))["version"]
+
+    try:
+        for n in range(1, ROUNDS + 1):
+            name = f"Round {n}"
+            await check.call("PUT", f"/users/{user['id']}", json={"name": name})
+            await check.read_all(
+                "user", f"/users/{user['id']}", lambda r: r.json()["name"] == name
+            )
+            await check.read_all(
+                "users listing",
+                "/users/list",
+                lambda r: {"id": user["id"], "email": user["email"], "name": name}
+                in r.json(),
+            )
+
+            item = await check.call("POST", "/items", json={"name": f"Kiwi {tag} {n}"})
+            found = lambda r: item["id"] in [x["id"] for x in r.json()]  # noqa: E731
+            search = {"q": f"kiwi {tag} {n}"}
+            await check.read_all("item", f"/items/{item['id']}", lambda r: r.is_success)
+            await check.read_all("item search", "/items/search", found, params=search)
+            await check.call("DELETE", f"/items/{item['id']}")
+            await check.read_all(
+                "deleted item", f"/items/{item['id']}", lambda r: r.status_code == 404
+            )
+            await check.read_all(
+                "item search", "/items/search", lambda r: not found(r), params=search
+            )
+
+            await check.call(
+                "POST",
+                f"/shoppinglists/{shoppinglist['id']}/items/add",
+                json={"items": [item["id"]]},
+            )
+            try:
+                event = await asyncio.wait_for(events.get(), 5)
+                if event["version"] != version + 1 or event["added"] != [item["id"]]:
+                    check.stale["list event"] += 1
+                version = event["version"]
+            except TimeoutError:
+                check.stale["list event"] += 1
+    finally:
+        watcher.cancel()
+        # Close the stream, the server waits on open ones as it shuts down
+        with suppress(asyncio.CancelledError):
+            await watcher
+    return check.stale
+
+
+def test_no_stale_reads_across_workers(base_url: str) -> None:
+    stale = asyncio.run(run(base_url))
+    assert not +stale, dict(stale)
@@ -0,0 +1,41 @@
+import pytest
+from azure.core.exceptions import ResourceModifiedError
+from fastapi.testclient import TestClient
+
+from app import con
+
+
+@pytest.fixture
+def contended(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Every conditional write loses to another writer
+    async def lose(*args, **kwargs) -> None:  # noqa: ANN002, ANN003
+        raise ResourceModifiedError("The entity has been modified.")
+
+    monkeypatch.setattr(con.shoppinglists_table_client, "update_entity", lose)
+    monkeypatch.setattr(con.listitems_table_client, "submit_transaction", lose)
+    monkeypatch.setattr(con.listitems_table_client, "update_entity", lose)
+
+
+def test_retries_running_out_is_retryable(
+    client: TestClient, shoppinglist: dict, contended: None
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    response = client.post(f"{path}/items/add", json={"items": ["milk"]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_failed_precondition_is_412(
+    client: TestClient, shoppinglist: dict, contended: None
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    response = client.post(
+        f"{path}/items/add",
+        json={"items": ["milk"]},
+        headers={"If-Match": client.get(path).headers["ETag"]},
+    )
+    assert response.status_code == 412
+    response = client.post(
+        f"{path}/items/add", json={"items": ["milk"]}, headers={"If-Match": '"stale"'}
+    )
+    assert response.status_code == 412
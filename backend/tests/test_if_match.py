@@ -0,0 +1,105 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import con
+
+
+@pytest.fixture
+def member(client: TestClient) -> dict:
+    email = f"{os.urandom(6).hex()}@example.com"
+    response = client.post("/users", json={"name": "Member", "email": email})
+    response.raise_for_status()
+    return response.json()
+
+
+def test_members_with_the_etag_just_read(
+    client: TestClient, shoppinglist: dict, member: dict
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    etag = client.get(path).headers["ETag"]
+
+    response = client.put(
+        f"{path}/members/invite",
+        json={"email": member["email"]},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["members"] == [member["id"]]
+    assert response.headers["ETag"] == client.get(path).headers["ETag"]
+
+    response = client.request(
+        "DELETE",
+        f"{path}/members/delete",
+        json={"email": member["email"]},
+        headers={"If-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["members"] == []
+
+
+def test_members_with_a_stale_etag(
+    client: TestClient, shoppinglist: dict, member: dict
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    etag = client.get(path).headers["ETag"]
+    client.post(f"{path}/items/add", json={"items": ["milk"]}).raise_for_status()
+
+    response = client.put(
+        f"{path}/members/invite",
+        json={"email": member["email"]},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 412
+    assert client.get(path).json()["members"] == []
+
+
+def test_update_with_the_etag_just_read(
+    client: TestClient, shoppinglist: dict, member: dict
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    etag = client.get(path).headers["ETag"]
+
+    response = client.put(
+        path, json={"members": [member["id"]]}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    response = client.put(
+        path, json={"items": ["milk"]}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+
+
+@pytest.mark.parametrize("layout", ["rows"], indirect=True)
+def test_row_update_with_a_stale_etag(client: TestClient, shoppinglist: dict) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    client.post(f"{path}/items/add", json={"items": ["a"]}).raise_for_status()
+    etag = client.get(path).headers["ETag"]
+    client.post(f"{path}/items/add", json={"items": ["b"]}).raise_for_status()
+
+    response = client.put(path, json={"items": ["a", "c"]}, headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert client.get(path).json()["items"] == ["a", "b"]
+
+
+@pytest.mark.parametrize("layout", ["rows"], indirect=True)
+def test_row_update_raced_after_the_etag_is_checked(
+    client: TestClient, shoppinglist: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    client.post(f"{path}/items/add", json={"items": ["a"]}).raise_for_status()
+    etag = client.get(path).headers["ETag"]
+    list_item_rows = con._list_item_rows
+
+    async def racing_list_item_rows(shoppinglist_id: str) -> list:
+        # Another member removes the item once the rows have been read
+        rows = await list_item_rows(shoppinglist_id)
+        monkeypatch.setattr(con, "_list_item_rows", list_item_rows)
+        await con._write_items(shoppinglist_id, [(lambda _: [], None)])
+        return rows
+
+    monkeypatch.setattr(con, "_list_item_rows", racing_list_item_rows)
+    response = client.put(path, json={"items": ["c", "a"]}, headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert client.get(path).json()["items"] == []
@@ -0,0 +1,35 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+
+def test_overwrite_replaces_the_whole_list(
+    client: TestClient, user: dict, shoppinglist: dict, layout: str
+) -> None:
+    email = f"{os.urandom(6).hex()}@example.com"
+    member = client.post("/users", json={"name": "Member", "email": email}).json()
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    client.put(f"{path}/members/invite", json={"email": email}).raise_for_status()
+    client.post(f"{path}/items/add", json={"items": ["a", "b"]}).raise_for_status()
+    before = client.get(path).json()
+
+    line = {"name": shoppinglist["name"], "owner": user["id"], "items": ["c", "b"]}
+    response = client.post(
+        "/shoppinglists/import",
+        params={"overwrite": "true"},
+        content=json.dumps(line).encode(),
+    )
+    assert response.json()["imported"] == 1
+
+    after = client.get(path).json()
+    assert (after["items"], after["members"]) == (["c", "b"], [])
+    assert after["version"] > before["version"]
+    assert client.get(f"/shoppinglists/{member['id']}/list").json() == []
+    changes = client.get(f"{path}/changes", params={"since": before["version"]})
+    assert changes.json()["resync"]
+
+    # The log starts again from the new version
+    client.post(f"{path}/items/add", json={"items": ["d"]}).raise_for_status()
+    changes = client.get(f"{path}/changes", params={"since": after["version"]})
+    assert [x["added"] for x in changes.json()["changes"]] == [["d"]]
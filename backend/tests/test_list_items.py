@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import con
+from app.batching import WriteBatcher
+from app.schemas import ItemsAdd
+from app.storage import MAX_TRANSACTION
+
+
+@pytest.mark.parametrize("layout", ["rows"], indirect=True)
+def test_changes_too_big_for_a_transaction_are_rejected(
+    client: TestClient, user: dict, layout: str
+) -> None:
+    items = [f"item-{i}" for i in range(MAX_TRANSACTION + 20)]
+    # A new list isn't read by anyone until it is created
+    response = client.post(
+        "/shoppinglists",
+        json={"name": f"Big {os.urandom(6).hex()}", "owner": user["id"], "items": items},
+    )
+    response.raise_for_status()
+    path = f"/shoppinglists/{response.json()['id']}"
+
+    response = client.put(f"{path}/items/reorder", json={"items": items[::-1]})
+    assert response.status_code == 400
+    more = [f"more-{i}" for i in range(MAX_TRANSACTION + 1)]
+    response = client.post(f"{path}/items/add", json={"items": more})
+    assert response.status_code == 400
+    response = client.put(path, json={"items": more})
+    assert response.status_code == 400
+    assert client.get(path).json()["items"] == items
+
+    client.post(f"{path}/items/add", json={"items": more[:10]}).raise_for_status()
+    client.delete(path).raise_for_status()
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("layout", ["rows"], indirect=True)
+def test_held_edits_too_big_together_are_written_apart(
+    client: TestClient, shoppinglist: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(con, "list_writes", WriteBatcher(0.05, con._write_items))
+    first = [f"first-{i}" for i in range(60)]
+    second = [f"second-{i}" for i in range(60)]
+
+    async def add_both() -> None:
+        await asyncio.gather(
+            con.add_items_to_shopping(shoppinglist["id"], ItemsAdd(items=first)),
+            con.add_items_to_shopping(shoppinglist["id"], ItemsAdd(items=second)),
+        )
+
+    client.portal.call(add_both)
+    path = f"/shoppinglists/{shoppinglist['id']}"
+    assert client.get(path).json()["items"] == first + second
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+from collections.abc import AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import con
+from app.schemas import ShoppingListCreate
+from app.storage import Entity
+
+
+def test_list_ids_only_change_with_memberships(
+    client: TestClient, user: dict, shoppinglist: dict
+) -> None:
+    path = f"/shoppinglists/{user['id']}/ids"
+    response = client.get(path)
+    assert response.json() == [shoppinglist["id"]]
+    etag = response.headers["ETag"]
+
+    lists = f"/shoppinglists/{shoppinglist['id']}"
+    client.post(f"{lists}/items/add", json={"items": ["milk"]}).raise_for_status()
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    created = client.post(
+        "/shoppinglists",
+        json={"name": f"List {os.urandom(6).hex()}", "owner": user["id"]},
+    ).json()
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert sorted(response.json()) == sorted([shoppinglist["id"], created["id"]])
+
+    client.delete(f"/shoppinglists/{created['id']}").raise_for_status()
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize("imported", [False, True])
+def test_listing_after_a_new_list_does_not_join_an_older_one(
+    client: TestClient, user: dict, monkeypatch: pytest.MonkeyPatch, imported: bool
+) -> None:
+    table = con.memberships_table_client
+    query_entities = table.query_entities
+    read = asyncio.Event()
+
+    async def slow_query_entities(partition_key: str) -> AsyncIterator[Entity]:
+        # The memberships are read, but the listing hasn't returned yet
+        rows = [x async for x in query_entities(partition_key)]
+        await read.wait()
+        for row in rows:
+            yield row
+
+    async def create() -> None:
+        shoppinglist = {"name": f"List {os.urandom(6).hex()}", "owner": user["id"]}
+        if not imported:
+            await con.create_shoppinglist(ShoppingListCreate(**shoppinglist))
+            return
+
+        async def lines() -> AsyncIterator[tuple[int, bytes]]:
+            yield 1, json.dumps(shoppinglist).encode()
+
+        await con.import_shoppinglists(lines())
+
+    async def race() -> tuple[list, list]:
+        first = asyncio.create_task(con.list_shoppinglists(user["id"]))
+        await asyncio.sleep(0.01)
+        await create()
+        second = asyncio.create_task(con.list_shoppinglists(user["id"]))
+        await asyncio.sleep(0.01)
+        read.set()
+        return (await first)[0], (await second)[0]
+
+    monkeypatch.setattr(table, "query_entities", slow_query_entities)
+    first, second = client.portal.call(race)
+    assert first == []
+    assert len(second) == 1
@@ -0,0 +1,63 @@
+import base64
+import hashlib
+import hmac
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+from app import rowid as backend
+
+FRONTEND = Path(__file__).resolve().parents[2] / "frontend" / "rowid.py"
+
+SAMPLES = [
+    "alice@example.com",
+    "  Alice@Example.com ",
+    "Milk",
+    "milk",
+    "Weekly shop_owner-id",
+    "Äpfel",
+    "äpfel",
+    "Crème fraîche",
+    "ÇAY",
+    "İstanbul",
+    "Straße",
+    "ΣΟΦΊΑ",
+    "Ａｐｐｌｅ",
+    " Brot ",
+    "",
+]
+
+
+def load_frontend():  # noqa: ANN201
+    spec = importlib.util.spec_from_file_location("frontend_rowid", FRONTEND)
+    frontend = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(frontend)
+    return frontend
+
+
+def fresh(primary_key: str) -> str:
+    # How ids were made before app.rowid, a new keyed HMAC every time
+    message = primary_key.lower().strip().encode("utf-8")
+    key = os.environ["HASH_KEY"].encode("utf-8")
+    digest = hmac.new(key, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode("utf-8").rstrip("=")
+
+
+@pytest.mark.parametrize("sample", SAMPLES)
+def test_backend_and_frontend_agree(sample: str) -> None:
+    frontend = load_frontend()
+    ids = {
+        backend.make_rowid(sample),
+        frontend.make_rowid(sample),
+        backend.make_rowids([sample])[0],
+        frontend.make_rowids([sample])[0],
+    }
+    if sample.isascii():
+        ids.add(fresh(sample))
+    assert len(ids) == 1
+
+
+def test_frontend_copy_has_not_drifted() -> None:
+    assert FRONTEND.read_bytes() == Path(backend.__file__).read_bytes()
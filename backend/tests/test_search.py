@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import con
+from app.schemas import ItemCreate
+
+
+def test_item_created_during_a_rebuild_is_found(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    name = f"Quince {os.urandom(4).hex()}"
+    table = con.items_table_client
+    list_entities = table.list_entities
+
+    async def racing_list_entities():  # noqa: ANN202
+        # The item is created after the scan has gone past where it would be
+        async for entity in list_entities():
+            yield entity
+        monkeypatch.setattr(table, "list_entities", list_entities)
+        await con.create_item(ItemCreate(name=name))
+
+    monkeypatch.setattr(table, "list_entities", racing_list_entities)
+    client.portal.call(con.build_item_index)
+    assert con.item_index_stale
+
+    found = client.get("/items/search", params={"q": name.lower()}).json()
+    assert [x["name"] for x in found] == [name]
+
+
+def test_concurrent_searches_share_a_rebuild(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    scans = 0
+    build_item_index = con.build_item_index
+
+    async def counted() -> None:
+        nonlocal scans
+        scans += 1
+        await asyncio.sleep(0.01)
+        await build_item_index()
+
+    monkeypatch.setattr(con, "build_item_index", counted)
+    con.item_index_stale = True
+
+    async def search() -> None:
+        await asyncio.gather(*(con.search_items("milk") for _ in range(5)))
+
+    client.portal.call(search)
+    assert scans == 1
@@ -1,40 +1,105 @@
-import base64
-import hashlib
-import hmac
-import os
-from time import sleep
+from collections.abc import Callable
 
-import requests
 import streamlit as st
 
+import client
+from rowid import make_rowid
 
-def make_rowid(primaryKey: str, secret_key: str = os.environ["HASH_KEY"]) -> str:
-    message = primaryKey.encode("utf-8").lower().strip()
-    key = secret_key.encode("utf-8")
-
-    digest = hmac.new(key, message, hashlib.sha256).digest()
-    return base64.urlsafe_b64encode(digest).decode("utf-8").rstrip("=")
+# Seconds between checks of the open list for changes made by other members
+REFRESH_INTERVAL = 10
 
 
 def set_vars() -> None:
-    sleep(0.2)
-    if "id" in st.query_params:
-        st.session_state["user"] = requests.get(f"{os.environ['BACKEND_ENDPOINT']}/users/{st.query_params.id}").json()
-    else:
-        st.session_state["user"] = None
+    # The user is kept for the session and only fetched again when someone
+    # else logs in, their lists are checked for changes on every rerun
+    user_id = st.query_params.get("id")
+    user = st.session_state.get("user")
+    if user_id is None:
+        st.session_state.user = None
+    elif user is None or user["id"] != user_id:
+        user = client.get(f"/users/{user_id}")
+        st.session_state.user = None if "detail" in user else user
+        st.session_state.shopping_lists = None
+        st.session_state.lists_etag = None
+    if "pending" not in st.session_state:
+        # Edits per list that are already shown but not sent yet
+        st.session_state.pending = {}
     if st.session_state.user is not None:
-        st.session_state.shopping_lists = requests.get(
-            f"{os.environ['BACKEND_ENDPOINT']}/shoppinglists/{st.session_state.user['id']}/list", timeout=300
-        ).json()
+        sync_lists()
+        # Not again by the list's fragment in the same run
+        st.session_state.lists_synced = True
+
+
+def sync_lists() -> bool:
+    # Costs a 304 while the user's memberships haven't changed. Lists shared
+    # with the user since are fetched, those taken from them are dropped, the
+    # rest are kept up to date through their own changes.
+    # Returns whether the lists to choose from changed.
+    user = st.session_state.user
+    etag, ids = client.get_changed(
+        f"/shoppinglists/{user['id']}/ids", st.session_state.lists_etag
+    )
+    held = st.session_state.shopping_lists or {}
+    st.session_state.shopping_lists = held
+    if not isinstance(ids, list):
+        return False
+    fetched = {}
+    if set(ids) - set(held):
+        listing = client.request("GET", f"/shoppinglists/{user['id']}/list")
+        if not isinstance(listing, list):
+            return False
+        fetched = {x["id"]: x for x in listing}
+    st.session_state.lists_etag = etag
+    shopping_lists = {
+        x: held[x] if x in held else fetched[x]
+        for x in ids
+        if x in held or x in fetched
+    }
+    pending = st.session_state.pending
+    for shoppinglist_id in set(pending) - set(shopping_lists):
+        del pending[shoppinglist_id]
+    st.session_state.shopping_lists = shopping_lists
+    return list(shopping_lists) != list(held)
+
+
+def edit(
+    shoppinglist_id: str,
+    change: Callable[[dict], None],
+    send: Callable[..., dict],
+    path: str,
+    json: dict,
+) -> None:
+    # The local copy is changed now and drawn on the next run of the list,
+    # which then sends the request and takes the list it answers with
+    change(st.session_state.shopping_lists[shoppinglist_id])
+    st.session_state.pending.setdefault(shoppinglist_id, []).append((send, path, json))
+
+
+def send_edits(shoppinglist_id: str) -> None:
+    shown = st.session_state.shopping_lists[shoppinglist_id]
+    updated = shown
+    for send, path, json in st.session_state.pending.pop(shoppinglist_id, []):
+        response = send(path, json=json)
+        if "detail" in response:
+            # Undoes whatever was shown for this and any later edit
+            st.toast(response["detail"])
+            fresh = client.get(f"/shoppinglists/{shoppinglist_id}")
+            updated = None if "detail" in fresh else fresh
+            break
+        updated = response
+    if updated is None:
+        del st.session_state.shopping_lists[shoppinglist_id]
+        st.rerun()
+    st.session_state.shopping_lists[shoppinglist_id] = updated
+    if (updated["items"], updated["members"]) != (shown["items"], shown["members"]):
+        st.rerun(scope="fragment")
 
 
 @st.dialog("Login")
 def login() -> None:
     email = st.text_input("Email")
     if st.button("Submit"):
-        user = requests.get(
-            f"{os.environ['BACKEND_ENDPOINT']}/users/{make_rowid(email)}", timeout=300
-        ).json()
+        user = client.get(f"/users/{make_rowid(email)}")
         if "detail" in user:
             st.error(user["detail"])
         else:
@@ -49,34 +114,41 @@ def signup() -> None:
     email = st.text_input("Email")
     if st.button("Submit"):
         user = {"name": username.capitalize(), "email": email}
-        new_user = requests.post(
-            f"{os.environ['BACKEND_ENDPOINT']}/users", json=user, timeout=300
-        ).json()
+        new_user = client.post("/users", json=user)
         if "detail" in new_user:
             st.error(new_user["detail"])
         else:
             st.success(f"Created user with email {new_user['email']}")
-            st.query_params.id=user["id"]
+            st.query_params.id=new_user["id"]
         st.rerun()
 
 
 @st.dialog("Add item")
 def add_item(shopping_list: dict) -> None:
     new_item = st.text_input("Item").capitalize()
+    matches = []
+    if new_item:
+        matches = client.get("/items/search", params={"q": new_item, "limit": 5})
+    names = [x["name"] for x in matches]
+    if names and new_item not in names:
+        # Offer existing catalogue entries before creating a near-duplicate
+        choice = st.radio("Did you mean", [*names, f"New item: {new_item}"])
+        if choice in names:
+            new_item = choice
     item_id = make_rowid(new_item)
     if st.button("Add item"):
-        _ = requests.post(
-            f"{os.environ['BACKEND_ENDPOINT']}/items",
-            json={"name": new_item},
-            timeout=300,
-        ).json()
+        if new_item not in names:
+            _ = client.post("/items", json={"name": new_item})
         if item_id not in shopping_list["items"]:
-            shopping_list["items"].append(item_id)
-            _ = requests.put(
-                f"{os.environ['BACKEND_ENDPOINT']}/shoppinglists/{shopping_list['id']}",
-                json=shopping_list,
-                timeout=300,
-            ).json()
+            edit(
+                shopping_list["id"],
+                lambda x: x.update(
+                    items=[y for y in x["items"] if y != item_id] + [item_id]
+                ),
+                client.post,
+                f"/shoppinglists/{shopping_list['id']}/items/add",
+                {"items": [item_id], "added_by": st.session_state.user["id"]},
+            )
         else:
             st.error(f"{new_item} is already in the {shopping_list['name']} list.")
         st.rerun()
@@ -87,13 +159,13 @@ def make_list() -> None:
     name = st.text_input("Shopping List Name:")
     if st.button("Submit"):
         slist = {"name": name.capitalize(), "owner": st.session_state.user["id"]}
-        new_list = requests.post(
-            f"{os.environ['BACKEND_ENDPOINT']}/shoppinglists", json=slist, timeout=300
-        ).json()
+        new_list = client.post("/shoppinglists", json=slist)
         if "detail" in new_list:
             st.error(new_list["detail"])
         else:
-            st.success(f"Created {list['name']} shopping list.")
+            st.success(f"Created {new_list['name']} shopping list.")
+            st.session_state.shopping_lists[new_list["id"]] = new_list
+            st.session_state.open_list = new_list["id"]
         st.rerun()
 
 
@@ -102,51 +174,102 @@ def delete_list(tab: str) -> None:
     delete = st.toggle(f'Delete "{tab["name"]}" list?')
     if delete:  # NOQA
         if st.button("Delete", type="primary"):
-            response = requests.delete(
-                f"{os.environ['BACKEND_ENDPOINT']}/shoppinglists/{tab['id']}",
-                timeout=300,
-            ).json()
+            response = client.delete(f"/shoppinglists/{tab['id']}")
             if "detail" in response:
                 st.error(response["detail"])
             else:
                 st.success(f"Deleted {tab['name']} shopping list.")
+                st.session_state.shopping_lists.pop(tab["id"], None)
             st.rerun()
 
 @st.dialog("Users")
 def manage_users(shopping_list: dict) -> None:
     new_user = st.text_input("User Email").capitalize()
     if st.button("Invite User", type="primary"):
-        invited_user = requests.get(f"{os.environ['BACKEND_ENDPOINT']}/users/{make_rowid(new_user)}").json()
+        invited_user = client.get(f"/users/{make_rowid(new_user)}")
         if "detail" in invited_user:
             st.error(f"There is no user with the email {new_user}")
         else:
-            _ = requests.put(
-                f"{os.environ['BACKEND_ENDPOINT']}/shoppinglists/{shopping_list['id']}/members/invite",
-                json={"email": new_user},
-                timeout=300,
-            ).json()
+            edit(
+                shopping_list["id"],
+                lambda x: x.update(
+                    members=[y for y in x["members"] if y != invited_user["id"]]
+                    + [invited_user["id"]]
+                ),
+                client.put,
+                f"/shoppinglists/{shopping_list['id']}/members/invite",
+                {"email": new_user},
+            )
         st.rerun()
     st.write("Remove users")
-    invited_users = [requests.get(f"{os.environ['BACKEND_ENDPOINT']}/users/{user_id}").json() for user_id in shopping_list["members"]]
+    invited_users = client.lookup("/users/batch", shopping_list["members"])
     selected_user = st.pills("Users", [user["name"] for user in invited_users])
     if selected_user is not None:
         if st.button(f"Remove {selected_user} from {shopping_list['name']} list?", type="primary"):
-            _ = requests.delete(
-                f"{os.environ['BACKEND_ENDPOINT']}/shoppinglists/{shopping_list['id']}/members/delete",
-                json={"email": [user for user in invited_users if user["name"] == selected_user][0]["email"]},
-                timeout=300,
-            ).json()
+            user = [user for user in invited_users if user["name"] == selected_user][0]
+            edit(
+                shopping_list["id"],
+                lambda x: x.update(
+                    members=[y for y in x["members"] if y != user["id"]]
+                ),
+                client.delete,
+                f"/shoppinglists/{shopping_list['id']}/members/delete",
+                {"email": user["email"]},
+            )
             st.rerun()
 
 
 
-def delete_item(shopping_list: dict, item: str) -> None:
-        _ = requests.delete(
-            f"{os.environ['BACKEND_ENDPOINT']}/shoppinglists/{shopping_list['id']}/items/delete",
-            json={"item": item},
-            timeout=300,
-        ).json()
-        st.rerun()
+def delete_item(shoppinglist_id: str, item_id: str, item_name: str) -> None:
+    # Runs before the list's fragment reruns, which shows it gone
+    edit(
+        shoppinglist_id,
+        lambda x: x.update(items=[y for y in x["items"] if y != item_id]),
+        client.delete,
+        f"/shoppinglists/{shoppinglist_id}/items/delete",
+        {"item": item_name},
+    )
+
+
+@st.fragment(run_every=REFRESH_INTERVAL)
+def shopping_list_view(shoppinglist_id: str) -> None:
+    # Reruns on its own for its buttons and to pick up other members' edits,
+    # without the rest of the page or the other lists
+    synced = st.session_state.pop("lists_synced", False)
+    if shoppinglist_id not in st.session_state.shopping_lists:
+        return
+    if shoppinglist_id not in st.session_state.pending:
+        if not synced and sync_lists():
+            # Lists were shared with or taken from the user meanwhile
+            st.rerun()
+        refreshed = client.refresh(st.session_state.shopping_lists[shoppinglist_id])
+        if refreshed is None:
+            del st.session_state.shopping_lists[shoppinglist_id]
+            st.rerun()
+        st.session_state.shopping_lists[shoppinglist_id] = refreshed
+    shopping_list = st.session_state.shopping_lists[shoppinglist_id]
+    item_names = client.item_names(shopping_list["items"])
+    for item_id in shopping_list["items"]:
+        if item_id not in item_names:
+            continue
+        with st.container(border=True):
+            info, button = st.columns([5, 1])
+            with info:
+                st.markdown(f"**{item_names[item_id]}**")
+            with button:
+                st.button(
+                    ":material/delete: Delete",
+                    use_container_width=True,
+                    type="primary",
+                    key=f"delete_{item_id}",
+                    on_click=delete_item,
+                    args=(shoppinglist_id, item_id, item_names[item_id]),
+                )
+
+    # Only now that the edits are on screen
+    if shoppinglist_id in st.session_state.pending:
+        send_edits(shoppinglist_id)
+
 
 def app() -> None:
     header_col1, _, header_col2 = st.columns([1,1,1])
@@ -171,46 +294,44 @@ def app() -> None:
         with message_col:
             st.markdown(f"### 👋 Hello, {st.session_state.user['name']}")
             st.write("")
-        if len(st.session_state.shopping_lists):
-            tabs = st.tabs([slist["name"] for slist in st.session_state.shopping_lists])
-            for i, tab in enumerate(tabs):
-                with tab:
-                    item_col, invite_col, delete_col = st.columns([4, 1, 1])
-                    with invite_col:
-                        if st.button(
-                            "Users", key=f"invite_{tab}", use_container_width=True
-                        ):
-                            manage_users(st.session_state.shopping_lists[i])
-                    with delete_col:
-                        if st.button(
-                            "Delete List", key=f"delete_{tab}", use_container_width=True
-                        ):
-                            delete_list(st.session_state.shopping_lists[i])
-                    with item_col:
-                        if st.button(
-                            ":material/add_circle: Add item",
-                            type="primary",
-                            use_container_width=True,
-                            key=f"item_{tab}",
-                        ):
-                            add_item(st.session_state.shopping_lists[i])
-
-                    for item_id in st.session_state.shopping_lists[i]["items"]:
-                        with st.container(border=True):
-                            info, button = st.columns([5, 1])
-                            with info:
-                                item_name = requests.get(
-                                    f"{os.environ['BACKEND_ENDPOINT']}/items/{item_id}"
-                                ).json()["name"]
-                                st.markdown(f"**{item_name}**")
-                            with button:
-                                if st.button(
-                                    ":material/delete: Delete",
-                                    use_container_width=True,
-                                    type="primary",
-                                    key=f"delete_{item_id}"
-                                ):
-                                    delete_item(st.session_state.shopping_lists[i], item_name)
+        shopping_lists = st.session_state.shopping_lists
+        if len(shopping_lists):
+            # Only the open list is drawn and kept up to date, the others
+            # are brought up to date when they are opened
+            if st.session_state.get("open_list") not in shopping_lists:
+                st.session_state.open_list = next(iter(shopping_lists))
+            st.radio(
+                "Shopping lists",
+                list(shopping_lists),
+                format_func=lambda x: shopping_lists[x]["name"],
+                key="open_list",
+                horizontal=True,
+                label_visibility="collapsed",
+            )
+            shoppinglist_id = st.session_state.open_list
+            # Outside the list's fragment, so its refreshes leave dialogs open
+            item_col, invite_col, delete_col = st.columns([4, 1, 1])
+            with invite_col:
+                if st.button(
+                    "Users", key=f"invite_{shoppinglist_id}", use_container_width=True
+                ):
+                    manage_users(shopping_lists[shoppinglist_id])
+            with delete_col:
+                if st.button(
+                    "Delete List",
+                    key=f"delete_list_{shoppinglist_id}",
+                    use_container_width=True,
+                ):
+                    delete_list(shopping_lists[shoppinglist_id])
+            with item_col:
+                if st.button(
+                    ":material/add_circle: Add item",
+                    type="primary",
+                    use_container_width=True,
+                    key=f"item_{shoppinglist_id}",
+                ):
+                    add_item(shopping_lists[shoppinglist_id])
+            shopping_list_view(shoppinglist_id)
 
 
 def main() -> None:
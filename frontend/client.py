@@ -0,0 +1,164 @@
+import os
+import time
+from typing import Any
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BACKEND_ENDPOINT = os.environ["BACKEND_ENDPOINT"]
+# (connect, read) seconds
+TIMEOUT = (3.05, 30)
+# How long a rerun may reuse a GET made by an earlier one in the same session
+CACHE_TTL = 10.0
+# Ids the backend takes per batch lookup
+BATCH_SIZE = 100
+
+
+@st.cache_resource
+def session() -> requests.Session:
+    """One keep-alive connection pool per process, shared by every session."""
+    retries = Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        # Only methods that are safe to repeat, so no POST
+        allowed_methods=frozenset({"GET", "PUT", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32, max_retries=retries)
+    http = requests.Session()
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
+
+
+@st.cache_resource
+def _item_names() -> dict[str, str]:
+    # Item names never change once created, so they are shared process-wide
+    return {}
+
+
+def _cache() -> dict:
+    if "api_cache" not in st.session_state:
+        st.session_state.api_cache = {}
+    return st.session_state.api_cache
+
+
+def clear_cache() -> None:
+    _cache().clear()
+
+
+def request(method: str, path: str, **kwargs) -> Any:  # noqa: ANN003, ANN401
+    response = session().request(
+        method, f"{BACKEND_ENDPOINT}{path}", timeout=TIMEOUT, **kwargs
+    )
+    return response.json()
+
+
+def get(path: str, params: dict | None = None) -> Any:  # noqa: ANN401
+    key = (path, tuple(sorted((params or {}).items())))
+    cached = _cache().get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    result = request("GET", path, params=params)
+    _cache()[key] = (time.monotonic() + CACHE_TTL, result)
+    return result
+
+
+def get_changed(path: str, etag: str | None) -> tuple[str | None, Any]:  # noqa: ANN401
+    """``(etag, body)`` of ``path``, with no body while it still has ``etag``."""
+    headers = {} if etag is None else {"If-None-Match": etag}
+    response = session().get(
+        f"{BACKEND_ENDPOINT}{path}", headers=headers, timeout=TIMEOUT
+    )
+    if response.status_code == 304:
+        return etag, None
+    return response.headers.get("ETag"), response.json()
+
+
+def post(path: str, json: Any = None) -> Any:  # noqa: ANN401
+    clear_cache()
+    return request("POST", path, json=json)
+
+
+def put(path: str, json: Any = None) -> Any:  # noqa: ANN401
+    clear_cache()
+    return request("PUT", path, json=json)
+
+
+def delete(path: str, json: Any = None) -> Any:  # noqa: ANN401
+    clear_cache()
+    return request("DELETE", path, json=json)
+
+
+def lookup(path: str, ids: list[str]) -> list[dict]:
+    # Batch reads go over POST but don't change anything, so they're cached
+    key = (path, tuple(sorted(set(ids))))
+    cached = _cache().get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    result = []
+    for i in range(0, len(key[1]), BATCH_SIZE):
+        batch = list(key[1][i : i + BATCH_SIZE])
+        result.extend(request("POST", path, json={"ids": batch}))
+    _cache()[key] = (time.monotonic() + CACHE_TTL, result)
+    return result
+
+
+def item_names(ids: list[str]) -> dict[str, str]:
+    names = _item_names()
+    missing = sorted({x for x in ids if x not in names})
+    for i in range(0, len(missing), BATCH_SIZE):
+        batch = missing[i : i + BATCH_SIZE]
+        for item in request("POST", "/items/batch", json={"ids": batch}):
+            names[item["id"]] = item["name"]
+    return {x: names[x] for x in ids if x in names}
+
+
+def apply_changes(shopping_list: dict, changes: list[dict]) -> dict:
+    """``shopping_list`` with the backend's change events applied.
+
+    ``items`` and ``members`` events drop ``removed`` and append ``added``,
+    or carry the whole new ``order``. Per-item attributes aren't shown here.
+    """
+    updated = {
+        **shopping_list,
+        "items": list(shopping_list["items"]),
+        "members": list(shopping_list["members"]),
+    }
+    for change in changes:
+        if change["type"] not in ("items", "members"):
+            continue
+        if "order" in change:
+            updated[change["type"]] = list(change["order"])
+            continue
+        removed = set(change["removed"])
+        kept = [x for x in updated[change["type"]] if x not in removed]
+        updated[change["type"]] = kept + [x for x in change["added"] if x not in kept]
+    return updated
+
+
+def refresh(shopping_list: dict) -> dict | None:
+    """``shopping_list`` brought up to date, or None once it has been deleted.
+
+    Asks for the changes since the version held, so a list nobody has touched
+    costs one small request. The list is only fetched whole on a resync.
+    """
+    path = f"/shoppinglists/{shopping_list['id']}"
+    response = session().get(
+        f"{BACKEND_ENDPOINT}{path}/changes",
+        params={"since": shopping_list["version"]},
+        timeout=TIMEOUT,
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    changes = response.json()
+    if changes["resync"]:
+        fresh = request("GET", path)
+        return None if "detail" in fresh else fresh
+    updated = apply_changes(shopping_list, changes["changes"])
+    updated["version"] = changes["version"]
+    return updated
@@ -0,0 +1,45 @@
+"""Row keys derived from natural keys (emails, item names, list names).
+
+The backend and the frontend have to agree on these byte for byte but are
+built as separate images, so this file is kept identical in
+``backend/app/rowid.py`` and ``frontend/rowid.py``. ``backend/tests/test_rowid.py``
+checks that the two still match.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+from collections.abc import Iterable
+from functools import lru_cache
+
+# Keyed once, every call hashes on a copy instead of re-deriving the key pads
+_HMAC = hmac.new(os.environ["HASH_KEY"].encode("utf-8"), digestmod=hashlib.sha256)
+# Distinct keys remembered by make_rowid, enough for the users and items in use
+CACHE_SIZE = 4096
+
+
+def normalize(primary_key: str) -> bytes:
+    # Case is folded on the text, not the encoded bytes, so that non-ASCII
+    # names like "Äpfel" and "äpfel" share a row
+    return primary_key.lower().strip().encode("utf-8")
+
+
+def _digest(base: hmac.HMAC, primary_key: str) -> str:
+    mac = base.copy()
+    mac.update(normalize(primary_key))
+    return base64.urlsafe_b64encode(mac.digest()).decode("ascii").rstrip("=")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def make_rowid(primary_key: str) -> str:
+    return _digest(_HMAC, primary_key)
+
+
+def make_rowids(primary_keys: Iterable[str]) -> list[str]:
+    """Row keys for many natural keys, in order.
+
+    Bypasses the memo, so a bulk load of keys seen once doesn't push the hot
+    ones out of it.
+    """
+    return [_digest(_HMAC, x) for x in primary_keys]
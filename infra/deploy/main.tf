@@ -29,6 +29,21 @@ resource "azurerm_storage_table" "lists" {
   storage_account_name = azurerm_storage_account.sa.name
 }
 
+resource "azurerm_storage_table" "memberships" {
+  name                 = "memberships"
+  storage_account_name = azurerm_storage_account.sa.name
+}
+
+resource "azurerm_storage_table" "listitems" {
+  name                 = "listitems"
+  storage_account_name = azurerm_storage_account.sa.name
+}
+
+resource "azurerm_storage_table" "listchanges" {
+  name                 = "listchanges"
+  storage_account_name = azurerm_storage_account.sa.name
+}
+
 resource "azurerm_container_app_environment" "cae" {
   name                = "cae-${var.project_id}-${var.env}-eau-001"
   location            = data.azurerm_resource_group.rg.location
@@ -72,6 +87,12 @@ resource "azurerm_container_app" "backend" {
         name  = "HASH_KEY"
         value = var.hash_key
       }
+
+      readiness_probe {
+        transport = "HTTP"
+        port      = 8000
+        path      = "/ready"
+      }
     }
   }
 